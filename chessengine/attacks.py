@@ -0,0 +1,180 @@
+"""
+Set-wise attack generation. The squares attacked by every piece on the board are
+computed with bitboard operations and collected into attack maps, which are
+used by the evaluation. Castling move generation only needs to know whether a
+few squares are attacked, and uses ``is_square_attacked``.
+"""
+
+
+from chessengine.lookup_tables import (
+    knight_attack_masks,
+    king_attack_masks,
+    ray_masks,
+    mask_file,
+)
+
+
+# Directions in which the position index increases. The nearest blocker on these
+# rays is the lowest set bit, on the other rays it is the highest set bit.
+_POSITIVE_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+_ROOK_RAYS = [
+    (ray_masks[direction], direction in _POSITIVE_DIRECTIONS)
+    for direction in [(1, 0), (-1, 0), (0, 1), (0, -1)]
+]
+_BISHOP_RAYS = [
+    (ray_masks[direction], direction in _POSITIVE_DIRECTIONS)
+    for direction in [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+]
+
+_not_a_file = ~mask_file[1] & 0xFFFFFFFFFFFFFFFF
+_not_h_file = ~mask_file[8] & 0xFFFFFFFFFFFFFFFF
+
+
+def _slider_attacks(index: int, occupied: int, rays: list) -> int:
+    """
+    Returns the squares attacked by a sliding piece on the position index, stopping
+    every ray at the first occupied square.
+    """
+    attacks = 0
+    for ray_table, positive in rays:
+        ray = ray_table[index]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= ray_table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(index: int, occupied: int) -> int:
+    """
+    Returns the squares attacked by a rook.
+
+    :param index: The position index (0 to 63) of the rook
+    :param occupied: A bitboard of all the pieces on the board
+    """
+    return _slider_attacks(index, occupied, _ROOK_RAYS)
+
+
+def bishop_attacks(index: int, occupied: int) -> int:
+    """
+    Returns the squares attacked by a bishop.
+
+    :param index: The position index (0 to 63) of the bishop
+    :param occupied: A bitboard of all the pieces on the board
+    """
+    return _slider_attacks(index, occupied, _BISHOP_RAYS)
+
+
+def pawn_attacks(side: str, pawns: int) -> int:
+    """
+    Returns the squares attacked by all the pawns of a side.
+
+    :param side: "white" or "black"
+    :param pawns: The bitboard of the side's pawns
+    """
+    if side == "white":
+        return ((pawns << 9) & _not_a_file | (pawns << 7) & _not_h_file) & (
+            0xFFFFFFFFFFFFFFFF
+        )
+    return (pawns >> 7) & _not_a_file | (pawns >> 9) & _not_h_file
+
+
+def is_square_attacked(board, index: int, side: str) -> bool:
+    """
+    Returns ``True`` if the position index is attacked by any piece of side. Looks
+    for attackers from the square outwards, so it is cheaper than building the
+    ``AttackMaps`` of the board when only a few squares are checked.
+
+    :param board: The ``chessengine.bitboard.Board`` to check
+    :param index: The position index (0 to 63) of the square
+    :param side: The attacking side, "white" or "black"
+    """
+    if knight_attack_masks[index] & board.get_bitboard(side, "knights"):
+        return True
+    if king_attack_masks[index] & board.get_bitboard(side, "kings"):
+        return True
+    # A pawn of side attacks the square if a pawn of the other side on the square
+    # would attack it
+    other_side = "black" if side == "white" else "white"
+    if pawn_attacks(other_side, 1 << index) & board.get_bitboard(side, "pawns"):
+        return True
+    occupied = board.all_pieces
+    queens = board.get_bitboard(side, "queens")
+    if rook_attacks(index, occupied) & (board.get_bitboard(side, "rooks") | queens):
+        return True
+    return (
+        bishop_attacks(index, occupied) & (board.get_bitboard(side, "bishops") | queens)
+        > 0
+    )
+
+
+class AttackMaps:
+    """
+    The squares attacked by every side and piece type on a board. Created by
+    ``Board.attack_maps``.
+
+    :param board: The ``chessengine.bitboard.Board`` to compute the attacks for
+    :ivar attacks: A dictionary mapping a side and piece to the squares attacked
+        by all the pieces of that type
+    :ivar side_attacks: A dictionary mapping a side to all the squares it attacks
+    :ivar mobility: A dictionary mapping a side and piece to the number of squares
+        the pieces of that type attack that are not occupied by their own side.
+        Pawns are not counted.
+    """
+
+    def __init__(self, board) -> None:
+        occupied = board.all_pieces
+        self.attacks = {}
+        self.side_attacks = {}
+        self.mobility = {}
+        for side, own in (("white", board.all_white), ("black", board.all_black)):
+            not_own = ~own
+            self.attacks[(side, "pawns")] = pawn_attacks(
+                side, board.get_bitboard(side, "pawns")
+            )
+            for piece in ("kings", "queens", "rooks", "bishops", "knights"):
+                bitboard = board.get_bitboard(side, piece)
+                attacks = 0
+                mobility = 0
+                while bitboard:
+                    position = bitboard & -bitboard
+                    bitboard ^= position
+                    index = position.bit_length() - 1
+                    if piece == "knights":
+                        piece_attacks = knight_attack_masks[index]
+                    elif piece == "kings":
+                        piece_attacks = king_attack_masks[index]
+                    elif piece == "rooks":
+                        piece_attacks = rook_attacks(index, occupied)
+                    elif piece == "bishops":
+                        piece_attacks = bishop_attacks(index, occupied)
+                    else:
+                        piece_attacks = rook_attacks(index, occupied) | bishop_attacks(
+                            index, occupied
+                        )
+                    attacks |= piece_attacks
+                    mobility += bin(piece_attacks & not_own).count("1")
+                self.attacks[(side, piece)] = attacks
+                self.mobility[(side, piece)] = mobility
+
+            side_attacks = 0
+            for (attack_side, _), attacks in self.attacks.items():
+                if attack_side == side:
+                    side_attacks |= attacks
+            self.side_attacks[side] = side_attacks
+
+    def __repr__(self):
+        return "<chessengine.AttackMaps>"
+
+    def is_attacked(self, side: str, squares: int) -> bool:
+        """
+        Returns ``True`` if any of the squares is attacked by side.
+
+        :param side: The attacking side, "white" or "black"
+        :param squares: A bitboard of the squares to check
+        """
+        return self.side_attacks[side] & squares > 0
@@ -0,0 +1,140 @@
+"""
+Evaluate many positions at once with NumPy, for working with datasets of
+positions where creating a ``chessengine.bitboard.Board`` for every position
+would be too slow.
+
+This module needs NumPy, which can be installed with
+``python -m pip install chessengine[numpy]``.
+"""
+
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from chessengine.lookup_tables import (
+    material_square_table,
+    endgame_material_square_table,
+    phase_values,
+    MAX_PHASE,
+)
+from chessengine.network import FEATURES
+
+
+# The columns of a positions array. The first 12 columns are the bitboards in the order
+# of ``chessengine.network.FEATURES``, followed by the optional columns below.
+SIDE_COLUMN = 12
+CASTLING_COLUMNS = slice(13, 17)
+POSITION_COLUMNS = 17
+
+
+def _byte_tables():
+    """
+    Build three lookup tables of shape ``(12 * 8 * 256,)`` mapping every byte of every bitboard
+    to the middlegame score, endgame score and phase of the pieces in that byte. The entry for
+    byte ``j`` of bitboard ``p`` having the value ``b`` is ``(p * 8 + j) * 256 + b``.
+    """
+    # The bits set in every possible byte, least significant bit first
+    byte_bits = np.unpackbits(
+        np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"
+    ).astype(np.int64)
+    tables = []
+    for square_table in (material_square_table, endgame_material_square_table):
+        squares = np.array([square_table[side_piece] for side_piece in FEATURES])
+        tables.append(np.einsum("bk,pjk->pjb", byte_bits, squares.reshape(12, 8, 8)))
+    phases = np.array([phase_values[piece] for _, piece in FEATURES])
+    tables.append(
+        np.broadcast_to(
+            phases[:, None, None] * byte_bits.sum(axis=1)[None, None, :], (12, 8, 256)
+        )
+    )
+    return [table.reshape(-1).astype(np.int32) for table in tables]
+
+
+_tables = None
+# The offset of the entries of every byte of every bitboard in the lookup tables
+_byte_offsets = None if np is None else np.arange(96, dtype=np.intp) * 256
+
+
+def boards_to_array(boards, sides=None):
+    """
+    Convert boards into a positions array that can be passed to ``evaluate_positions``.
+
+    :param boards: An iterable of ``chessengine.bitboard.Board`` objects
+    :param sides: An optional iterable with the side to move ("white" or "black") in each
+        position. The side column is 0 (white) for all positions if not passed.
+    :return: An ``(N, 17)`` uint64 array. Columns 0 to 11 are the bitboards in the order of
+        ``chessengine.network.FEATURES``, column 12 is the side to move (0 for white, 1 for
+        black) and columns 13 to 16 are the castling rights (white king side, white queen
+        side, black king side, black queen side).
+    """
+    if np is None:
+        raise ImportError(
+            "boards_to_array needs NumPy. Install it with `python -m pip install numpy`."
+        )
+    rows = []
+    for board in boards:
+        bitboards = board.board
+        rows.append(
+            [bitboards[side_piece] for side_piece in FEATURES]
+            + [
+                0,
+                board.white_king_side_castle,
+                board.white_queen_side_castle,
+                board.black_king_side_castle,
+                board.black_queen_side_castle,
+            ]
+        )
+    positions = np.array(rows, dtype=np.uint64).reshape(-1, POSITION_COLUMNS)
+    if sides is not None:
+        positions[:, SIDE_COLUMN] = [side == "black" for side in sides]
+    return positions
+
+
+def evaluate_positions(positions, chunk_size: int = 65536):
+    """
+    Evaluate the material and piece square table score of many positions at once. The
+    scores are exactly the scores ``Board.evaluate_score`` returns for the same positions.
+
+    The bitboards are split into bytes, and every byte is looked up in tables holding the
+    score of every possible arrangement of pieces in that byte, so no position is ever
+    looked at one square at a time.
+
+    :param positions: An ``(N, 12)`` uint64 array of bitboards in the order of
+        ``chessengine.network.FEATURES``, or an ``(N, 17)`` array as returned by
+        ``boards_to_array``. The side to move and castling columns are accepted so that
+        datasets can be passed as they are, but they don't change the score.
+    :param chunk_size: The number of positions evaluated at a time. Limits the memory used.
+    :return: An ``(N,)`` int64 array of scores. A positive score favors white.
+    :raises ValueError: If ``positions`` doesn't have 12 or 17 columns
+    """
+    global _tables
+    if np is None:
+        raise ImportError(
+            "evaluate_positions needs NumPy. Install it with `python -m pip install numpy`."
+        )
+    positions = np.asarray(positions, dtype=np.uint64)
+    if positions.ndim != 2 or positions.shape[1] not in (12, POSITION_COLUMNS):
+        raise ValueError(
+            f"positions must have shape (N, 12) or (N, {POSITION_COLUMNS}). Got {positions.shape}"
+        )
+    if _tables is None:
+        _tables = _byte_tables()
+
+    scores = np.empty(len(positions), dtype=np.int64)
+    for start in range(0, len(positions), chunk_size):
+        chunk = np.ascontiguousarray(positions[start : start + chunk_size, :12])
+        # Byte j of bitboard p holds squares 8 * j to 8 * j + 7
+        chunk_bytes = chunk.astype("<u8").view(np.uint8).reshape(-1, 96)
+        index = chunk_bytes + _byte_offsets
+        middlegame, endgame, phase = (
+            np.take(table, index).sum(axis=1, dtype=np.int64) for table in _tables
+        )
+        phase = np.minimum(phase, MAX_PHASE)
+        blended = middlegame * phase + endgame * (MAX_PHASE - phase)
+        # Round towards 0, same as chessengine.utils.taper_score
+        scores[start : start + len(chunk)] = np.sign(blended) * (
+            np.abs(blended) // MAX_PHASE
+        )
+    return scores
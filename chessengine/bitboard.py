@@ -4,23 +4,18 @@ to play a game of chess.
 """
 
 
-try:
-    import importlib.resources as pkg_resources
-except ImportError:
-    # Python < 3.7
-    pkg_resources = None
 import random
 import sys
+import warnings
 from copy import copy
 from math import log2
-from time import sleep
-from typing import Tuple, Iterable
+from typing import Tuple, Iterable, Optional
 
 from chessengine.exceptions import (
     PositionError,
     MoveError,
     PGNParsingError,
-    GameNodeError,
+    SearchAborted,
 )
 from chessengine.moves import (
     get_white_pawn_moves,
@@ -42,7 +37,15 @@ from chessengine.lookup_tables import (
     coords_to_pos,
     pos_to_coords,
     san_piece_map,
-    piece_square_table,
+    mask_rank,
+    material_square_table,
+    endgame_material_square_table,
+    phase_values,
+    MAX_PHASE,
+    zobrist_piece_keys,
+    zobrist_castling_keys,
+    zobrist_en_passant_keys,
+    zobrist_black_to_move_key,
 )
 from chessengine.utils import (
     get_bit_positions,
@@ -51,9 +54,22 @@ from chessengine.utils import (
     clear_lines,
     get_input,
     change_turn,
+    score_from_move,
+    taper_score,
+    flip_vertical,
+)
+from chessengine.pgn.parser import SAN_MOVE_REGEX
+from chessengine.search import (
+    SearchStatistics,
+    AsyncSearch,
+    Ponderer,
+    LIMIT_CHECK_INTERVAL,
 )
-from chessengine.pgn.parser import PGNParser, SAN_MOVE_REGEX
 from chessengine.pgn.utils import best_move_from_tree
+from chessengine.pgn.book import load_position_book
+from chessengine.pgn.polyglot import MappedBook
+from chessengine.evaluation import PawnHashTable, EvaluationCache, evaluate_attacks
+from chessengine.attacks import AttackMaps, pawn_attacks
 
 
 class Board:
@@ -66,8 +82,22 @@ class Board:
     :param side: The side that the _board_ will play. Should be one of "white" or "black"
     :var score: The score/evaluation of the current board positions. A higher/more positive score favors
         white, a lower/more negative score favors black
+    :var middlegame_score: The evaluation of the board using the middlegame piece square tables
+    :var endgame_score: The evaluation of the board using the endgame piece square tables
+    :var phase: The game phase, from ``MAX_PHASE`` when all pieces are on the board down to 0.
+        ``score`` is ``middlegame_score`` and ``endgame_score`` blended according to the phase.
+    :var pawn_hash_table: The ``chessengine.evaluation.PawnHashTable`` used to cache the pawn
+        structure terms of ``Board.evaluate``. Shared with copies of the board.
+    :var evaluation_cache: The ``chessengine.evaluation.EvaluationCache`` used by ``Board.evaluate``
+        to avoid evaluating the same position again. Shared with copies of the board.
+    :var network: The ``chessengine.network.NetworkEvaluator`` used by ``Board.evaluate``, or
+        ``None`` to use the hand written evaluation. Set using ``Board.set_network``.
     """
 
+    #: If ``True``, every tracked move checks the incrementally updated score against a
+    #: full evaluation of the board. This is slow, and only meant to be used while debugging.
+    verify_score = False
+
     def __init__(self, side: str):
         self.white_pawns = 65280  # (A2 to H2)
         self.white_rooks = 129  # (A1 and H1)
@@ -84,6 +114,12 @@ class Board:
         self.black_kings = 1152921504606846976  # (E8)
 
         self.score = 0
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = MAX_PHASE
+        self.pawn_hash_table = PawnHashTable()
+        self.evaluation_cache = EvaluationCache()
+        self.network = None
 
         if side.lower().strip() not in ["black", "white"]:
             raise ValueError(f'side must be one of "black" or "white". Got {side}')
@@ -284,38 +320,252 @@ class Board:
 
     def copy(self):
         """
-        Create and return a copy of the board.
+        Create and return a copy of the board. The copy has its own list
+        of moves, so moves made on the copy can't be undone on the board.
+        """
+        board = copy(self)
+        board.moves = self.moves.copy()
+        if self.network is not None:
+            board.network = self.network.copy()
+        return board
+
+    def set_network(self, network) -> None:
+        """
+        Evaluate the board with a neural network instead of the hand written evaluation.
+        The network's accumulator is computed for the current position, and is then
+        updated incrementally by ``Board.move`` and ``Board.undo_move``.
+
+        :param network: A ``chessengine.network.NetworkEvaluator``, or ``None`` to go back
+            to the hand written evaluation.
         """
-        return copy(self)
+        if network is not None:
+            network.refresh(self)
+        self.network = network
 
     def evaluate_score(self) -> int:
         """
-        Evaluate the current score/evaluation of the board state. Use this method to
-        reset the board score to the correct value if the game starts from an intermediate
-        stage.
+        Evaluate the current score/evaluation of the board state from scratch. Use
+        ``Board.reset_score`` to reset the board score to the correct value if the game
+        starts from an intermediate stage.
 
         :return: The score/evaluation of the current board state.
         """
-        s = 0
-        piece_values = {
-            "pawns": 100,
-            "rooks": 500,
-            "knights": 320,
-            "bishops": 330,
-            "queens": 900,
-            "kings": 20000,
-        }
-        for i in range(64):
-            pos = 2**i
-            side, piece, _ = self.identify_piece_at(pos)
-            if side is None:
-                continue
-            elif side == "white":
-                s += piece_values[piece] + piece_square_table[(side, piece)][i]
-            else:
-                s -= piece_values[piece] + piece_square_table[(side, piece)][i]
+        return taper_score(*self._evaluate())
+
+    def evaluate(self) -> int:
+        """
+        Returns the evaluation used by the search: the incrementally updated ``score``
+        plus the pawn structure terms, which are looked up in ``pawn_hash_table``, and
+        the mobility, king safety and attacked piece terms computed from ``Board.attack_maps``.
+
+        Evaluations are stored in ``evaluation_cache``, and a position found there is
+        not evaluated again. If a network has been set with ``Board.set_network``, the
+        network's evaluation is returned instead.
 
-        return s
+        :return: The evaluation of the current board state. A positive score favors white.
+        """
+        if self.network is not None:
+            return self.network.evaluate()
+        # A position and its mirror share an entry, stored from the canonical side
+        key, sign = self.canonical_key()
+        score = self.evaluation_cache.get(key)
+        if score is None:
+            score = (
+                self.score
+                + self.pawn_hash_table.probe(self.white_pawns, self.black_pawns)
+                + evaluate_attacks(self, self.attack_maps())
+            )
+            self.evaluation_cache.store(key, sign * score)
+            return score
+        return sign * score
+
+    def position_key(self) -> tuple:
+        """
+        Returns a key identifying the pieces on the board, made of all the bitboards of
+        the board. Two boards have the same key if and only if they have the same pieces
+        on the same squares. Used to key the caches of the evaluation.
+        """
+        return (
+            self.white_kings,
+            self.white_queens,
+            self.white_rooks,
+            self.white_bishops,
+            self.white_knights,
+            self.white_pawns,
+            self.black_kings,
+            self.black_queens,
+            self.black_rooks,
+            self.black_bishops,
+            self.black_knights,
+            self.black_pawns,
+        )
+
+    def zobrist_key(self, side: str) -> int:
+        """
+        Returns a 64 bit Zobrist hash of the position with side to move, made from the
+        pieces on the board, the castling rights and the file of a pawn that can be
+        captured en passant. Unlike ``Board.position_key``, two positions that only
+        differ in the side to move or the castling rights have different keys. Used to
+        key the opening book.
+
+        :param side: The side to move, "white" or "black"
+        """
+        key = 0
+        for side_piece, bitboard in self.board.items():
+            piece_keys = zobrist_piece_keys[side_piece]
+            while bitboard:
+                position = bitboard & -bitboard
+                bitboard ^= position
+                key ^= piece_keys[position.bit_length() - 1]
+        for castle, castle_key in zobrist_castling_keys.items():
+            if getattr(self, castle):
+                key ^= castle_key
+        # Only count the en passant square if a pawn can actually capture on it
+        if self.en_passant_position & pawn_attacks(
+            side, self.get_bitboard(side, "pawns")
+        ):
+            key ^= zobrist_en_passant_keys[
+                (self.en_passant_position.bit_length() - 1) % 8
+            ]
+        if side == "black":
+            key ^= zobrist_black_to_move_key
+        return key
+
+    def canonical_key(self) -> tuple[tuple, int]:
+        """
+        Returns a key shared by the position and its colour-flipped mirror (see
+        ``Board.mirrored``), so that caches can store only one of the two. The mirror of
+        a position evaluates to exactly the negated score, so a cache stores a score
+        multiplied by the returned sign, and multiplies what it reads by the sign again.
+
+        :return: A 2-tuple ``(key, sign)``, where ``key`` is the smaller of
+            ``Board.position_key`` and the position key of the mirrored board, and ``sign``
+            is 1 if ``key`` is the board's own key and -1 if it is the mirror's key.
+        """
+        key = self.position_key()
+        mirrored_key = tuple(flip_vertical(bitboard) for bitboard in key[6:] + key[:6])
+        if mirrored_key < key:
+            return mirrored_key, -1
+        return key, 1
+
+    def mirrored(self):
+        """
+        Returns a colour-flipped copy of the board: the ranks are mirrored and the colours
+        of all the pieces are swapped, along with the castling rights, the side the board
+        plays and the score, which is negated. The copy has no moves to undo.
+        """
+        board = self.copy()
+        board.moves = []
+        for piece in ["kings", "queens", "rooks", "bishops", "knights", "pawns"]:
+            board.set_bitboard(
+                "white", piece, flip_vertical(self.get_bitboard("black", piece))
+            )
+            board.set_bitboard(
+                "black", piece, flip_vertical(self.get_bitboard("white", piece))
+            )
+        board.side = self.opponent_side
+        board.opponent_side = self.side
+        board.white_king_side_castle = self.black_king_side_castle
+        board.white_queen_side_castle = self.black_queen_side_castle
+        board.black_king_side_castle = self.white_king_side_castle
+        board.black_queen_side_castle = self.white_queen_side_castle
+        board.en_passant_position = flip_vertical(self.en_passant_position)
+        board.score = -self.score
+        board.middlegame_score = -self.middlegame_score
+        board.endgame_score = -self.endgame_score
+        if board.network is not None:
+            board.network.refresh(board)
+        return board
+
+    def attack_maps(self) -> AttackMaps:
+        """
+        Returns the ``chessengine.attacks.AttackMaps`` of the current position. The maps
+        are only needed by the evaluation, which caches its result in ``evaluation_cache``,
+        so they are computed on every call.
+        """
+        return AttackMaps(self)
+
+    def _evaluate(self) -> tuple[int, int, int]:
+        """
+        Evaluate the board from scratch and return its middlegame score, endgame
+        score and game phase.
+        """
+        middlegame_score = 0
+        endgame_score = 0
+        phase = 0
+        for side_piece, bitboard in self.board.items():
+            middlegame_table = material_square_table[side_piece]
+            endgame_table = endgame_material_square_table[side_piece]
+            phase += phase_values[side_piece[1]] * bin(bitboard).count("1")
+            # Only visit the squares that have a piece on them
+            while bitboard:
+                position = bitboard & -bitboard
+                middlegame_score += middlegame_table[position.bit_length() - 1]
+                endgame_score += endgame_table[position.bit_length() - 1]
+                bitboard ^= position
+
+        return middlegame_score, endgame_score, phase
+
+    def reset_score(self) -> None:
+        """
+        Evaluate the board from scratch and reset ``score``, ``middlegame_score``,
+        ``endgame_score`` and ``phase`` to the evaluated values. Call this after setting
+        up a position with ``Board.set_bitboard``.
+        """
+        self.middlegame_score, self.endgame_score, self.phase = self._evaluate()
+        self.score = taper_score(self.middlegame_score, self.endgame_score, self.phase)
+
+    def evaluate_move(
+        self,
+        side: str,
+        piece: str,
+        start: int,
+        end: int,
+        end_piece: str,
+        promotion: str = None,
+        en_passant: bool = False,
+    ) -> tuple[int, int, int, int]:
+        """
+        Returns the evaluation of the board after a move is made, without making the move.
+        The middlegame and endgame scores are updated with
+        ``chessengine.utils.score_from_move``, which takes the same arguments.
+
+        :return: A 4-tuple ``(score, middlegame_score, endgame_score, phase)`` after the move
+        """
+        phase = self.phase
+        if end_piece is not None:
+            phase -= phase_values[end_piece]
+        if promotion is not None:
+            phase += phase_values[promotion]
+        middlegame_score = score_from_move(
+            side,
+            piece,
+            start,
+            end,
+            end_piece,
+            self.middlegame_score,
+            promotion,
+            en_passant,
+            material_square_table,
+        )
+        endgame_score = score_from_move(
+            side,
+            piece,
+            start,
+            end,
+            end_piece,
+            self.endgame_score,
+            promotion,
+            en_passant,
+            endgame_material_square_table,
+        )
+
+        return (
+            taper_score(middlegame_score, endgame_score, phase),
+            middlegame_score,
+            endgame_score,
+            phase,
+        )
 
     def get_side_bitboard(self, side: str) -> int:
         """
@@ -376,12 +626,18 @@ class Board:
         """
         if not position & self.all_pieces:
             return None, None, None
-        for side, piece in self.board:
-            board = self.board[(side, piece)]
+        for (side, piece), board in self.board.items():
             if board & position > 0:
                 return side, piece, board
 
-    def move(self, start: int, end: int, score: int = None, track: bool = True) -> None:
+    def move(
+        self,
+        start: int,
+        end: int,
+        score: int = None,
+        track: bool = True,
+        promotion: str = None,
+    ) -> None:
         """
         Moves the piece at start to end. Doesn't check anything, just makes
         the move (unless the start or end positions are invalid). Also checks if move
@@ -399,11 +655,21 @@ class Board:
 
         :param start: The start position of the move. See :ref:`position_representation`
         :param end: The end position of the move. See :ref:`position_representation`
-        :param score: The new score/evaluation of the board after the move is made
+        :param score: Deprecated and ignored, the score is always updated incrementally from
+            the move made. Passing it raises a ``DeprecationWarning``.
         :param track: If ``True``, the move made will be stored in self.moves
+        :param promotion: The piece a pawn moving to the last rank is promoted to, for example "queens".
+            The pawn stays a pawn if not passed.
 
         :raises PositionError: If an invalid position was passed.
+        :raises MoveError: If a piece other than a pawn is promoted.
         """
+        if score is not None:
+            warnings.warn(
+                "The score argument of Board.move is ignored and will be removed.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
         if not 1 <= start <= 2**63:
             raise PositionError(
                 f"The start position is outside the board - moving from {log2(start)} to {log2(end)}"
@@ -422,6 +688,30 @@ class Board:
             raise PositionError(
                 f"Can't move from {log2(start)} to {log2(end)}, both positions have {end_side} pieces."
             )
+        if promotion is not None and start_piece != "pawns":
+            raise MoveError(f"Only pawns can be promoted, not {start_piece}.")
+
+        # A pawn capturing en passant moves to the empty square behind the captured pawn
+        en_passant_capture = (
+            start_piece == "pawns"
+            and end_side is None
+            and end == self.en_passant_position
+            and end & mask_rank[6 if start_side == "white" else 3] > 0
+        )
+
+        # Evaluate the board after the move
+        if track:
+            if self.network is not None:
+                board_before_move = self.board
+            scores = self.evaluate_move(
+                start_side,
+                start_piece,
+                start,
+                end,
+                end_piece,
+                promotion=promotion,
+                en_passant=en_passant_capture,
+            )
 
         # Identify if the move is a castle and what type of castle it is
         castle_type = None
@@ -456,6 +746,12 @@ class Board:
                 elif start_side == "black" and start == 2**56:
                     self.black_queen_side_castle = False
 
+        if en_passant_capture:
+            # Record the captured pawns so the capture can be undone
+            end_side = "black" if start_side == "white" else "white"
+            end_piece = "pawns"
+            end_board = self.get_bitboard(end_side, "pawns")
+
         # Track moves made so we can undo
         if track:
             start_state = (
@@ -466,53 +762,47 @@ class Board:
                 end_board,
                 castle_type,
                 self.score,
+                self.middlegame_score,
+                self.endgame_score,
+                self.phase,
                 self.white_king_side_castle,
                 self.white_queen_side_castle,
                 self.black_king_side_castle,
                 self.black_queen_side_castle,
+                self.en_passant_position,
+                promotion,
             )
             self.moves.append(start_state)
 
         # Check en passant moves
-        if start_piece == "pawns":
+        if en_passant_capture:
+            # Remove the pawn captured en passant
             if start_side == "white":
-                # Check en passant status
-                if get_rank(start) == 2 and get_rank(end) == 4:
-                    self.en_passant_position = start << 8
-
-                # Check if a pawn captured by an en passant move
-                elif end == self.en_passant_position:
-                    # White pawn made an en passant move
-                    black_pawn_bb = self.get_bitboard("black", "pawns")
-                    black_pawn_bb &= clear_position[end >> 8]
-                    self.set_bitboard("black", "pawns", black_pawn_bb)
-                    self.en_passant_position = 0
-
-                # Clear self.en_passant_position
-                else:
-                    self.en_passant_position = 0
-
+                captured_position = end >> 8
             else:
-                # Check en passant status
-                if get_rank(start) == 7 and get_rank(end) == 5:
-                    self.en_passant_position = start >> 8
-
-                # Check if a pawn captured by an en passant move
-                elif end == self.en_passant_position:
-                    # Black pawn made an en passant move
-                    white_pawn_bb = self.get_bitboard("white", "pawns")
-                    white_pawn_bb &= clear_position[end << 8]
-                    self.set_bitboard("white", "pawns", white_pawn_bb)
-                    self.en_passant_position = 0
-
-                # Clear self.en_passant_position
-                else:
-                    self.en_passant_position = 0
-
+                captured_position = end << 8
+            self.set_bitboard(
+                end_side, "pawns", end_board & clear_position[captured_position]
+            )
+            self.en_passant_position = 0
+        elif (
+            start_piece == "pawns"
+            and start_side == "white"
+            and get_rank(start) == 2
+            and get_rank(end) == 4
+        ):
+            self.en_passant_position = start << 8
+        elif (
+            start_piece == "pawns"
+            and start_side == "black"
+            and get_rank(start) == 7
+            and get_rank(end) == 5
+        ):
+            self.en_passant_position = start >> 8
         else:
             self.en_passant_position = 0
 
-        if end_piece is not None:
+        if end_piece is not None and not en_passant_capture:
             # Clear the captured piece's position (set "end" to 0)
             opp_side_board = self.get_bitboard(end_side, end_piece)
             opp_side_board &= clear_position[end]
@@ -522,34 +812,46 @@ class Board:
         move_side_board = self.get_bitboard(start_side, start_piece)
         move_side_board &= clear_position[start]
 
-        # Set the moved piece's final position (set "end" to 1)
-        move_side_board |= mask_position[end]
-        self.set_bitboard(start_side, start_piece, move_side_board)
+        if promotion is None:
+            # Set the moved piece's final position (set "end" to 1)
+            move_side_board |= mask_position[end]
+            self.set_bitboard(start_side, start_piece, move_side_board)
+        else:
+            # The pawn is replaced by the piece it is promoted to
+            self.set_bitboard(start_side, start_piece, move_side_board)
+            promoted_board = self.get_bitboard(start_side, promotion)
+            self.set_bitboard(
+                start_side, promotion, promoted_board | mask_position[end]
+            )
 
         # If the move was a castle, also move the rook into the correct position
         # Validity of castling is not checked
         if castle_type == "white_kingside":
-            self.move(2**7, 2**5, False)  # Don't track this move
+            self.move(2**7, 2**5, track=False)
             self.white_king_side_castle = False
             self.white_queen_side_castle = False
         elif castle_type == "white_queenside":
-            self.move(2**0, 2**3, False)  # Don't track this move
+            self.move(2**0, 2**3, track=False)
             self.white_king_side_castle = False
             self.white_queen_side_castle = False
         elif castle_type == "black_kingside":
-            self.move(2**63, 2**61, False)  # Don't track this move
+            self.move(2**63, 2**61, track=False)
             self.black_king_side_castle = False
             self.black_queen_side_castle = False
         elif castle_type == "black_queenside":
-            self.move(2**56, 2**59, False)  # Don't track this move
+            self.move(2**56, 2**59, track=False)
             self.black_king_side_castle = False
             self.black_queen_side_castle = False
 
-        # Update the board evaluation
         if track:
-            if score is None:
-                score = self.evaluate_score()
-            self.score = score
+            self.score, self.middlegame_score, self.endgame_score, self.phase = scores
+            if self.network is not None:
+                self.network.update(board_before_move, self.board)
+            if self.verify_score:
+                assert self.score == self.evaluate_score(), (
+                    f"Incremental score {self.score} does not match the "
+                    f"evaluated score {self.evaluate_score()}"
+                )
 
     def move_raw(self, start: int, end: int, track: bool = True) -> None:
         """
@@ -569,7 +871,10 @@ class Board:
                 f"There is no piece at {pos_to_coords[int(log2(start))]} to move."
             )
         moves = self.get_moves(side=side, piece=piece)
-        if not any((start, end) == (move[0], move[1]) for move in moves):
+        for move in moves:
+            if (start, end) == (move[0], move[1]):
+                break
+        else:
             raise MoveError(
                 f"{pos_to_coords[int(log2(start))]} to {pos_to_coords[int(log2(end))]} is not a valid move for {side}"
             )
@@ -639,6 +944,7 @@ class Board:
 
             end_pos = 2 ** coords_to_pos[groups[2].upper()]
             moves = self.get_moves(side, piece_moved)
+            promotion = None if groups[3] is None else san_piece_map[groups[3]]
 
             if groups[1] is None:
                 # No rank or file provided in the SAN
@@ -655,7 +961,7 @@ class Board:
                 self.move(
                     start=candidate_move[0],
                     end=candidate_move[1],
-                    score=candidate_move[2],
+                    promotion=promotion,
                 )
             elif groups[1].isalpha():
                 # File provided in the SAN
@@ -673,7 +979,7 @@ class Board:
                 self.move(
                     start=candidate_move[0],
                     end=candidate_move[1],
-                    score=candidate_move[2],
+                    promotion=promotion,
                 )
             elif groups[1].isnumeric():
                 # Rank provided in the SAN
@@ -691,14 +997,14 @@ class Board:
                 self.move(
                     start=candidate_move[0],
                     end=candidate_move[1],
-                    score=candidate_move[2],
+                    promotion=promotion,
                 )
             elif groups[1].isalnum():
                 # Both rank and file provided in the SAN
                 start_pos = 2 ** coords_to_pos[groups[1].upper()]
                 for m in moves:
                     if m[0] == start_pos and m[1] == end_pos:
-                        self.move(start=start_pos, end=end_pos, score=m[2])
+                        self.move(start=start_pos, end=end_pos, promotion=promotion)
                         break
                 else:
                     raise MoveError(f"{move} is not a valid move for {side}.")
@@ -725,17 +1031,37 @@ class Board:
             board,
             castle_type,
             prev_score,
+            prev_middlegame_score,
+            prev_endgame_score,
+            prev_phase,
             white_king_side_castle,
             white_queen_side_castle,
             black_king_side_castle,
             black_queen_side_castle,
+            en_passant_position,
+            promotion,
         ) = self.moves.pop()
+        if self.network is not None:
+            board_before_undo = self.board
         self.score = prev_score
+        self.middlegame_score = prev_middlegame_score
+        self.endgame_score = prev_endgame_score
+        self.phase = prev_phase
         self.white_king_side_castle = white_king_side_castle
         self.white_queen_side_castle = white_queen_side_castle
         self.black_king_side_castle = black_king_side_castle
         self.black_queen_side_castle = black_queen_side_castle
 
+        if promotion is not None:
+            # Turn the promoted piece back into a pawn before moving it back
+            moved_side = "white" if self.all_white & start else "black"
+            promoted_board = self.get_bitboard(moved_side, promotion)
+            self.set_bitboard(
+                moved_side, promotion, promoted_board & clear_position[start]
+            )
+            pawn_board = self.get_bitboard(moved_side, "pawns")
+            self.set_bitboard(moved_side, "pawns", pawn_board | mask_position[start])
+
         if castle_type is not None:
             if castle_type == "white_kingside":
                 self.move(start=start, end=end, track=False)  # Move king
@@ -753,10 +1079,13 @@ class Board:
             self.move(start=start, end=end, track=False)
             if side is not None:
                 self.set_bitboard(side, piece, board)
+        self.en_passant_position = en_passant_position
+        if self.network is not None:
+            self.network.update(board_before_undo, self.board)
 
     def get_moves(
         self, side: str, piece: str = None, position: int = None
-    ) -> list[tuple[int, int, int]]:
+    ) -> list[tuple[int, int]]:
         """
         Get all end positions a piece of side can reach starting from position.
         ``side`` is always required, piece and position are optional.
@@ -811,35 +1140,186 @@ class Board:
                     moves.extend(self.get_moves(side, piece, position))
             return moves
 
-    def search_forward(self, depth: int = 4) -> tuple[int, tuple[int, int, int]]:
+    def search_forward(
+        self,
+        depth: int = 4,
+        statistics: SearchStatistics = None,
+        max_nodes: int = None,
+        max_time: float = None,
+    ) -> Optional[tuple[int, tuple[int, int]]]:
         """
         Execute an alpha-beta pruned depth-first search to find the optimal move from
-        the current board state.
+        the current board state. The search is iteratively deepened one ply at a time
+        up to ``depth``, and the best move from each iteration is searched first in
+        the next one.
 
         :param depth: int - The number of plies to search (1 move is 2 plies). Default = 4 plies.
+        :param statistics: An optional ``chessengine.search.SearchStatistics`` object that
+            is filled in while the search runs. Its callback (if any) is called after every
+            completed iteration. Calling its ``stop`` method (e.g. from another thread) stops
+            the search, and the result of the last completed iteration is returned.
+        :param max_nodes: If passed, the search stops after roughly this many nodes and the
+            result of the last completed iteration is returned. A search limited only by depth
+            and nodes always returns the same result for the same board.
+        :param max_time: If passed, the search stops after roughly this many seconds and the
+            result of the last completed iteration is returned.
         :return: A 2-tuple where the first element is the best board score found, and the second
-            element is the best found move as a 2 tuple containing the start position and the end position
+            element is the best found move as a 2 tuple containing the start position and the end position.
+            ``None`` if the search was stopped before its first iteration completed.
         """
+        results = self._search(depth, 1, statistics, False, max_nodes, max_time)
+        if not results:
+            return None
+        best_score, best_move, _ = results[0]
+        return best_score, best_move
+
+    def search_multi_pv(
+        self,
+        depth: int = 4,
+        lines: int = 3,
+        statistics: SearchStatistics = None,
+        max_nodes: int = None,
+        max_time: float = None,
+    ) -> list[tuple[int, tuple[int, int], list[tuple[int, int]]]]:
+        """
+        Search for the ``lines`` best moves from the current board state, along with
+        the line of play (principal variation) expected after each of them. All the
+        lines are found in a single search, in which a move is only searched
+        precisely if it can beat the worst of the best moves found so far.
+
+        :param depth: The number of plies to search. Default = 4 plies.
+        :param lines: The number of moves to return. Default = 3.
+        :param statistics: An optional ``chessengine.search.SearchStatistics`` object,
+            see ``Board.search_forward``
+        :param max_nodes: An optional node limit, see ``Board.search_forward``
+        :param max_time: An optional time limit in seconds, see ``Board.search_forward``
+        :return: A list of at most ``lines`` 3-tuples ``(score, move, pv)``, best move first,
+            where ``pv`` is the list of moves expected to be played, starting with ``move``.
+            The list is empty if the search was stopped before its first iteration completed.
+        """
+        return self._search(depth, lines, statistics, True, max_nodes, max_time)
+
+    def _search(
+        self,
+        depth: int,
+        lines: int,
+        statistics: SearchStatistics,
+        collect_pv: bool,
+        max_nodes: int = None,
+        max_time: float = None,
+    ) -> list[tuple[int, tuple[int, int], list[tuple[int, int]]]]:
+        """
+        Search iteratively deeper up to ``depth`` and return the best ``lines``
+        root moves found by the last completed iteration, or an empty list if no
+        iteration completed.
+        """
+        if statistics is None:
+            statistics = SearchStatistics()
+        statistics.set_limits(max_nodes, max_time)
         maximize = self.side == "white"
-        best_score = -100000 if maximize else 100000
 
         moves = self.get_moves(self.side)
-        best_move = moves[0]
+        results = []
+
+        history_length = len(self.moves)
+        for current_depth in range(1, depth + 1):
+            statistics.start_iteration()
+            try:
+                iteration_results = self._search_root(
+                    moves, current_depth, maximize, statistics, lines, collect_pv
+                )
+            except SearchAborted:
+                # Take back the moves made by the interrupted iteration
+                while len(self.moves) > history_length:
+                    self.undo_move()
+                break
+            results = iteration_results
+            statistics.end_iteration(current_depth, results[0][0], results[0][1])
+
+            # Search the best move first in the next iteration. The other moves keep their
+            # order, so moves with the same score are picked the same way however many
+            # lines are searched.
+            best_move = results[0][1]
+            moves = [best_move] + [move for move in moves if move != best_move]
+        return results
+
+    def search_async(
+        self,
+        depth: int = 4,
+        executor=None,
+        max_nodes: int = None,
+        max_time: float = None,
+    ) -> AsyncSearch:
+        """
+        Start a search from the current board state in a worker thread, without
+        blocking the running asyncio event loop. Must be called from a coroutine.
+        See ``chessengine.search.AsyncSearch`` for how to follow, cancel and await
+        the search.
+
+        :param depth: The number of plies to search. Default = 4 plies.
+        :param executor: An optional ``concurrent.futures.Executor`` to run the search in
+        :param max_nodes: An optional node limit, see ``Board.search_forward``
+        :param max_time: An optional time limit in seconds, see ``Board.search_forward``
+        :return: A ``chessengine.search.AsyncSearch`` object for the running search
+        """
+        return AsyncSearch(self, depth, executor, max_nodes, max_time)
+
+    def _search_root(
+        self,
+        moves: list[tuple[int, int]],
+        depth: int,
+        maximize: bool,
+        statistics: SearchStatistics,
+        lines: int = 1,
+        collect_pv: bool = False,
+    ) -> list[tuple[int, tuple[int, int], list[tuple[int, int]]]]:
+        """
+        Search all the passed root moves to the passed depth and return the
+        best ``lines`` of them as ``(score, move, pv)`` tuples, best move first.
+        """
+        results = []
+        statistics.nodes += 1
+        if statistics.stopped:
+            raise SearchAborted("The search was stopped.")
 
         for move in moves:
-            self.move(start=move[0], end=move[1], score=move[2])
-            value = self.alpha_beta_search(
-                depth=depth - 1, maximizing_player=not maximize
-            )
+            # Only a move that beats the worst of the best moves found so far is
+            # interesting, so that score can be used to bound the search of the move
+            if len(results) < lines:
+                bound = -100000 if maximize else 100000
+            else:
+                bound = results[-1][0]
+            pv = [] if collect_pv else None
+
+            self.move(start=move[0], end=move[1])
+            if maximize:
+                value = self.alpha_beta_search(
+                    depth=depth - 1,
+                    alpha=bound,
+                    maximizing_player=False,
+                    statistics=statistics,
+                    pv=pv,
+                )
+            else:
+                value = self.alpha_beta_search(
+                    depth=depth - 1,
+                    beta=bound,
+                    maximizing_player=True,
+                    statistics=statistics,
+                    pv=pv,
+                )
             self.undo_move()
 
-            if maximize and value >= best_score:
-                best_score = value
-                best_move = move
-            elif not maximize and value <= best_score:
-                best_score = value
-                best_move = move
-        return best_score, best_move
+            if (
+                len(results) < lines
+                or (maximize and value > bound)
+                or (not maximize and value < bound)
+            ):
+                results.append((value, move, [move] + (pv or [])))
+                # The sort is stable, so earlier moves stay ahead of later ones with the same score
+                results.sort(key=lambda result: result[0], reverse=maximize)
+                del results[lines:]
+        return results
 
     def alpha_beta_search(
         self,
@@ -847,6 +1327,8 @@ class Board:
         alpha: int = -100000,
         beta: int = 100000,
         maximizing_player: bool = True,
+        statistics: SearchStatistics = None,
+        pv: list = None,
     ) -> int:
         """
         Execute an alpha-beta pruned search. You probably won't need to
@@ -856,33 +1338,67 @@ class Board:
         :param alpha: The minimum score that the maximizing player is guaranteed (default=-1000). You probably won't need to specify this argument.
         :param beta: The maximum score that the minimizing player is guaranteed (default=1000). You probably won't need to specify this argument.
         :param maximizing_player: True if white is searching for a move, False if black is searching for a move.
+        :param statistics: An optional ``chessengine.search.SearchStatistics`` object to count
+            the nodes and cutoffs of the search in.
+        :param pv: An optional list that is filled in with the best line of play found
+            from the current board state.
 
         :return: The score of the best board position found.
+        :raises SearchAborted: If the search was stopped or reached its limits through ``statistics``
         """
+        if statistics is not None:
+            statistics.nodes += 1
+            if statistics.stopped:
+                raise SearchAborted("The search was stopped.")
+            if (statistics.nodes - statistics.limit_start_nodes) & (
+                LIMIT_CHECK_INTERVAL - 1
+            ) == 0 and statistics.limit_reached():
+                raise SearchAborted("The search reached its limits.")
         if depth == 0:
-            return self.score
+            return self.evaluate()
 
+        child_pv = None
         if maximizing_player:
             value = -100000
-            moves = self.get_moves(self.side)
-            for move in moves:
-                self.move(start=move[0], end=move[1], score=move[2])
-                final_score = self.alpha_beta_search(depth - 1, alpha, beta, False)
-                value = max(value, final_score)
+            moves = self.get_moves("white")
+            for i, move in enumerate(moves):
+                if pv is not None:
+                    child_pv = []
+                self.move(start=move[0], end=move[1])
+                final_score = self.alpha_beta_search(
+                    depth - 1, alpha, beta, False, statistics, child_pv
+                )
                 self.undo_move()
+                if final_score > value:
+                    value = final_score
+                    if pv is not None:
+                        pv[:] = [move] + child_pv
                 if value >= beta:
+                    if statistics is not None:
+                        statistics.beta_cutoffs += 1
+                        statistics.first_move_cutoffs += i == 0
                     break
                 alpha = max(alpha, value)
             return value
         else:
             value = 100000
-            moves = self.get_moves(self.opponent_side)
-            for move in moves:
-                self.move(start=move[0], end=move[1], score=move[2])
-                final_score = self.alpha_beta_search(depth - 1, alpha, beta, True)
-                value = min(value, final_score)
+            moves = self.get_moves("black")
+            for i, move in enumerate(moves):
+                if pv is not None:
+                    child_pv = []
+                self.move(start=move[0], end=move[1])
+                final_score = self.alpha_beta_search(
+                    depth - 1, alpha, beta, True, statistics, child_pv
+                )
                 self.undo_move()
+                if final_score < value:
+                    value = final_score
+                    if pv is not None:
+                        pv[:] = [move] + child_pv
                 if value <= alpha:
+                    if statistics is not None:
+                        statistics.beta_cutoffs += 1
+                        statistics.first_move_cutoffs += i == 0
                     break
                 beta = min(beta, value)
             return value
@@ -942,72 +1458,90 @@ class Board:
                 lines_added += 1
         return move, lines_added, False
 
-    def play(self, search_depth: int = 4) -> None:
+    def play(
+        self, search_depth: int = 4, ponder: bool = False, book_file: str = None
+    ) -> None:
         """
         Play a game of chess against the computer.
 
         :param search_depth: The number of plies the computer should search forward. Be careful
             passing values about 4 as the search depth. It increases the running time of the
             move search exponentially.
+        :param ponder: If ``True``, the computer searches the player's possible replies in the
+            background while the player is entering their move (see ``chessengine.search.Ponderer``),
+            and answers immediately if the reply made has already been searched.
+        :param book_file: The path of a book file written by ``chessengine.pgn.polyglot.write_book_file``
+            to use as the opening book. The compiled opening book is used if not passed.
         """
-        parser = None
-        if pkg_resources is not None:
-            loading_messages = [
-                "Searching for opening moves.",
-                "Reading an opening book.",
-                "Waking up.",
-                "Building move tree.",
-            ]
-
-            parser = PGNParser()
-            print(random.choice(loading_messages))
-            opening_files = pkg_resources.contents("chessengine.openings")
-            for child in opening_files:
-                file_path = pkg_resources.path("chessengine.openings", child)
-                with file_path as f:
-                    if f.suffix == ".pgn":
-                        print(".", end="", flush=True)
-                        parser.parse(f)
-            print(f"\nRead through {len(parser.games)} games.")
-        sleep(1)
+        loading_messages = [
+            "Searching for opening moves.",
+            "Reading an opening book.",
+            "Waking up.",
+            "Building move tree.",
+        ]
+        print(random.choice(loading_messages))
+        if book_file is not None:
+            book = MappedBook(book_file)
+            print(f"Opened a book with {len(book)} moves.")
+        else:
+            book = load_position_book()
+            print(f"Read through {len(book)} book positions.")
         print(f"Set search depth to {search_depth}")
-        sleep(0.7)
 
         print(self)
         side_to_move = "white"
-        in_game_tree = parser is not None
-        current_node = parser.root_node if in_game_tree else None
+        in_book = True
         lines_printed = 11
         last_move = ""
+        ponder_result = None
         while True:
             clear_lines(lines_printed)
             print(self)
             lines_printed = 11
             if side_to_move == self.side:
-                if in_game_tree:
-                    move, node = random.choice(list(current_node.children.items()))
-                    self.move_san(move=move, side=side_to_move)
-                    current_node = node
-                    last_move = f"Board moves {move}"
+                # The book is probed by position, so it is found again after transpositions
+                book_moves = book.probe(self, side_to_move)
+                in_book = bool(book_moves)
+                if in_book:
+                    # Moves played in more games are picked more often
+                    move = random.choices(
+                        list(book_moves), weights=list(book_moves.values())
+                    )[0]
+                    if isinstance(move, tuple):
+                        # Book files store moves as (start, end, promotion)
+                        self.move(move[0], move[1], promotion=move[2])
+                        last_move = f"Board moves from {pos_to_coords[log2(move[0])]} to {pos_to_coords[log2(move[1])]}"
+                    else:
+                        self.move_san(move=move, side=side_to_move)
+                        last_move = f"Board moves {move}"
                 else:
-                    best_score, best_move = self.search_forward(search_depth)
+                    if ponder_result is not None:
+                        best_score, best_move = ponder_result
+                    else:
+                        best_score, best_move = self.search_forward(search_depth)
                     self.move(best_move[0], best_move[1])
                     last_move = f"Board moves from {pos_to_coords[log2(best_move[0])]} to {pos_to_coords[log2(best_move[1])]}"
             else:
+                ponderer = None
+                if ponder and not in_book:
+                    ponderer = Ponderer(self, side_to_move, search_depth)
                 move, lines_added, move_undone = self.handle_player_move(
                     side_to_move, last_move
                 )
                 lines_printed += lines_added
                 last_move = f"{side_to_move.capitalize()} moved {move}"
 
+                ponder_result = None
+                if ponderer is not None:
+                    if move_undone:
+                        ponderer.stop()
+                    else:
+                        start, end = self.moves[-1][:2]
+                        ponder_result = ponderer.result_for(start, end)
+
                 if move_undone:
                     # return to outer loop, so both sides need to make a new move
                     continue
-                if in_game_tree:
-                    try:
-                        current_node = current_node.get_child(move)
-                    except GameNodeError:
-                        in_game_tree = False
                 print(f"You moved {move}")
                 lines_printed += 1
 
@@ -28,7 +28,7 @@ def prompt_player_side() -> str:
     return side
 
 
-def play(play_with_player: bool) -> None:
+def play(play_with_player: bool, ponder: bool = False, book: str = None) -> None:
     board = Board("black")
     if play_with_player:
         board.play_pvp()
@@ -37,11 +37,55 @@ def play(play_with_player: bool) -> None:
 
         if player_side.startswith("b"):
             board = Board("white")
-        board.play()
-
-
-def update():
-    print("Work in progress.")
+        board.play(ponder=ponder, book_file=book)
+
+
+def update(files: list[str], book: str, processes: int) -> None:
+    from chessengine.pgn.book import update_book, default_book_path
+
+    book = book or default_book_path()
+    added = update_book(files, book, processes)
+    for file, games in added.items():
+        if games is None:
+            print(f"Skipped {file}, it is already in the book.")
+        else:
+            print(f"Added {games} games from {file}.")
+    print(f"Updated the opening book at {book}")
+
+
+def build_book(files: list[str], output: str, max_plies: int, run_size: int) -> None:
+    from chessengine.pgn.polyglot import build_book_file
+
+    print(f"Building a book from {len(files)} file(s)...")
+    count = build_book_file(files, output, max_plies=max_plies, run_size=run_size)
+    print(f"Wrote {count} moves to {output}")
+
+
+def tune(
+    files: list[str],
+    output: str,
+    epochs: int,
+    batch_size: int,
+    learning_rate: float,
+    skip_plies: int,
+) -> None:
+    from chessengine.tuning import TexelTuner, load_positions
+
+    print(f"Loading positions from {len(files)} file(s)...")
+    positions, results = load_positions(files, skip_plies=skip_plies)
+    tuner = TexelTuner(positions, results)
+    print(
+        f"Loaded {len(tuner)} positions. K = {tuner.scaling_constant:.3f}, "
+        f"loss = {tuner.loss():.6f}"
+    )
+    tuner.fit(
+        epochs=epochs,
+        batch_size=batch_size,
+        learning_rate=learning_rate,
+        callback=lambda epoch, loss: print(f"Epoch {epoch + 1}: loss = {loss:.6f}"),
+    )
+    tuner.write_tables(output)
+    print(f"Wrote the tuned tables to {output}")
 
 
 @handle_error
@@ -68,13 +112,100 @@ def main():
         action="store_true",
     )
 
-    parser_update = subparsers.add_parser("update", help="Update something.")
+    parser_play.add_argument(
+        "--ponder",
+        help="Let the computer think while you are entering your move.",
+        required=False,
+        action="store_true",
+    )
+    parser_play.add_argument(
+        "--book",
+        help="A book file to use as the opening book.",
+        required=False,
+        default=None,
+    )
+
+    parser_update = subparsers.add_parser(
+        "update", help="Add the games in PGN files to the opening book."
+    )
+    parser_update.add_argument("files", nargs="+", help="PGN files to add.")
+    parser_update.add_argument(
+        "--book",
+        help="The compiled opening book to update. Defaults to the book used by play.",
+        default=None,
+    )
+    parser_update.add_argument(
+        "--processes",
+        help="Processes used to parse every file.",
+        type=int,
+        default=None,
+    )
+
+    parser_book = subparsers.add_parser(
+        "book", help="Build a book file from PGN files, for play --book."
+    )
+    parser_book.add_argument(
+        "files", nargs="+", help="PGN files to build the book from."
+    )
+    parser_book.add_argument(
+        "-o", "--output", help="The book file to write.", default="book.bin"
+    )
+    parser_book.add_argument(
+        "--max-plies",
+        help="Only add moves up to this many plies from the start.",
+        type=int,
+        default=None,
+    )
+    parser_book.add_argument(
+        "--run-size",
+        help="Moves counted in memory before they are written to disk.",
+        type=int,
+        default=2**20,
+    )
+
+    parser_tune = subparsers.add_parser(
+        "tune",
+        help="Tune the piece values and piece square tables on PGN or EPD files. Needs NumPy.",
+    )
+    parser_tune.add_argument("files", nargs="+", help="PGN or EPD files to tune on.")
+    parser_tune.add_argument(
+        "-o",
+        "--output",
+        help="The Python module to write the tuned tables to.",
+        default="tuned_tables.py",
+    )
+    parser_tune.add_argument(
+        "--epochs", help="Passes over the positions.", type=int, default=10
+    )
+    parser_tune.add_argument(
+        "--batch-size", help="Positions used per step.", type=int, default=16384
+    )
+    parser_tune.add_argument(
+        "--learning-rate", help="The size of each step.", type=float, default=1.0
+    )
+    parser_tune.add_argument(
+        "--skip-plies",
+        help="Plies at the start of every PGN game that are not used.",
+        type=int,
+        default=8,
+    )
 
     args = parser.parse_args()
     if args.action == "play":
-        play(args.player)
+        play(args.player, args.ponder, args.book)
     elif args.action == "update":
-        update()
+        update(args.files, args.book, args.processes)
+    elif args.action == "book":
+        build_book(args.files, args.output, args.max_plies, args.run_size)
+    elif args.action == "tune":
+        tune(
+            args.files,
+            args.output,
+            args.epochs,
+            args.batch_size,
+            args.learning_rate,
+            args.skip_plies,
+        )
     else:
         parser.print_help()
 
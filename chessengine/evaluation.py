@@ -0,0 +1,263 @@
+"""
+Evaluation terms that are added on top of the incrementally updated material and
+piece square table score of a ``chessengine.bitboard.Board``, and the caches that
+make them cheap to use during a search.
+"""
+
+
+from chessengine.lookup_tables import (
+    mask_file,
+    mask_rank,
+    mask_adjacent_files,
+    mask_ranks_below,
+    mask_ranks_above,
+    white_passed_pawn_mask,
+    black_passed_pawn_mask,
+    king_attack_masks,
+)
+
+
+DOUBLED_PAWN_PENALTY = 10
+ISOLATED_PAWN_PENALTY = 15
+BACKWARD_PAWN_PENALTY = 8
+# The bonus for a passed pawn, indexed by its rank counted from its own side (0 to 7)
+PASSED_PAWN_BONUS = [0, 5, 10, 20, 35, 60, 100, 0]
+
+# The bonus for every square a piece attacks that is not occupied by its own side
+MOBILITY_BONUS = {"queens": 1, "rooks": 2, "bishops": 4, "knights": 4}
+# The penalty for every square next to the king that the opponent attacks
+KING_ZONE_ATTACK_PENALTY = 8
+# The penalty for a piece (other than the king) that is attacked and not defended
+HANGING_PIECE_PENALTY = 20
+# The bonus for a piece (other than the king) that is defended by its own side
+DEFENDED_PIECE_BONUS = 2
+
+_not_a_file = ~mask_file[1] & 0xFFFFFFFFFFFFFFFF
+_not_h_file = ~mask_file[8] & 0xFFFFFFFFFFFFFFFF
+
+
+def _pawn_terms(
+    pawns: int,
+    enemy_pawns: int,
+    enemy_attacks: int,
+    passed_pawn_mask: list[int],
+    white: bool,
+) -> int:
+    """
+    Score the pawn structure of one side. Positive scores are good for that side.
+    """
+    score = 0
+    for file in range(1, 9):
+        file_pawns = pawns & mask_file[file]
+        if not file_pawns:
+            continue
+        count = bin(file_pawns).count("1")
+        score -= DOUBLED_PAWN_PENALTY * (count - 1)
+        if not pawns & mask_adjacent_files[file]:
+            score -= ISOLATED_PAWN_PENALTY * count
+            continue
+
+        # Backward pawns have no friendly pawns beside or behind them on the adjacent
+        # files, and can't advance without being captured by an enemy pawn
+        behind = mask_ranks_below if white else mask_ranks_above
+        while file_pawns:
+            position = file_pawns & -file_pawns
+            file_pawns ^= position
+            rank = (position.bit_length() - 1) // 8 + 1
+            support = mask_adjacent_files[file] & (behind[rank] | mask_rank[rank])
+            stop_square = position << 8 if white else position >> 8
+            if not pawns & support and stop_square & enemy_attacks:
+                score -= BACKWARD_PAWN_PENALTY
+
+    remaining = pawns
+    while remaining:
+        position = remaining & -remaining
+        remaining ^= position
+        index = position.bit_length() - 1
+        if not enemy_pawns & passed_pawn_mask[index]:
+            relative_rank = index // 8 if white else 7 - index // 8
+            score += PASSED_PAWN_BONUS[relative_rank]
+    return score
+
+
+def evaluate_pawn_structure(white_pawns: int, black_pawns: int) -> int:
+    """
+    Evaluate the pawn structure of a position from its pawn bitboards. Doubled, isolated
+    and backward pawns are penalized and passed pawns get a bonus that grows as they
+    advance. The terms are computed a file at a time using the masks in
+    ``chessengine.lookup_tables``.
+
+    :param white_pawns: The bitboard of the white pawns
+    :param black_pawns: The bitboard of the black pawns
+    :return: The pawn structure score. A positive score favors white, a negative score favors black.
+    """
+    white_attacks = ((white_pawns << 9) & _not_a_file) | (
+        (white_pawns << 7) & _not_h_file
+    )
+    black_attacks = ((black_pawns >> 7) & _not_a_file) | (
+        (black_pawns >> 9) & _not_h_file
+    )
+    return _pawn_terms(
+        white_pawns, black_pawns, black_attacks, white_passed_pawn_mask, True
+    ) - _pawn_terms(
+        black_pawns, white_pawns, white_attacks, black_passed_pawn_mask, False
+    )
+
+
+def evaluate_attacks(board, attack_maps) -> int:
+    """
+    Evaluate the mobility, king safety and attacked and defended pieces of a position
+    from its attack maps. Pieces are rewarded for the squares they attack, kings are
+    penalized for every square next to them that the opponent attacks, pieces that are
+    attacked and not defended are penalized and defended pieces get a small bonus.
+
+    :param board: A ``chessengine.bitboard.Board``
+    :param attack_maps: The ``chessengine.attacks.AttackMaps`` of the board, usually
+        ``Board.attack_maps()``
+    :return: The score of these terms. A positive score favors white, a negative score favors black.
+    """
+    score = 0
+    for side, sign, own, opponent in (
+        ("white", 1, board.all_white, "black"),
+        ("black", -1, board.all_black, "white"),
+    ):
+        side_score = 0
+        for piece, bonus in MOBILITY_BONUS.items():
+            side_score += bonus * attack_maps.mobility[(side, piece)]
+
+        king = board.get_bitboard(side, "kings")
+        if king:
+            king_zone = king_attack_masks[king.bit_length() - 1]
+            side_score -= KING_ZONE_ATTACK_PENALTY * bin(
+                king_zone & attack_maps.side_attacks[opponent]
+            ).count("1")
+
+        pieces = own & ~king
+        defended = pieces & attack_maps.side_attacks[side]
+        hanging = pieces & attack_maps.side_attacks[opponent] & ~defended
+        side_score += DEFENDED_PIECE_BONUS * bin(defended).count("1")
+        side_score -= HANGING_PIECE_PENALTY * bin(hanging).count("1")
+        score += sign * side_score
+    return score
+
+
+class PawnHashTable:
+    """
+    A fixed size cache of pawn structure scores, keyed by the pawn bitboards only.
+    Pawn structures change rarely between the positions visited by a search, so
+    most lookups are hits and the pawn terms are almost free to use.
+
+    Every entry stores the pawn bitboards it was computed from, so a lookup never
+    returns the score of a different pawn structure. When two pawn structures map
+    to the same slot, the newer one replaces the older one.
+
+    :param size: The number of entries in the table. Must be a power of 2.
+    :ivar hits: The number of lookups answered from the table
+    :ivar misses: The number of lookups that had to evaluate the pawn structure
+    """
+
+    def __init__(self, size: int = 2**14) -> None:
+        if size <= 0 or size & (size - 1):
+            raise ValueError(f"size must be a power of 2. Got {size}")
+        self.size = size
+        self._entries = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"<chessengine.PawnHashTable: {self.size} entries, {self.hits} hits, {self.misses} misses>"
+
+    def __len__(self):
+        return self.size - self._entries.count(None)
+
+    def probe(self, white_pawns: int, black_pawns: int) -> int:
+        """
+        Return the pawn structure score of the given pawns, evaluating and storing it
+        if it is not in the table.
+
+        :param white_pawns: The bitboard of the white pawns
+        :param black_pawns: The bitboard of the black pawns
+        :return: The pawn structure score, same as ``evaluate_pawn_structure``
+        """
+        index = hash((white_pawns, black_pawns)) & (self.size - 1)
+        entry = self._entries[index]
+        if entry is not None and entry[0] == white_pawns and entry[1] == black_pawns:
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        score = evaluate_pawn_structure(white_pawns, black_pawns)
+        # Store the whole entry at once, so a table shared between threads never has a torn entry
+        self._entries[index] = (white_pawns, black_pawns, score)
+        return score
+
+    def clear(self) -> None:
+        """
+        Remove all the entries from the table and reset the counters.
+        """
+        self._entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+
+class EvaluationCache:
+    """
+    A fixed size cache of evaluations, keyed by the whole position. Positions are
+    often evaluated more than once during a search, after transpositions and when
+    iterative deepening searches the same tree again, and the cache saves evaluating
+    them again.
+
+    Every entry stores the key of the position it was computed for, so a lookup never
+    returns the evaluation of a different position. When two positions map to the same
+    slot, the newer one replaces the older one.
+
+    :param size: The number of entries in the cache. Must be a power of 2.
+    :ivar hits: The number of lookups that found the position in the cache
+    :ivar misses: The number of lookups that didn't find the position in the cache
+    """
+
+    def __init__(self, size: int = 2**16) -> None:
+        if size <= 0 or size & (size - 1):
+            raise ValueError(f"size must be a power of 2. Got {size}")
+        self.size = size
+        self._entries = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"<chessengine.EvaluationCache: {self.size} entries, {self.hits} hits, {self.misses} misses>"
+
+    def __len__(self):
+        return self.size - self._entries.count(None)
+
+    def get(self, key: tuple):
+        """
+        Look up the evaluation of a position.
+
+        :param key: The key of the position, as returned by ``Board.position_key``
+        :return: The stored evaluation, or ``None`` if the position is not in the cache
+        """
+        entry = self._entries[hash(key) & (self.size - 1)]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def store(self, key: tuple, score: int) -> None:
+        """
+        Store the evaluation of a position, replacing whatever was stored in its slot.
+
+        :param key: The key of the position, as returned by ``Board.position_key``
+        :param score: The evaluation of the position
+        """
+        # Store the whole entry at once, so a cache shared between threads never has a torn entry
+        self._entries[hash(key) & (self.size - 1)] = (key, score)
+
+    def clear(self) -> None:
+        """
+        Remove all the entries from the cache and reset the counters.
+        """
+        self._entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
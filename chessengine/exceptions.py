@@ -23,3 +23,9 @@ class GameNodeError(Exception):
     """A GameNode was not found in the game tree"""
 
     pass
+
+
+class SearchAborted(Exception):
+    """A search was stopped before it could complete"""
+
+    pass
@@ -4,6 +4,9 @@ formats, as well as utility bitboards that let you mask or clear individual rank
 or positions on the chess board.
 """
 
+
+import random
+
 pos_to_coords = {
     0: "A1",
     1: "B1",
@@ -341,6 +344,15 @@ san_piece_map = {
     "\u265F": "pawns",
 }
 
+piece_values = {
+    "pawns": 100,
+    "rooks": 500,
+    "knights": 320,
+    "bishops": 330,
+    "queens": 900,
+    "kings": 20000,
+}
+
 # fmt: off
 
 piece_square_table = {
@@ -423,13 +435,13 @@ piece_square_table = {
     
     ('black', 'queens'): [
         -20, -10, -10, -5, -5, -10, -10, -20,
-        -10, 0, 0, 0, 0, 0, 0, -10,
-        -10, 0, 5, 5, 5, 5, 0, -10,
-        -5, 0, 5, 5, 5, 5, 0, -5,
-        0, 0, 5, 5, 5, 5, 0, -5,
-        -10, 5, 5, 5, 5, 5, 0, -10,
         -10, 0, 5, 0, 0, 0, 0, -10,
-        -20, -10, -10, -5, -5, -10, -10, -20
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
     ],
     
     ('black', 'rooks'): [
@@ -456,13 +468,13 @@ piece_square_table = {
     
     ('black', 'knights'): [
         -50, -40, -30, -30, -30, -30, -40, -50,
-        -40, -20, 0, 0, 0, 0, -20, -40,
-        -30, 0, 10, 15, 15, 10, 0, -30,
-        -30, 5, 15, 20, 20, 15, 5, -30,
-        -30, 0, 15, 20, 20, 15, 0, -30,
-        -30, 5, 10, 15, 15, 10, 5, -30,
         -40, -20, 0, 5, 5, 0, -20, -40,
-        -50, -40, -30, -30, -30, -30, -40, -50
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
     ],
     
     ('black', 'pawns'): [
@@ -478,3 +490,200 @@ piece_square_table = {
 }
 
 # fmt: on
+
+# fmt: off
+
+# Piece square tables used once most of the pieces have left the board. The king should
+# move to the centre and pawns should advance, the other pieces use the same tables as
+# in the middlegame.
+endgame_piece_square_table = {
+    **piece_square_table,
+
+    ('white', 'kings'): [
+        -50, -30, -30, -30, -30, -30, -30, -50,
+        -30, -30, 0, 0, 0, 0, -30, -30,
+        -30, -10, 20, 30, 30, 20, -10, -30,
+        -30, -10, 30, 40, 40, 30, -10, -30,
+        -30, -10, 30, 40, 40, 30, -10, -30,
+        -30, -10, 20, 30, 30, 20, -10, -30,
+        -30, -20, -10, 0, 0, -10, -20, -30,
+        -50, -40, -30, -20, -20, -30, -40, -50
+    ],
+
+    ('white', 'pawns'): [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        10, 10, 10, 10, 10, 10, 10, 10,
+        10, 10, 10, 10, 10, 10, 10, 10,
+        20, 20, 20, 20, 20, 20, 20, 20,
+        30, 30, 30, 30, 30, 30, 30, 30,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        80, 80, 80, 80, 80, 80, 80, 80,
+        0, 0, 0, 0, 0, 0, 0, 0
+    ],
+
+    ('black', 'kings'): [
+        -50, -40, -30, -20, -20, -30, -40, -50,
+        -30, -20, -10, 0, 0, -10, -20, -30,
+        -30, -10, 20, 30, 30, 20, -10, -30,
+        -30, -10, 30, 40, 40, 30, -10, -30,
+        -30, -10, 30, 40, 40, 30, -10, -30,
+        -30, -10, 20, 30, 30, 20, -10, -30,
+        -30, -30, 0, 0, 0, 0, -30, -30,
+        -50, -30, -30, -30, -30, -30, -30, -50,
+    ],
+
+    ('black', 'pawns'): [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        80, 80, 80, 80, 80, 80, 80, 80,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        30, 30, 30, 30, 30, 30, 30, 30,
+        20, 20, 20, 20, 20, 20, 20, 20,
+        10, 10, 10, 10, 10, 10, 10, 10,
+        10, 10, 10, 10, 10, 10, 10, 10,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+}
+
+# fmt: on
+
+# How much each piece counts towards the game phase. The phase is MAX_PHASE with all
+# the pieces on the board (middlegame) and goes down to 0 as pieces are captured (endgame)
+phase_values = {
+    "pawns": 0,
+    "rooks": 2,
+    "knights": 1,
+    "bishops": 1,
+    "queens": 4,
+    "kings": 0,
+}
+MAX_PHASE = 24
+
+# Maps a side and piece to the value of the piece on every square, i.e. its material value
+# plus its piece_square_table value. Black's values are negative, so the evaluation of a
+# board is the sum of the values of all its pieces.
+material_square_table = {
+    (side, piece): [
+        (1 if side == "white" else -1) * (piece_values[piece] + square_value)
+        for square_value in table
+    ]
+    for (side, piece), table in piece_square_table.items()
+}
+
+# Same as material_square_table, for the endgame piece square tables
+endgame_material_square_table = {
+    (side, piece): [
+        (1 if side == "white" else -1) * (piece_values[piece] + square_value)
+        for square_value in table
+    ]
+    for (side, piece), table in endgame_piece_square_table.items()
+}
+
+# Maps files to a bitboard having 1s only on the files next to it
+mask_adjacent_files = {
+    file: mask_file.get(file - 1, 0) | mask_file.get(file + 1, 0)
+    for file in range(1, 9)
+}
+
+# Maps ranks to a bitboard having 1s only on the ranks above (towards rank 8) or below it
+mask_ranks_above = {
+    rank: sum(mask_rank[r] for r in range(rank + 1, 9)) for rank in range(1, 9)
+}
+mask_ranks_below = {
+    rank: sum(mask_rank[r] for r in range(1, rank)) for rank in range(1, 9)
+}
+
+# Maps position indices to the squares that must be free of enemy pawns for a pawn on that
+# square to be passed, i.e. the squares in front of it on its own and the adjacent files
+white_passed_pawn_mask = [
+    (mask_file[index % 8 + 1] | mask_adjacent_files[index % 8 + 1])
+    & mask_ranks_above[index // 8 + 1]
+    for index in range(64)
+]
+black_passed_pawn_mask = [
+    (mask_file[index % 8 + 1] | mask_adjacent_files[index % 8 + 1])
+    & mask_ranks_below[index // 8 + 1]
+    for index in range(64)
+]
+
+
+def _step_masks(steps: list[tuple[int, int]]) -> list[int]:
+    """
+    Build a list mapping position indices to the squares one step away in any of the
+    passed (rank, file) steps.
+    """
+    masks = []
+    for index in range(64):
+        rank, file = divmod(index, 8)
+        mask = 0
+        for rank_step, file_step in steps:
+            if 0 <= rank + rank_step < 8 and 0 <= file + file_step < 8:
+                mask |= 1 << ((rank + rank_step) * 8 + file + file_step)
+        masks.append(mask)
+    return masks
+
+
+def _ray_masks(rank_step: int, file_step: int) -> list[int]:
+    """
+    Build a list mapping position indices to the squares a sliding piece on that
+    square passes over when moving in the (rank, file) direction on an empty board.
+    """
+    masks = []
+    for index in range(64):
+        rank, file = divmod(index, 8)
+        mask = 0
+        rank += rank_step
+        file += file_step
+        while 0 <= rank < 8 and 0 <= file < 8:
+            mask |= 1 << (rank * 8 + file)
+            rank += rank_step
+            file += file_step
+        masks.append(mask)
+    return masks
+
+
+# Maps position indices to the squares attacked by a knight or a king on that square
+knight_attack_masks = _step_masks(
+    [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+)
+king_attack_masks = _step_masks(
+    [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+)
+
+# Maps a (rank, file) direction to a list mapping position indices to the squares a
+# sliding piece on that square attacks in that direction on an empty board
+ray_masks = {
+    direction: _ray_masks(*direction)
+    for direction in [
+        (1, 0),
+        (-1, 0),
+        (0, 1),
+        (0, -1),
+        (1, 1),
+        (1, -1),
+        (-1, 1),
+        (-1, -1),
+    ]
+}
+
+
+# Random 64 bit keys for Zobrist hashing. A position's key is the XOR of the keys of
+# its pieces on their squares, its castling rights, the file of a pawn that can be
+# captured en passant and whether black is to move. The keys are generated from a
+# fixed seed in a fixed order, so keys stored in files stay valid.
+_zobrist_random = random.Random(0x3C8E5A2F)
+zobrist_piece_keys = {
+    (side, piece): [_zobrist_random.getrandbits(64) for _ in range(64)]
+    for side in ("white", "black")
+    for piece in ("kings", "queens", "rooks", "bishops", "knights", "pawns")
+}
+zobrist_castling_keys = {
+    castle: _zobrist_random.getrandbits(64)
+    for castle in (
+        "white_king_side_castle",
+        "white_queen_side_castle",
+        "black_king_side_castle",
+        "black_queen_side_castle",
+    )
+}
+zobrist_en_passant_keys = [_zobrist_random.getrandbits(64) for _ in range(8)]
+zobrist_black_to_move_key = _zobrist_random.getrandbits(64)
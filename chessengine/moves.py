@@ -3,7 +3,8 @@ Functions for generating moves for all supported pieces in all supported scenari
 """
 
 
-from chessengine.utils import get_rank, get_file, score_from_move
+from chessengine.attacks import is_square_attacked
+from chessengine.utils import get_rank, get_file
 
 HIGHEST_SQUARE = 2**63
 
@@ -14,7 +15,7 @@ def check_valid_position(
     piece: str,
     start: int,
     end: int,
-    moves: list[tuple[int, int, int]],
+    moves: list[tuple[int, int]],
     auto_add: bool = True,
 ) -> tuple[bool, bool]:
     """
@@ -34,27 +35,21 @@ def check_valid_position(
         return False, True
     if end & board.all_pieces == 0:
         if auto_add:
-            end_side, end_piece, end_board = board.identify_piece_at(end)
-            score = score_from_move(side, piece, start, end, end_piece, board.score)
-            moves.append((start, end, score))
+            moves.append((start, end))
         return True, False
     elif side == "white" and end & board.all_white == 0:
         if auto_add:
-            end_side, end_piece, end_board = board.identify_piece_at(end)
-            score = score_from_move(side, piece, start, end, end_piece, board.score)
-            moves.append((start, end, score))
+            moves.append((start, end))
         return True, True
     elif side == "black" and end & board.all_black == 0:
         if auto_add:
-            end_side, end_piece, end_board = board.identify_piece_at(end)
-            score = score_from_move(side, piece, start, end, end_piece, board.score)
-            moves.append((start, end, score))
+            moves.append((start, end))
         return True, True
     else:
         return False, True
 
 
-def get_rook_moves(board, side: str, position: int) -> list[tuple[int, int, int]]:
+def get_rook_moves(board, side: str, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a rook of side=side can reach starting at position
 
@@ -110,7 +105,7 @@ def get_rook_moves(board, side: str, position: int) -> list[tuple[int, int, int]
     return moves
 
 
-def get_white_rook_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_rook_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white rook starting at position can reach
 
@@ -120,7 +115,7 @@ def get_white_rook_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_rook_moves(board, "white", position)
 
 
-def get_black_rook_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_rook_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black rook starting at position can reach
 
@@ -130,7 +125,7 @@ def get_black_rook_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_rook_moves(board, "black", position)
 
 
-def get_bishop_moves(board, side: str, position: int) -> list[tuple[int, int, int]]:
+def get_bishop_moves(board, side: str, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a bishop of side=side can reach starting at position
 
@@ -181,7 +176,7 @@ def get_bishop_moves(board, side: str, position: int) -> list[tuple[int, int, in
     return moves
 
 
-def get_white_bishop_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_bishop_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white bishop starting at position can reach
 
@@ -191,7 +186,7 @@ def get_white_bishop_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_bishop_moves(board, "white", position)
 
 
-def get_black_bishop_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_bishop_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black bishop starting at position can reach
 
@@ -201,7 +196,7 @@ def get_black_bishop_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_bishop_moves(board, "black", position)
 
 
-def get_knight_moves(board, side: str, position: int) -> list[tuple[int, int, int]]:
+def get_knight_moves(board, side: str, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a knight starting at position can reach
 
@@ -248,7 +243,7 @@ def get_knight_moves(board, side: str, position: int) -> list[tuple[int, int, in
     return moves
 
 
-def get_white_knight_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_knight_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white knight starting at position can reach
 
@@ -258,7 +253,7 @@ def get_white_knight_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_knight_moves(board, "white", position)
 
 
-def get_black_knight_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_knight_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black knight starting at position can reach
 
@@ -268,7 +263,7 @@ def get_black_knight_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_knight_moves(board, "black", position)
 
 
-def get_king_moves(board, side: str, position: int) -> list[tuple[int, int, int]]:
+def get_king_moves(board, side: str, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a king starting at position can reach
 
@@ -313,24 +308,39 @@ def get_king_moves(board, side: str, position: int) -> list[tuple[int, int, int]
         _ = position << 1
         check_valid_position(board, side, "kings", position, _, moves)
 
+    # The king can't castle out of, through or into check
+    castles = []
     if side == "white":
         if board.white_queen_side_castle:
             if (2**1 + 2**2 + 2**3) & board.all_pieces == 0:
-                moves.append((2**4, 2**2, None))
+                if not any(
+                    is_square_attacked(board, index, "black") for index in (2, 3, 4)
+                ):
+                    castles.append((2**4, 2**2))
         if board.white_king_side_castle:
             if (2**5 + 2**6) & board.all_pieces == 0:
-                moves.append((2**4, 2**6, None))
+                if not any(
+                    is_square_attacked(board, index, "black") for index in (4, 5, 6)
+                ):
+                    castles.append((2**4, 2**6))
     elif side == "black":
         if board.black_queen_side_castle:
             if (2**57 + 2**58 + 2**59) & board.all_pieces == 0:
-                moves.append((2**60, 2**58, None))
+                if not any(
+                    is_square_attacked(board, index, "white") for index in (58, 59, 60)
+                ):
+                    castles.append((2**60, 2**58))
         if board.black_king_side_castle:
             if (2**61 + 2**62) & board.all_pieces == 0:
-                moves.append((2**60, 2**62, None))
+                if not any(
+                    is_square_attacked(board, index, "white") for index in (60, 61, 62)
+                ):
+                    castles.append((2**60, 2**62))
+    moves.extend(castles)
     return moves
 
 
-def get_white_king_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_king_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white king starting at position can reach
 
@@ -340,7 +350,7 @@ def get_white_king_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_king_moves(board, "white", position)
 
 
-def get_black_king_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_king_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black king starting at position can reach
 
@@ -350,31 +360,31 @@ def get_black_king_moves(board, position: int) -> list[tuple[int, int, int]]:
     return get_king_moves(board, "black", position)
 
 
-def get_white_queen_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_queen_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white queen starting at position can reach
 
     :param board: A :ref:`chessengine.bitboard.Board <Board>` object
     :param position: The position the queen starts on. See :ref:`position_representation`
     """
-    return get_white_rook_moves(board, position) + get_white_bishop_moves(
-        board, position
+    return get_rook_moves(board, "white", position) + get_bishop_moves(
+        board, "white", position
     )
 
 
-def get_black_queen_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_queen_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black queen starting at position can reach
 
     :param board: A :ref:`chessengine.bitboard.Board <Board>` object
     :param position: The position the queen starts on. See :ref:`position_representation`
     """
-    return get_black_rook_moves(board, position) + get_black_bishop_moves(
-        board, position
+    return get_rook_moves(board, "black", position) + get_bishop_moves(
+        board, "black", position
     )
 
 
-def get_white_pawn_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_white_pawn_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a white pawn starting at position can reach
 
@@ -388,47 +398,34 @@ def get_white_pawn_moves(board, position: int) -> list[tuple[int, int, int]]:
     moves = []
     _ = position << 8
     if board.all_pieces & _ == 0:
-        end_side, end_piece, end_board = board.identify_piece_at(_)
-        score = score_from_move("white", "pawns", position, _, end_piece, board.score)
-        moves.append((position, _, score))
+        moves.append((position, _))
         if rank == 2:
             _ = position << 16
             if board.all_pieces & _ == 0:
-                end_side, end_piece, end_board = board.identify_piece_at(_)
-                score = score_from_move(
-                    "white", "pawns", position, _, end_piece, board.score
-                )
-                moves.append((position, _, score))
+                moves.append((position, _))
     file = get_file(position)
     if file >= 2:
         _ = position << 7
         if board.all_black & _ > 0:
-            end_side, end_piece, end_board = board.identify_piece_at(_)
-            score = score_from_move(
-                "white", "pawns", position, _, end_piece, board.score
-            )
-            moves.append((position, _, score))
+            moves.append((position, _))
     if file <= 7:
         _ = position << 9
         if board.all_black & _ > 0:
-            end_side, end_piece, end_board = board.identify_piece_at(_)
-            score = score_from_move(
-                "white", "pawns", position, _, end_piece, board.score
-            )
-            moves.append((position, _, score))
+            moves.append((position, _))
 
     en_passant_position = board.en_passant_position
-    if en_passant_position == position << 7 and file >= 2:
-        _ = position << 7
-        check_valid_position(board, "white", "pawns", position, _, moves)
-    if en_passant_position == position << 9 and file <= 7:
-        _ = position << 9
-        check_valid_position(board, "white", "pawns", position, _, moves)
+    if rank == 5 and en_passant_position:
+        if en_passant_position == position << 7 and file >= 2:
+            _ = position << 7
+            moves.append((position, _))
+        if en_passant_position == position << 9 and file <= 7:
+            _ = position << 9
+            moves.append((position, _))
 
     return moves
 
 
-def get_black_pawn_moves(board, position: int) -> list[tuple[int, int, int]]:
+def get_black_pawn_moves(board, position: int) -> list[tuple[int, int]]:
     """
     Returns a list of end positions a black pawn starting at position can reach
 
@@ -442,41 +439,28 @@ def get_black_pawn_moves(board, position: int) -> list[tuple[int, int, int]]:
     moves = []
     _ = position >> 8
     if board.all_pieces & _ == 0:
-        end_side, end_piece, end_board = board.identify_piece_at(_)
-        score = score_from_move("black", "pawns", position, _, end_piece, board.score)
-        moves.append((position, _, score))
+        moves.append((position, _))
         if rank == 7:
             _ = position >> 16
             if board.all_pieces & _ == 0:
-                end_side, end_piece, end_board = board.identify_piece_at(_)
-                score = score_from_move(
-                    "black", "pawns", position, _, end_piece, board.score
-                )
-                moves.append((position, _, score))
+                moves.append((position, _))
     file = get_file(position)
     if file >= 2:
         _ = position >> 9
         if board.all_white & _ > 0:
-            end_side, end_piece, end_board = board.identify_piece_at(_)
-            score = score_from_move(
-                "black", "pawns", position, _, end_piece, board.score
-            )
-            moves.append((position, _, score))
+            moves.append((position, _))
     if file <= 7:
         _ = position >> 7
         if board.all_white & _ > 0:
-            end_side, end_piece, end_board = board.identify_piece_at(_)
-            score = score_from_move(
-                "black", "pawns", position, _, end_piece, board.score
-            )
-            moves.append((position, _, score))
+            moves.append((position, _))
 
     en_passant_position = board.en_passant_position
-    if en_passant_position == position >> 9 and file >= 2:
-        _ = position >> 9
-        check_valid_position(board, "black", "pawns", position, _, moves)
-    if en_passant_position == position >> 7 and file <= 7:
-        _ = position >> 7
-        check_valid_position(board, "black", "pawns", position, _, moves)
+    if rank == 4 and en_passant_position:
+        if en_passant_position == position >> 9 and file >= 2:
+            _ = position >> 9
+            moves.append((position, _))
+        if en_passant_position == position >> 7 and file <= 7:
+            _ = position >> 7
+            moves.append((position, _))
 
     return moves
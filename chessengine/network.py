@@ -0,0 +1,197 @@
+"""
+An optional neural network evaluator for ``chessengine.bitboard.Board``. The
+first layer of the network is kept up to date incrementally as moves are made
+and undone, so evaluating a position only runs the small layers after it.
+
+This module needs NumPy, which can be installed with
+``python -m pip install chessengine[numpy]``.
+"""
+
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The order of the bitboards in the input features of the network. The feature for
+# a piece on a square has index ``FEATURES.index((side, piece)) * 64 + square``.
+FEATURES = (
+    ("white", "kings"),
+    ("white", "queens"),
+    ("white", "rooks"),
+    ("white", "bishops"),
+    ("white", "knights"),
+    ("white", "pawns"),
+    ("black", "kings"),
+    ("black", "queens"),
+    ("black", "rooks"),
+    ("black", "bishops"),
+    ("black", "knights"),
+    ("black", "pawns"),
+)
+
+# The first layer weights are stored as integers scaled by this factor, so that adding
+# and removing rows from the accumulator never accumulates rounding errors
+ACCUMULATOR_SCALE = 256
+
+
+class NetworkEvaluator:
+    """
+    Evaluates boards with a small neural network. The input layer has one feature
+    for every (side, piece, square) combination. Its output, the accumulator, is the
+    sum of the weight rows of the pieces on the board, and is updated by adding and
+    subtracting rows as pieces move. The accumulator is then passed through a
+    clipped ReLU, a hidden dense layer, another clipped ReLU and the output layer.
+
+    Attach an evaluator to a board with ``Board.set_network`` to use it in the search.
+    Every board needs its own evaluator; ``Board.copy`` copies it.
+
+    :param accumulator_weights: A ``(768, H)`` array with the input layer weights
+    :param accumulator_bias: A ``(H,)`` array with the input layer biases
+    :param hidden_weights: A ``(H, K)`` array with the hidden layer weights
+    :param hidden_bias: A ``(K,)`` array with the hidden layer biases
+    :param output_weights: A ``(K,)`` array with the output layer weights
+    :param output_bias: The output layer bias
+    :raises ImportError: If NumPy is not installed
+    :raises ValueError: If the shapes of the weights don't match
+    """
+
+    def __init__(
+        self,
+        accumulator_weights,
+        accumulator_bias,
+        hidden_weights,
+        hidden_bias,
+        output_weights,
+        output_bias,
+    ) -> None:
+        if np is None:
+            raise ImportError(
+                "NetworkEvaluator needs NumPy. Install it with `python -m pip install numpy`."
+            )
+        accumulator_weights = np.asarray(accumulator_weights, dtype=np.float64)
+        hidden_weights = np.asarray(hidden_weights, dtype=np.float64)
+        size = accumulator_weights.shape[1] if accumulator_weights.ndim == 2 else 0
+        if accumulator_weights.shape != (len(FEATURES) * 64, size):
+            raise ValueError(
+                f"accumulator_weights must have shape (768, H). Got {accumulator_weights.shape}"
+            )
+        if hidden_weights.ndim != 2 or hidden_weights.shape[0] != size:
+            raise ValueError(
+                f"hidden_weights must have shape ({size}, K). Got {hidden_weights.shape}"
+            )
+
+        self.accumulator_weights = np.rint(
+            accumulator_weights * ACCUMULATOR_SCALE
+        ).astype(np.int32)
+        self.accumulator_bias = np.rint(
+            np.asarray(accumulator_bias, dtype=np.float64) * ACCUMULATOR_SCALE
+        ).astype(np.int32)
+        self.hidden_weights = hidden_weights
+        self.hidden_bias = np.asarray(hidden_bias, dtype=np.float64)
+        self.output_weights = np.asarray(output_weights, dtype=np.float64)
+        self.output_bias = float(output_bias)
+        self.accumulator = self.accumulator_bias.copy()
+
+    def __repr__(self):
+        return (
+            f"<chessengine.NetworkEvaluator: {self.accumulator_weights.shape[1]}x"
+            f"{self.hidden_weights.shape[1]} hidden units>"
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "NetworkEvaluator":
+        """
+        Load the weights of a network from a ``.npz`` file, as written by ``NetworkEvaluator.save``.
+        The file must contain the arrays ``accumulator_weights``, ``accumulator_bias``,
+        ``hidden_weights``, ``hidden_bias``, ``output_weights`` and ``output_bias``.
+
+        :param path: The path to the ``.npz`` file
+        :return: A new ``NetworkEvaluator`` with an empty accumulator
+        """
+        if np is None:
+            raise ImportError(
+                "NetworkEvaluator needs NumPy. Install it with `python -m pip install numpy`."
+            )
+        with np.load(path) as weights:
+            return cls(
+                weights["accumulator_weights"],
+                weights["accumulator_bias"],
+                weights["hidden_weights"],
+                weights["hidden_bias"],
+                weights["output_weights"],
+                weights["output_bias"],
+            )
+
+    def save(self, path: str) -> None:
+        """
+        Save the weights of the network to a ``.npz`` file.
+
+        :param path: The path to the ``.npz`` file
+        """
+        np.savez(
+            path,
+            accumulator_weights=self.accumulator_weights / ACCUMULATOR_SCALE,
+            accumulator_bias=self.accumulator_bias / ACCUMULATOR_SCALE,
+            hidden_weights=self.hidden_weights,
+            hidden_bias=self.hidden_bias,
+            output_weights=self.output_weights,
+            output_bias=self.output_bias,
+        )
+
+    def copy(self) -> "NetworkEvaluator":
+        """
+        Return a copy of the evaluator that shares the weights but has its own accumulator.
+        """
+        evaluator = object.__new__(NetworkEvaluator)
+        evaluator.__dict__.update(self.__dict__)
+        evaluator.accumulator = self.accumulator.copy()
+        return evaluator
+
+    def refresh(self, board) -> None:
+        """
+        Recompute the accumulator from scratch for the pieces on ``board``.
+
+        :param board: The ``chessengine.bitboard.Board`` to compute the accumulator for
+        """
+        self.accumulator = self.accumulator_bias.copy()
+        self.update(dict.fromkeys(FEATURES, 0), board.board)
+
+    def update(self, before: dict, after: dict) -> None:
+        """
+        Update the accumulator after the pieces on the board have changed, by adding the
+        weight rows of the pieces that appeared and subtracting the rows of the pieces
+        that disappeared.
+
+        :param before: The bitboards before the change, as returned by ``Board.board``
+        :param after: The bitboards after the change, as returned by ``Board.board``
+        """
+        weights = self.accumulator_weights
+        for feature, side_piece in enumerate(FEATURES):
+            old = before[side_piece]
+            new = after[side_piece]
+            if old == new:
+                continue
+            offset = feature * 64
+            removed = old & ~new
+            while removed:
+                position = removed & -removed
+                removed ^= position
+                self.accumulator -= weights[offset + position.bit_length() - 1]
+            added = new & ~old
+            while added:
+                position = added & -added
+                added ^= position
+                self.accumulator += weights[offset + position.bit_length() - 1]
+
+    def evaluate(self) -> int:
+        """
+        Run the layers after the accumulator and return the evaluation of the position
+        the accumulator was last updated to.
+
+        :return: The evaluation. A positive score favors white, a negative score favors black.
+        """
+        hidden = np.clip(self.accumulator / ACCUMULATOR_SCALE, 0.0, 1.0)
+        hidden = np.clip(hidden @ self.hidden_weights + self.hidden_bias, 0.0, 1.0)
+        return int(round(float(hidden @ self.output_weights) + self.output_bias))
@@ -0,0 +1,399 @@
+"""
+A compiled opening book, so that the PGN files of the opening book are only
+parsed once instead of every time a game is started. New games can be added to
+a compiled book without compiling it again.
+
+Books are compiled into both a tree of GameNodes, keyed by the moves played, and a
+``PositionBook``, keyed by the position reached, which stays in the book when a game
+transposes into a known position through a different move order.
+"""
+
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    # Python < 3.7
+    pkg_resources = None
+import hashlib
+import marshal
+import os
+
+from chessengine.exceptions import MoveError, PGNParsingError, PositionError
+from chessengine.pgn.node import GameNode
+from chessengine.pgn.parser import PGNParser
+
+
+# Increased whenever the layout of compiled books changes, so that old books are rebuilt
+BOOK_VERSION = 5
+
+
+class PositionBook:
+    """
+    An opening book keyed by position. Every position is identified by its Zobrist key
+    (see ``Board.zobrist_key``) and maps to the moves played from it and the number of
+    games they were played in. Probing the book is a single dictionary lookup, and every
+    move order that reaches a position finds the same moves.
+
+    :ivar entries: A dictionary mapping Zobrist keys to dictionaries mapping moves in SAN
+        to the number of games they were played in
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[int, dict[str, int]] = {}
+
+    def __repr__(self):
+        return f"<chessengine.PositionBook: {len(self.entries)} positions>"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.entries
+
+    def add(self, key: int, move: str, count: int = 1) -> None:
+        """
+        Record that a move was played from a position.
+
+        :param key: The Zobrist key of the position
+        :param move: The move played, in SAN
+        :param count: The number of games the move was played in
+        """
+        moves = self.entries.setdefault(key, {})
+        moves[move] = moves.get(move, 0) + count
+
+    def probe(self, board, side: str) -> dict[str, int]:
+        """
+        Return the book moves for a position.
+
+        :param board: A ``chessengine.bitboard.Board``
+        :param side: The side to move, "white" or "black"
+        :return: A dictionary mapping the moves played from the position to the number
+            of games they were played in. Empty if the position is not in the book.
+        """
+        return self.entries.get(board.zobrist_key(side), {})
+
+    def merge(self, other: "PositionBook") -> None:
+        """
+        Add the moves and counts of another book to this book.
+
+        :param other: The book to merge into this book
+        """
+        for key, moves in other.entries.items():
+            for move, count in moves.items():
+                self.add(key, move, count)
+
+    def to_records(self) -> list[tuple]:
+        """
+        Convert the book into a list of ``(key, move, count)`` records.
+        """
+        return [
+            (key, move, count)
+            for key, moves in self.entries.items()
+            for move, count in moves.items()
+        ]
+
+    @classmethod
+    def from_records(cls, records: list[tuple]) -> "PositionBook":
+        """
+        Build a book from the records returned by ``PositionBook.to_records``.
+
+        :param records: A list of ``(key, move, count)`` records
+        """
+        book = cls()
+        for key, move, count in records:
+            book.add(key, move, count)
+        return book
+
+    @classmethod
+    def from_tree(cls, root_node: GameNode, max_plies: int = None) -> "PositionBook":
+        """
+        Build a book from a tree of GameNodes by replaying every line of the tree on a
+        board. The moves of nodes that are reached by different move orders but lead
+        to the same position are added up. Lines with an invalid move are cut at that move.
+
+        :param root_node: The root GameNode of the tree. Must be the starting position.
+        :param max_plies: If given, only positions up to this many plies from the start are added
+        """
+        book = cls()
+        for key, move, node, _, _, _ in iter_tree_moves(root_node, max_plies):
+            book.add(key, move, max(node.visits, 1))
+        return book
+
+
+def iter_tree_moves(root_node: GameNode, max_plies: int = None):
+    """
+    Replay every line of a tree of GameNodes on a board, depth first. Lines with an
+    invalid move are cut at that move.
+
+    :param root_node: The root GameNode of the tree. Must be the starting position.
+    :param max_plies: If given, only moves up to this many plies from the start are replayed
+    :return: A generator of ``(key, move, node, start, end, promotion)`` tuples, one for
+        every move. ``key`` is the Zobrist key of the position the move was made from,
+        ``move`` is the move in SAN, ``node`` is the GameNode it reaches, ``start`` and
+        ``end`` are the positions the moved piece moved between (the king's, for
+        castling) and ``promotion`` is the piece a pawn was promoted to, or ``None``.
+    """
+    from chessengine.bitboard import Board
+
+    board = Board("white")
+    # Entries are either a node to reach by making its move from the position with the
+    # given key, or None to undo the move of a node whose subtree is done
+    stack = [(root_node, None, None, 0)]
+    while stack:
+        entry = stack.pop()
+        if entry is None:
+            board.undo_move()
+            continue
+        node, move, key, plies = entry
+        if move is not None:
+            try:
+                board.move_san(move, "black" if node.turn == "white" else "white")
+            except (MoveError, PGNParsingError, PositionError):
+                continue
+            stack.append(None)
+            start, end = board.moves[-1][:2]
+            yield key, move, node, start, end, board.moves[-1][-1]
+        if node.children and (max_plies is None or plies < max_plies):
+            key = board.zobrist_key(node.turn)
+            for child_move, child in node.children.items():
+                stack.append((child, child_move, key, plies + 1))
+
+
+def opening_files() -> list[str]:
+    """
+    Return the paths of the PGN files of the opening book that ships with chessengine,
+    in ``chessengine.openings``.
+    """
+    if pkg_resources is None:
+        return []
+    directory = pkg_resources.files("chessengine.openings")
+    return sorted(
+        str(child) for child in directory.iterdir() if child.name.endswith(".pgn")
+    )
+
+
+def default_book_path() -> str:
+    """
+    Return the path the compiled opening book is stored at by default, in the user's
+    cache directory. ``$XDG_CACHE_HOME`` is used if it is set.
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_dir, "chessengine", "opening_book.bin")
+
+
+def hash_file(path) -> str:
+    """
+    Return a hash of the contents of a file.
+
+    :param path: The path to the file as a string or path-like object
+    :return: A hex digest of the contents of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as file:
+        for block in iter(lambda: file.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_files(paths: list) -> str:
+    """
+    Return a hash of the names and contents of the files, used to tell if a compiled
+    book is out of date.
+
+    :param paths: A list of paths to files as strings or path-like objects
+    :return: A hex digest that changes whenever any of the files is changed, added or removed
+    """
+    digest = hashlib.sha256()
+    for path in sorted(str(path) for path in paths):
+        digest.update(os.path.basename(path).encode())
+        digest.update(hash_file(path).encode())
+    return digest.hexdigest()
+
+
+def save_book(
+    root_node: GameNode,
+    path: str,
+    source_hash: str,
+    ingested: list[str] = None,
+    positions: PositionBook = None,
+) -> None:
+    """
+    Write a tree of GameNodes and the position book built from it to a compiled book
+    file. The file is replaced atomically, so a book that is being read is never seen
+    half written.
+
+    :param root_node: The root GameNode of the opening book
+    :param path: The path of the compiled book
+    :param source_hash: The hash of the PGN files the book was built from, as returned by ``hash_files``
+    :param ingested: The content hashes of the PGN files added to the book with ``update_book``
+    :param positions: The ``PositionBook`` of the tree. Built with ``PositionBook.from_tree`` if not given.
+    """
+    if positions is None:
+        positions = PositionBook.from_tree(root_node)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    header = {
+        "version": BOOK_VERSION,
+        "source_hash": source_hash,
+        "ingested": list(ingested or []),
+        "turn": root_node.turn,
+    }
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, mode="wb") as book_file:
+        # The position book is written before the tree, so it can be read without
+        # reading the tree
+        marshal.dump(header, book_file)
+        marshal.dump(positions.to_records(), book_file)
+        marshal.dump(root_node.to_records(), book_file)
+    os.replace(temporary_path, path)
+
+
+def _read_book(path: str, tree: bool = True):
+    """
+    Reads the contents of a compiled book file. The tree of GameNodes is only read if
+    tree is True. Returns None if the file doesn't exist, is not a compiled book or was
+    written by a different version of chessengine.
+    """
+    try:
+        with open(path, mode="rb") as book_file:
+            book = marshal.load(book_file)
+            if book["version"] != BOOK_VERSION:
+                return None
+            book["positions"] = PositionBook.from_records(marshal.load(book_file))
+            if tree:
+                book["root_node"] = GameNode.from_records(
+                    marshal.load(book_file), book["turn"]
+                )
+        return book
+    except (OSError, EOFError, ValueError, TypeError, KeyError, IndexError):
+        return None
+
+
+def load_book(path: str, source_hash: str = None):
+    """
+    Read a tree of GameNodes from a compiled book file.
+
+    :param path: The path of the compiled book
+    :param source_hash: If given, the book is only returned if it was built from PGN
+        files with this hash
+    :return: The root GameNode of the book, or ``None`` if the file doesn't exist, is not
+        a compiled book or is out of date
+    """
+    book = _read_book(path)
+    if book is None:
+        return None
+    if source_hash is not None and book["source_hash"] != source_hash:
+        return None
+    return book["root_node"]
+
+
+def _load_or_compile(
+    pgn_files: list, path: str, processes: int, tree: bool = True
+) -> dict:
+    """
+    Reads the compiled book at path if it was built from pgn_files, otherwise parses
+    the files and compiles the book again. The tree of GameNodes is only read from the
+    compiled book if tree is True.
+    """
+    pgn_files = opening_files() if pgn_files is None else pgn_files
+    path = default_book_path() if path is None else path
+    source_hash = hash_files(pgn_files)
+    book = _read_book(path, tree)
+    if book is not None and book["source_hash"] == source_hash:
+        return book
+
+    parser = PGNParser(pgn_files)
+    parser.parse_parallel(processes=processes)
+    book = {
+        "source_hash": source_hash,
+        "ingested": [],
+        "root_node": parser.root_node,
+        "positions": PositionBook.from_tree(parser.root_node),
+    }
+    try:
+        save_book(book["root_node"], path, source_hash, positions=book["positions"])
+    except OSError:
+        # The book still works, it just has to be compiled again next time
+        pass
+    return book
+
+
+def load_opening_book(
+    pgn_files: list = None, path: str = None, processes: int = 1
+) -> GameNode:
+    """
+    Return the opening book built from the given PGN files. The compiled book at ``path``
+    is used if it was built from the same files, otherwise the files are parsed and the
+    book is compiled again.
+
+    :param pgn_files: A list of paths to PGN files. Defaults to ``opening_files()``.
+    :param path: The path of the compiled book. Defaults to ``default_book_path()``.
+    :param processes: The number of processes used to parse the files if the book is
+        compiled again, passed to ``PGNParser.parse_parallel``
+    :return: The root GameNode of the opening book
+    """
+    return _load_or_compile(pgn_files, path, processes)["root_node"]
+
+
+def load_position_book(
+    pgn_files: list = None, path: str = None, processes: int = 1
+) -> PositionBook:
+    """
+    Same as ``load_opening_book``, but returns the opening book keyed by position.
+    The tree of GameNodes is not read from the compiled book, so this is much faster.
+
+    :param pgn_files: A list of paths to PGN files. Defaults to ``opening_files()``.
+    :param path: The path of the compiled book. Defaults to ``default_book_path()``.
+    :param processes: The number of processes used to parse the files if the book is
+        compiled again, passed to ``PGNParser.parse_parallel``
+    :return: The ``PositionBook`` of the opening book
+    """
+    return _load_or_compile(pgn_files, path, processes, tree=False)["positions"]
+
+
+def update_book(
+    pgn_files: list, path: str = None, processes: int = 1, base_files: list = None
+) -> dict:
+    """
+    Add the games in new PGN files to a compiled book without building it again. The
+    games are merged into the existing tree and position book, adding to the counts of
+    the nodes and positions they reach. Files are recognized by the hash of their
+    contents, so files that have already been added are skipped, even if they were renamed.
+
+    If the PGN files the book is compiled from change, the book is compiled again
+    and the files added with ``update_book`` have to be added again.
+
+    :param pgn_files: A list of paths to PGN files to add
+    :param path: The path of the compiled book. Defaults to ``default_book_path()``.
+    :param processes: The number of processes used to parse every file, passed to
+        ``PGNParser.parse_parallel``
+    :param base_files: The PGN files the book is compiled from. Defaults to ``opening_files()``.
+    :return: A dictionary mapping every file to the number of games added from it, or
+        ``None`` if the file was skipped
+    """
+    path = default_book_path() if path is None else path
+    book = _load_or_compile(base_files, path, processes)
+    root_node = book["root_node"]
+    positions = book["positions"]
+    ingested = book["ingested"]
+
+    added = {}
+    for pgn_file in pgn_files:
+        file_hash = hash_file(pgn_file)
+        if file_hash in ingested:
+            added[pgn_file] = None
+            continue
+        parser = PGNParser([pgn_file])
+        parser.parse_parallel(processes=processes)
+        added[pgn_file] = parser.root_node.visits
+        # The position book of the new games is built before their tree is merged,
+        # since merging moves the subtrees of the new tree into the book
+        positions.merge(PositionBook.from_tree(parser.root_node))
+        root_node.merge(parser.root_node)
+        ingested.append(file_hash)
+
+    save_book(root_node, path, book["source_hash"], ingested, positions)
+    return added
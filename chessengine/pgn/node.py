@@ -3,6 +3,8 @@ Defines the Game and GameNode class, used to parse PGN files and
 create the opening book.
 """
 
+import sys
+
 from chessengine.exceptions import PGNParsingError, GameNodeError
 
 
@@ -11,6 +13,8 @@ class Game:
     A class representing a game, keeping track of the moves made
     throughout the game and the GameNodes reached as a result.
     Used to record a game and replay it.
+
+    :ivar moves: The moves of the game, in SAN
     """
 
     def __init__(self, root_node) -> None:
@@ -18,6 +22,7 @@ class Game:
         self.root_node: GameNode = root_node
         self.result = ""
         self.move_text = ""
+        self.moves: list[str] = []
 
     def add_header(self, key: str, value: str) -> None:
         """
@@ -44,12 +49,40 @@ class GameNode:
     Provides a ``children`` dictionary that maps a move (str) made from
     this GameNode to the GameNode representing the new Board state.
 
+    Trees of GameNodes can have millions of nodes, so nodes use ``__slots__``, store
+    the side to move as a bool and share a single string object for every move.
+
     :param turn: The side to move on this GameNode.
+    :ivar white_to_move: ``True`` if white is to move on this GameNode
+    :ivar visits: The number of games merged into the tree that reached this GameNode
+    :ivar wins: The number of those games won by the side that made the move reaching
+        this GameNode (the side not to move)
+    :ivar draws: The number of those games that were drawn
+    :ivar losses: The number of those games lost by the side that made the move
+        reaching this GameNode
+    :ivar score: The book score of the position, cached by
+        ``chessengine.pgn.utils.score_tree``. ``None`` until it is computed, and
+        ``chessengine.pgn.utils.INVALID`` if the move leading to the node is invalid.
     """
 
+    __slots__ = (
+        "white_to_move",
+        "children",
+        "visits",
+        "wins",
+        "draws",
+        "losses",
+        "score",
+    )
+
     def __init__(self, turn: str) -> None:
-        self.turn: str = turn
+        self.white_to_move: bool = turn == "white"
         self.children: dict[str:GameNode] = {}  # Maps SAN move strings to GameNode
+        self.visits: int = 0
+        self.wins: int = 0
+        self.draws: int = 0
+        self.losses: int = 0
+        self.score: int = None
 
     def __repr__(self):
         children = ""
@@ -60,6 +93,30 @@ class GameNode:
     def __contains__(self, move: str) -> bool:
         return move in self.children
 
+    @property
+    def turn(self) -> str:
+        """
+        The side to move on this GameNode, "white" or "black"
+        """
+        return "white" if self.white_to_move else "black"
+
+    def add_game(self, result: str) -> None:
+        """
+        Count a game that reached this GameNode.
+
+        :param result: The result of the game, "1-0", "0-1", "1/2-1/2" or "*". Games
+            with an unknown result only count towards ``visits``.
+        """
+        self.visits += 1
+        if result == "1/2-1/2":
+            self.draws += 1
+        elif result == "1-0" or result == "0-1":
+            # The side that moved to this node is white if black is to move
+            if (result == "1-0") != self.white_to_move:
+                self.wins += 1
+            else:
+                self.losses += 1
+
     def add_child(self, move: str):
         """
         Create a new GameNode and add it as a child to the current node in
@@ -68,12 +125,12 @@ class GameNode:
         :param move: The move made to reach the new game node
         :return GameNode: Return the newly created GameNode.
         """
-        if move not in self.children:
-            turn = "white" if self.turn == "black" else "black"
-            new_node = GameNode(turn)
-            self.children[move] = new_node
-
-        return self.children[move]
+        child = self.children.get(move)
+        if child is None:
+            child = GameNode("black" if self.white_to_move else "white")
+            # Every node with the same move shares one string
+            self.children[sys.intern(move)] = child
+        return child
 
     def get_child(self, move: str):
         """
@@ -87,3 +144,68 @@ class GameNode:
         if move not in self.children:
             raise GameNodeError(f"{move} is not a child of the current Game Node.")
         return self.children[move]
+
+    def merge(self, other) -> None:
+        """
+        Merge another tree of GameNodes into the tree starting at this GameNode, adding
+        up the counts of the nodes present in both trees. Subtrees only present in
+        ``other`` are moved into this tree, so ``other`` shouldn't be used afterwards.
+        The cached scores of the nodes present in both trees are cleared, since they
+        may have new children.
+
+        :param other: The root GameNode of the tree to merge. Must have the same turn.
+        """
+        stack = [(self, other)]
+        while stack:
+            node, other_node = stack.pop()
+            node.visits += other_node.visits
+            node.wins += other_node.wins
+            node.draws += other_node.draws
+            node.losses += other_node.losses
+            node.score = None
+            for move, other_child in other_node.children.items():
+                child = node.children.get(move)
+                if child is None:
+                    node.children[move] = other_child
+                else:
+                    stack.append((child, other_child))
+
+    def to_records(self) -> list[tuple]:
+        """
+        Convert the tree starting at this GameNode into a flat list of
+        ``(parent index, move, visits, wins, draws, losses)`` records, with every parent
+        before its children.
+        The first record is this GameNode. Flat records can be pickled and marshalled
+        no matter how deep the tree is.
+
+        :return: A list of records that ``GameNode.from_records`` converts back into a tree
+        """
+        records = [(-1, "", self.visits, self.wins, self.draws, self.losses)]
+        stack = [(0, self)]
+        while stack:
+            index, node = stack.pop()
+            for move, child in node.children.items():
+                records.append(
+                    (index, move, child.visits, child.wins, child.draws, child.losses)
+                )
+                stack.append((len(records) - 1, child))
+        return records
+
+    @classmethod
+    def from_records(cls, records: list[tuple], turn: str = "white"):
+        """
+        Build a tree of GameNodes from the records returned by ``GameNode.to_records``.
+
+        :param records: A list of ``(parent index, move, visits, wins, draws, losses)`` records
+        :param turn: The side to move on the root GameNode
+        :return GameNode: The root GameNode of the tree
+        """
+        nodes = []
+        for parent, move, visits, wins, draws, losses in records:
+            node = cls(turn) if parent < 0 else nodes[parent].add_child(move)
+            node.visits = visits
+            node.wins = wins
+            node.draws = draws
+            node.losses = losses
+            nodes.append(node)
+        return nodes[0]
@@ -3,7 +3,9 @@ The PGN parser class
 """
 
 
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from chessengine.pgn.node import GameNode, Game
 
 # groups()[0] = The piece moved, one of {K, Q, N, R, B}, None if a pawn was moved
@@ -13,14 +15,151 @@ from chessengine.pgn.node import GameNode, Game
 SAN_MOVE_REGEX = re.compile(
     "([KQNRB\u2654\u2655\u2656\u2657\u2658\u2659\u265A\u265B\u265C\u265D\u265E\u265F])?([a-h1-8]{1,2})?x?([a-h][1-8])=?([QNRB])?"
 )
-MOVE_TEXT_COMMENT_REGEX = re.compile(
-    r"\s*{.*?}\s*"
-)  # TODO - add support for removing line comments
-MOVE_TEXT_MOVE_REGEX = re.compile(
-    r"(\d+)\.\s*([A-Za-z0-9\-+=]+)\s+([A-Za-z0-9\-+=]+)\s*(1-0|0-1|1/2-1/2)?\s*"
+# The kinds of tokens yielded by tokenize_move_text
+MOVE = "move"
+COMMENT = "comment"
+NAG = "nag"
+VARIATION_START = "variation_start"
+VARIATION_END = "variation_end"
+RESULT = "result"
+
+# Matches one token of the move text. The alternatives are tried in order, so results
+# and castling are matched before move numbers, which also start with digits.
+MOVE_TEXT_TOKEN_REGEX = re.compile(
+    r"""
+    \{(?P<comment>[^}]*)\}?                      # {A comment}, possibly spanning lines
+    |;(?P<line_comment>[^\n]*)                    # ; A comment until the end of the line
+    |(?P<variation_start>\()
+    |(?P<variation_end>\))
+    |\$(?P<nag>\d+)                               # $1, a numeric annotation glyph
+    |(?P<result>1-0|0-1|1/2-1/2|\*)
+    |(?P<castle>[O0]-[O0](?:-[O0])?[+\#]?)[!?]*
+    |\d+\.*                                        # 12. or 12... move numbers are skipped
+    |(?P<move>[KQRBNP]?[a-h]?[1-8]?x?[a-h][1-8](?:=?[QRBN])?[+\#]?)[!?]*
+    |\S+?(?=[\s(){};$]|$)                          # Anything else is skipped
+    """,
+    re.VERBOSE,
 )
 
 
+def tokenize_move_text(move_text: str):
+    """
+    Split the move text of a game into tokens in a single pass. Move numbers, move
+    annotations like ``!?`` and anything that is not valid move text are skipped.
+
+    :param move_text: The move text of a game, with the lines of the text separated by newlines
+    :return: A generator of ``(kind, value)`` tuples. ``kind`` is one of ``MOVE``
+        (``value`` is the move in SAN), ``COMMENT`` (the text of a brace or line comment),
+        ``NAG`` (the number of the annotation glyph as an int), ``VARIATION_START``,
+        ``VARIATION_END`` (``value`` is ``None`` for both) or ``RESULT`` (the game result).
+    """
+    for match in MOVE_TEXT_TOKEN_REGEX.finditer(move_text):
+        kind = match.lastgroup
+        if kind == "move" or kind == "castle":
+            yield MOVE, match.group(kind)
+        elif kind == "comment" or kind == "line_comment":
+            yield COMMENT, match.group(kind).strip()
+        elif kind == "nag":
+            yield NAG, int(match.group(kind))
+        elif kind == "variation_start":
+            yield VARIATION_START, None
+        elif kind == "variation_end":
+            yield VARIATION_END, None
+        elif kind == "result":
+            yield RESULT, match.group(kind)
+
+
+def _ends_in_comment(line, in_comment: bool) -> bool:
+    """
+    Returns ``True`` if a brace comment is still open at the end of a line of move text.
+    Brace comments don't nest and end at the first ``}``, and a ``;`` outside a brace
+    comment starts a comment that runs to the end of the line. Works on ``str`` and
+    ``bytes`` lines.
+
+    :param line: A line of move text
+    :param in_comment: ``True`` if a brace comment is open at the start of the line
+    """
+    if isinstance(line, bytes):
+        comment_start, comment_end, line_comment = b"{", b"}", b";"
+    else:
+        comment_start, comment_end, line_comment = "{", "}", ";"
+    position = 0
+    while True:
+        if in_comment:
+            position = line.find(comment_end, position)
+            if position < 0:
+                return True
+            in_comment = False
+        else:
+            brace = line.find(comment_start, position)
+            semicolon = line.find(line_comment, position)
+            if brace < 0 or 0 <= semicolon < brace:
+                return False
+            in_comment = True
+            position = brace
+        position += 1
+
+
+def split_pgn_file(path, chunks: int) -> list[tuple[int, int]]:
+    """
+    Split a PGN file into byte ranges of roughly equal size that can be parsed
+    independently. Every range except the first starts at an ``[Event`` header.
+    Whether a line is inside a multi-line comment can only be known from the lines
+    before it, so the file is read once from the start to find the headers.
+
+    :param path: The path to a PGN file as a string or path-like object
+    :param chunks: The number of ranges to split the file into. Fewer ranges are
+        returned if the file doesn't have enough games.
+    :return: A list of ``(start, end)`` byte offsets covering the whole file
+    """
+    size = os.path.getsize(path)
+    starts = [0]
+    in_comment = False
+    with open(path, mode="rb") as pgn_file:
+        position = 0
+        for line in pgn_file:
+            if in_comment or not line.startswith(b"["):
+                in_comment = _ends_in_comment(line, in_comment)
+            elif (
+                line.startswith(b"[Event")
+                and position > 0
+                and position >= size * len(starts) // chunks
+            ):
+                starts.append(position)
+                if len(starts) == chunks:
+                    break
+            position += len(line)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _read_lines(pgn_file, end: int):
+    """
+    Yields the decoded lines of a binary file from its current position up to the byte offset end
+    """
+    position = pgn_file.tell()
+    while position < end:
+        line = pgn_file.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line.decode(errors="replace")
+
+
+def _parse_pgn_range(task: tuple) -> list[tuple]:
+    """
+    Parses the games in a byte range of a PGN file into a tree of GameNodes. Runs in a
+    worker process of ``PGNParser.parse_parallel``. The tree is returned as records,
+    since deep trees can't be pickled directly without reaching the recursion limit.
+    """
+    path, start, end = task
+    parser = PGNParser()
+    with open(path, mode="rb") as pgn_file:
+        pgn_file.seek(start)
+        for _ in parser._iter_games(_read_lines(pgn_file, end), False, True):
+            pass
+    return parser.root_node.to_records()
+
+
 class PGNParser:
     """
     A parser for parsing PGN files and constructing a tree of GameNodes
@@ -42,45 +181,118 @@ class PGNParser:
         Parse the given pgn file if pgn_file is not None.
         Otherwise, parse all the pgn files in self.pgn_files.
 
+        All the games parsed are kept in ``self.games`` and merged into the tree of
+        GameNodes. Use ``PGNParser.iter_games`` to parse large files without keeping
+        every game in memory.
+
+        :param pgn_file: a path to a PGN file as a string, path-like object, or file-like object
+        """
+        for _ in self.iter_games(pgn_file, retain=True, merge=True):
+            pass
+
+    def iter_games(self, pgn_file=None, retain: bool = False, merge: bool = True):
+        """
+        Parse the given pgn file if pgn_file is not None, otherwise all the pgn files in
+        self.pgn_files, and yield the games one at a time as they are parsed. The files are
+        read line by line, so only one game is held in memory at a time unless ``retain``
+        is ``True``.
+
         :param pgn_file: a path to a PGN file as a string, path-like object, or file-like object
+        :param retain: If ``True``, the games are also kept in ``self.games``
+        :param merge: If ``True``, the moves of every game are merged into the tree of
+            GameNodes starting at ``self.root_node``
+        :return: A generator of ``chessengine.pgn.node.Game`` objects
         """
         files_to_parse = [pgn_file] if pgn_file is not None else self.pgn_files
         for file in files_to_parse:
-            try:
-                self._parse(file)
-            except (TypeError, AttributeError):
+            if hasattr(file, "readline"):
+                yield from self._iter_games(file, retain, merge)
+            else:
                 with open(file, mode="r", errors="replace") as opened_pgn_file:
-                    self._parse(opened_pgn_file)
+                    yield from self._iter_games(opened_pgn_file, retain, merge)
+
+    def parse_parallel(self, pgn_files: list = None, processes: int = None):
+        """
+        Parse the given pgn files, or all the pgn files in self.pgn_files if pgn_files is
+        None, across a pool of processes and merge the games into the tree of GameNodes.
+        Every file is split into byte ranges starting at ``[Event`` headers, every worker
+        process builds a tree from its ranges, and the trees are merged with
+        ``GameNode.merge``, adding up the visits of every node.
+
+        The games are not kept in ``self.games``. File-like objects can't be shared
+        with the worker processes, so they are parsed in this process.
+
+        :param pgn_files: A list of paths to PGN files as strings, path-like objects, or
+            file-like objects
+        :param processes: The number of worker processes. Defaults to the number of CPUs.
+            If 1, the files are parsed in this process.
+        """
+        files_to_parse = pgn_files if pgn_files is not None else self.pgn_files
+        processes = processes or os.cpu_count() or 1
+        paths = []
+        for file in files_to_parse:
+            if hasattr(file, "readline"):
+                for _ in self.iter_games(file, retain=False, merge=True):
+                    pass
+            else:
+                paths.append(file)
+
+        sizes = [os.path.getsize(path) for path in paths]
+        total_size = sum(sizes) or 1
+        tasks = []
+        for path, size in zip(paths, sizes):
+            # A few ranges per process, so that the processes finish at about the same time
+            chunks = max(1, round(4 * processes * size / total_size))
+            for start, end in split_pgn_file(path, chunks):
+                tasks.append((path, start, end))
+
+        if processes == 1 or len(tasks) <= 1:
+            for task in tasks:
+                self.root_node.merge(GameNode.from_records(_parse_pgn_range(task)))
+        else:
+            with ProcessPoolExecutor(min(processes, len(tasks))) as executor:
+                for records in executor.map(_parse_pgn_range, tasks):
+                    self.root_node.merge(GameNode.from_records(records))
 
-    def _parse(self, pgn_file):
+    def _iter_games(self, pgn_file, retain: bool, merge: bool):
         """
-        Parses a PGN file and builds a tree of GameNodes
+        Parses a PGN file line by line, yielding every game once its move text has been read
         """
-        lines = pgn_file.readlines()
-        new_game = True
-        move_text = ""
-        for line in lines:
-            if not line:
+        move_text = []
+        in_comment = False
+        for line in pgn_file:
+            line = line.strip()
+            if not line or line.startswith("%") and not in_comment:
+                # Skips empty lines and escaped lines
                 continue
-            if line.startswith("["):
+            if line.startswith("[") and not in_comment:
                 if move_text:
                     # Completely parses the move text of a game. Ends that game.
-                    self._parse_move_text(move_text)
-                    new_game = True
-                if new_game:
+                    self._parse_move_text("\n".join(move_text), merge)
+                    yield self.current_game
+                    move_text = []
+                    self.current_game = None
+                if self.current_game is None:
                     # New game starts here. Reset current node.
-                    self.current_game = Game(self.root_node)
-                    self.games.append(self.current_game)
-
-                    self.current_node = self.root_node
-                    move_text = ""
-                    new_game = False
+                    self._start_game(retain)
                 self._parse_header(line)
             else:
                 # This is the move text
-                new_game = False
-                move_text += " " + line.strip()
-        self._parse_move_text(move_text)
+                if self.current_game is None:
+                    self._start_game(retain)
+                move_text.append(line)
+                # A line starting with [ inside a multi-line comment is not a header
+                in_comment = _ends_in_comment(line, in_comment)
+        if move_text:
+            self._parse_move_text("\n".join(move_text), merge)
+            yield self.current_game
+        self.current_game = None
+
+    def _start_game(self, retain: bool) -> None:
+        self.current_game = Game(self.root_node)
+        if retain:
+            self.games.append(self.current_game)
+        self.current_node = self.root_node
 
     def _parse_header(self, header_string: str):
         """
@@ -95,24 +307,28 @@ class PGNParser:
             value = value[1:][:-1]
         self.current_game.add_header(key, value)
 
-    def _parse_move_text(self, move_text: str):
-        if "{" in move_text:
-            # Remove all comments from the move text
-            move_text = MOVE_TEXT_COMMENT_REGEX.sub(" ", move_text).strip()
+    def _parse_move_text(self, move_text: str, merge: bool = True):
+        """
+        Parses the move text of the current game. Moves inside variations, comments and
+        annotations are skipped.
+        """
         self.current_game.move_text = move_text
+        moves = self.current_game.moves
+        depth = 0
+        for kind, value in tokenize_move_text(move_text):
+            if kind == MOVE:
+                if not depth:
+                    moves.append(value)
+            elif kind == VARIATION_START:
+                depth += 1
+            elif kind == VARIATION_END:
+                depth = max(depth - 1, 0)
+            elif kind == RESULT and not depth:
+                self.current_game.result = value
 
-        ply_number = 0
-        move_list = MOVE_TEXT_MOVE_REGEX.findall(move_text.strip())
-        last_move = move_list.pop()
-        for _, white_move, black_move, _ in move_list:
-            self.current_node = self.current_node.add_child(white_move)
-            ply_number += 1
-            self.current_node = self.current_node.add_child(black_move)
-            ply_number += 1
-
-        if last_move[2] in {"1-0", "0-1", "1/2-1/2"}:
-            self.current_game.result = last_move[2]
-        else:
-            self.current_node = self.current_node.add_child(last_move[2])
-        if last_move[3] in {"1-0", "0-1", "1/2-1/2"}:
-            self.current_game.result = last_move[3]
+        if merge:
+            result = self.current_game.result
+            self.current_node.add_game(result)
+            for move in moves:
+                self.current_node = self.current_node.add_child(move)
+                self.current_node.add_game(result)
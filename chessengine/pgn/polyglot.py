@@ -0,0 +1,366 @@
+"""
+Opening book files with the record layout of Polyglot ``.bin`` books. A book file
+is a list of fixed width records sorted by position key, so it is read through
+``mmap`` and probed with a binary search instead of being loaded into memory.
+Processes that open the same book file share its pages through the page cache.
+Book files can be built from a tree of GameNodes, or from PGN files too large to
+fit in memory with ``build_book_file``.
+
+The records have Polyglot's layout and move encoding, but the position keys are
+the Zobrist keys of ``Board.zobrist_key``, not Polyglot's, so book files made by
+other programs can't be probed.
+"""
+
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+from chessengine.exceptions import MoveError, PGNParsingError, PositionError
+from chessengine.pgn.node import GameNode
+from chessengine.pgn.book import iter_tree_moves
+from chessengine.pgn.parser import PGNParser
+
+
+# key, move, weight, learn. All big endian, 16 bytes in total.
+RECORD = struct.Struct(">QHHI")
+_KEY = struct.Struct(">Q")
+# key, move, count. The records of the sorted runs written by build_book_file.
+_RUN_RECORD = struct.Struct(">QHQ")
+# The most sorted runs build_book_file merges at a time
+MERGE_FAN_IN = 64
+
+# Maps promotion pieces to their code in the move encoding
+PROMOTION_CODES = {None: 0, "knights": 1, "bishops": 2, "rooks": 3, "queens": 4}
+_PROMOTION_PIECES = {code: piece for piece, code in PROMOTION_CODES.items()}
+
+# Maps the king moves of castling to the king-takes-rook moves they are encoded as
+_CASTLING_MOVES = {
+    (4, 6): (4, 7),
+    (4, 2): (4, 0),
+    (60, 62): (60, 63),
+    (60, 58): (60, 56),
+}
+_ENCODED_CASTLING_MOVES = {encoded: move for move, encoded in _CASTLING_MOVES.items()}
+
+
+def encode_move(
+    start: int, end: int, promotion: str = None, castle: bool = False
+) -> int:
+    """
+    Encode a move in 16 bits the way Polyglot does. Bits 0 to 5 hold the end position
+    index, bits 6 to 11 the start position index and bits 12 to 14 the promotion piece.
+    Castling is encoded as the king moving to the square of its rook.
+
+    :param start: The start position of the move. See :ref:`position_representation`
+    :param end: The end position of the move. See :ref:`position_representation`
+    :param promotion: The piece a pawn was promoted to, for example "queens"
+    :param castle: ``True`` if the move is a king castling
+    """
+    start_index = start.bit_length() - 1
+    end_index = end.bit_length() - 1
+    if castle:
+        start_index, end_index = _CASTLING_MOVES[(start_index, end_index)]
+    return end_index | start_index << 6 | PROMOTION_CODES[promotion] << 12
+
+
+def decode_move(move: int, castle: bool = False) -> tuple[int, int, str]:
+    """
+    Decode a move encoded by ``encode_move``.
+
+    :param move: The encoded move
+    :param castle: ``True`` if the move is a king castling, in which case the king's
+        end position is returned instead of the rook's
+    :return: A tuple of the start position, the end position and the promotion piece (or ``None``)
+    """
+    start_index = move >> 6 & 63
+    end_index = move & 63
+    if castle:
+        start_index, end_index = _ENCODED_CASTLING_MOVES[(start_index, end_index)]
+    return 1 << start_index, 1 << end_index, _PROMOTION_PIECES[move >> 12 & 7]
+
+
+def write_book_file(root_node: GameNode, path: str, max_plies: int = None) -> int:
+    """
+    Write a book file from a tree of GameNodes. Every move in the tree becomes a record
+    weighted by the number of games it was played in, and moves reached through
+    different move orders are added up.
+
+    :param root_node: The root GameNode of the tree. Must be the starting position.
+    :param path: The path of the book file
+    :param max_plies: If given, only moves up to this many plies from the start are written
+    :return: The number of records written
+    """
+    weights = {}
+    for key, move, node, start, end, promotion in iter_tree_moves(root_node, max_plies):
+        castle = move.startswith(("O-O", "0-0"))
+        record = (key, encode_move(start, end, promotion, castle))
+        weights[record] = weights.get(record, 0) + max(node.visits, 1)
+    return write_records(
+        ((key, move, weight) for (key, move), weight in weights.items()), path
+    )
+
+
+def write_records(records, path: str) -> int:
+    """
+    Sort ``(key, move, weight)`` records and write them to a book file. Records of the
+    same position are written with the highest weight first. Weights are capped at
+    65535, the most a record can hold. The file is replaced atomically.
+
+    :param records: An iterable of ``(key, move, weight)`` tuples
+    :param path: The path of the book file
+    :return: The number of records written
+    """
+    records = sorted(records, key=lambda record: (record[0], -record[2], record[1]))
+    return _write_sorted_records(records, path)
+
+
+def _write_sorted_records(records, path: str) -> int:
+    """
+    Writes (key, move, weight) records that are already in order to a book file, replacing it atomically
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    with open(temporary_path, mode="wb") as book_file:
+        for key, move, weight in records:
+            book_file.write(RECORD.pack(key, move, min(weight, 65535), 0))
+            count += 1
+    os.replace(temporary_path, path)
+    return count
+
+
+def _game_records(moves: list[str], max_plies: int = None):
+    """
+    Replays the moves of a game and yields a (key, move) record for every move, stopping
+    at the first invalid move
+    """
+    from chessengine.bitboard import Board
+
+    board = Board("white")
+    side = "white"
+    for move in moves[:max_plies]:
+        key = board.zobrist_key(side)
+        try:
+            board.move_san(move, side)
+        except (MoveError, PGNParsingError, PositionError):
+            return
+        start, end = board.moves[-1][:2]
+        castle = move.startswith(("O-O", "0-0"))
+        yield key, encode_move(start, end, board.moves[-1][-1], castle)
+        side = "black" if side == "white" else "white"
+
+
+def _write_run(counts: dict, directory: str, number: int) -> str:
+    """
+    Writes the counted records of a run to a file, sorted by key and move
+    """
+    path = os.path.join(directory, f"run_{number}.bin")
+    with open(path, mode="wb") as run_file:
+        for (key, move), count in sorted(counts.items()):
+            run_file.write(_RUN_RECORD.pack(key, move, count))
+    return path
+
+
+def _read_run(path: str):
+    """
+    Yields the records of a run file in order, reading a block of records at a time
+    """
+    with open(path, mode="rb") as run_file:
+        for block in iter(lambda: run_file.read(_RUN_RECORD.size * 4096), b""):
+            yield from _RUN_RECORD.iter_unpack(block)
+
+
+def _sum_runs(paths: list[str]):
+    """
+    Merges sorted run files and yields (key, move, count) records in order, with the
+    counts of the same key and move added up
+    """
+    last_key = last_move = None
+    count = 0
+    for key, move, run_count in heapq.merge(*(_read_run(path) for path in paths)):
+        if key == last_key and move == last_move:
+            count += run_count
+            continue
+        if last_key is not None:
+            yield last_key, last_move, count
+        last_key, last_move, count = key, move, run_count
+    if last_key is not None:
+        yield last_key, last_move, count
+
+
+def _merge_runs(paths: list[str], directory: str, fan_in: int):
+    """
+    Merges sorted run files and yields (key, move, weight) records with the counts of the
+    same key and move added up, ordered by key and then by weight, highest first. At most
+    fan_in runs are open at a time. While there are more runs than that, groups of runs
+    are merged into intermediate runs in the directory.
+    """
+    number = 0
+    while len(paths) > fan_in:
+        merged = []
+        for start in range(0, len(paths), fan_in):
+            group = paths[start : start + fan_in]
+            path = os.path.join(directory, f"merged_{number}.bin")
+            number += 1
+            with open(path, mode="wb") as run_file:
+                for record in _sum_runs(group):
+                    run_file.write(_RUN_RECORD.pack(*record))
+            for run_path in group:
+                os.remove(run_path)
+            merged.append(path)
+        paths = merged
+
+    position = []
+    for record in _sum_runs(paths):
+        if position and record[0] != position[0][0]:
+            # Only the moves of one position are held at a time
+            position.sort(key=lambda record: (-record[2], record[1]))
+            yield from position
+            position = []
+        position.append(record)
+    position.sort(key=lambda record: (-record[2], record[1]))
+    yield from position
+
+
+def build_book_file(
+    pgn_files: list,
+    path: str,
+    max_plies: int = None,
+    run_size: int = 2**20,
+    temporary_directory: str = None,
+    fan_in: int = MERGE_FAN_IN,
+) -> int:
+    """
+    Build a book file from PGN files that may be too large to fit in memory. The games
+    are streamed and replayed one at a time, and their moves are counted until
+    ``run_size`` different positions and moves have been seen. The counts are then
+    sorted and written to a run file on disk, and counting starts again. Finally the
+    runs are merged, adding up the counts of every position and move, and written
+    straight to the book file. Runs are merged ``fan_in`` at a time, in several passes
+    if there are more runs than that, so memory use and the number of open files
+    depend on ``run_size`` and ``fan_in``, not on the number of games.
+
+    The book file is the same as the one ``write_book_file`` writes for a tree of
+    GameNodes parsed from the same files.
+
+    :param pgn_files: A list of paths to PGN files as strings, path-like objects, or file-like objects
+    :param path: The path of the book file
+    :param max_plies: If given, only moves up to this many plies from the start are written
+    :param run_size: The most records counted in memory before they are written to a run
+    :param temporary_directory: The directory the runs are written to. Defaults to the
+        system's temporary directory.
+    :param fan_in: The most runs merged at a time. Must be at least 2.
+    :return: The number of records written
+    """
+    if fan_in < 2:
+        raise ValueError(f"fan_in must be at least 2. Got {fan_in}")
+    parser = PGNParser()
+    with tempfile.TemporaryDirectory(dir=temporary_directory) as directory:
+        runs = []
+        counts = {}
+        for pgn_file in pgn_files:
+            for game in parser.iter_games(pgn_file, retain=False, merge=False):
+                for record in _game_records(game.moves, max_plies):
+                    counts[record] = counts.get(record, 0) + 1
+                if len(counts) >= run_size:
+                    runs.append(_write_run(counts, directory, len(runs)))
+                    counts = {}
+        if counts:
+            runs.append(_write_run(counts, directory, len(runs)))
+        return _write_sorted_records(_merge_runs(runs, directory, fan_in), path)
+
+
+class MappedBook:
+    """
+    A book file opened through ``mmap``. Nothing is read when the book is opened, and
+    probing a position reads the few pages touched by a binary search over the records.
+
+    Use as a context manager, or call ``MappedBook.close`` when done.
+
+    :param path: The path of the book file
+    :raises ValueError: If the size of the file is not a whole number of records
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, mode="rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size % RECORD.size:
+            self._file.close()
+            raise ValueError(
+                f"{path} is not a book file, its size is not a multiple of {RECORD.size} bytes"
+            )
+        self._count = size // RECORD.size
+        # Empty files can't be mapped
+        self._map = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+
+    def __repr__(self):
+        return f"<chessengine.MappedBook: {self._count} records>"
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmap and close the book file.
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def find(self, key: int) -> list[tuple[int, int]]:
+        """
+        Find the records of a position.
+
+        :param key: The Zobrist key of the position
+        :return: A list of ``(move, weight)`` tuples, highest weight first. The moves
+            are encoded as in ``encode_move``.
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if _KEY.unpack_from(self._map, middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        for index in range(low, self._count):
+            record_key, move, weight, _ = RECORD.unpack_from(
+                self._map, index * RECORD.size
+            )
+            if record_key != key:
+                break
+            entries.append((move, weight))
+        return entries
+
+    def probe(self, board, side: str) -> dict[tuple[int, int, str], int]:
+        """
+        Return the book moves for a position.
+
+        :param board: A ``chessengine.bitboard.Board``
+        :param side: The side to move, "white" or "black"
+        :return: A dictionary mapping ``(start, end, promotion)`` tuples, which can be
+            passed to ``Board.move``, to their weights. Empty if the position is not in the book.
+        """
+        king = board.get_bitboard(side, "kings")
+        moves = {}
+        for move, weight in self.find(board.zobrist_key(side)):
+            start = 1 << (move >> 6 & 63)
+            castle = start == king and (move >> 6 & 63, move & 63) in (
+                _ENCODED_CASTLING_MOVES
+            )
+            moves[decode_move(move, castle)] = weight
+        return moves
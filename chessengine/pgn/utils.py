@@ -2,37 +2,105 @@
 Utility functions for the engine to efficiently use the
 parsed PGN files
 """
+from chessengine.exceptions import MoveError, PGNParsingError, PositionError
 from chessengine.pgn import GameNode
 
+#: The score cached on a GameNode whose move is invalid on the board. Such nodes are
+#: skipped by ``score_tree`` and ``best_move_from_tree`` without replaying their move.
+INVALID = object()
+
+
+def score_tree(board, tree: GameNode) -> None:
+    """
+    Compute the book score of every GameNode in the tree and cache it in
+    ``GameNode.score``. The score of a leaf is the board's score after the moves
+    leading to it, and the score of any other node is the best score of its children
+    for the side to move on it. Every line is replayed on the board once, and subtrees
+    that already have a score are skipped. The board is left as it was passed.
+
+    Nodes whose move is invalid on the board get a score of ``INVALID``, so they are
+    only tried once.
+
+    :param board: A ``chessengine.bitboard.Board`` object at the position of ``tree``
+    :param tree: A ``chessengine.pgn.node.GameNode`` object
+    """
+    # Entries are (node, move, expanded). A node is expanded once its move has been
+    # made and its children pushed, and is scored when it is popped again.
+    stack = [(tree, None, False)]
+    while stack:
+        node, move, expanded = stack.pop()
+        if expanded:
+            scores = [
+                child.score
+                for child in node.children.values()
+                if child.score is not None and child.score is not INVALID
+            ]
+            if not scores:
+                node.score = board.score
+            elif node.white_to_move:
+                node.score = max(scores)
+            else:
+                node.score = min(scores)
+            if move is not None:
+                board.undo_move()
+            continue
+
+        if node.score is not None:
+            continue
+        if move is not None:
+            try:
+                board.move_san(move, "black" if node.white_to_move else "white")
+            except (MoveError, PGNParsingError, PositionError):
+                node.score = INVALID
+                continue
+        if not node.children:
+            # The score is updated incrementally, so leaves cost nothing to evaluate
+            node.score = board.score
+            if move is not None:
+                board.undo_move()
+            continue
+        stack.append((node, move, True))
+        for child_move, child in node.children.items():
+            stack.append((child, child_move, False))
+
 
 def best_move_from_tree(board, tree: GameNode) -> tuple[str, int]:
     """
-    Searches the passed tree depth-first only using the moves in the
-    tree and returns the best move to make. Makes the assumption that
-    the passed tree will have considerably fewer moves as compared to
-    the entire move space, and will only contain "good" moves, and hence
-    complete depth-first search will be possible.
+    Returns the best move to make from the passed tree, only using the
+    moves in the tree, by picking the child with the best book score (see
+    ``score_tree``) for the side to move. Makes the assumption that the
+    passed tree will only contain "good" moves.
 
     This is a reasonable assumption only when tree is
     from the engine's opening book.
 
-    :param board: A ``chessengine.bitboard.Board`` object
+    The scores are computed the first time a subtree is probed and cached
+    on its GameNodes, so later probes only look at the children of ``tree``
+    and don't make any moves on the board.
+
+    :param board: A ``chessengine.bitboard.Board`` object at the position of ``tree``
     :param tree: A ``chessengine.pgn.node.GameNode`` object
+    :return: The best move in SAN and its score. The move is an empty string if the
+        tree has no valid moves, and the score is the board's score.
     """
-    if not tree.children:
-        return "", board.evaluate_score()
-    moves = list(tree.children.keys())
-    best_move = moves[0]
-    best_score = -100000 if board.side == "white" else 100000
-    for move in moves:
-        new_node = tree.get_child(move)
-        new_score = 0
-        board.move_san(move, tree.turn)
-        if new_node.children:
-            _, new_score = best_move_from_tree(board, new_node)
-        board.undo_move()
-        if new_score > best_score:
-            best_score = new_score
-            best_move = move
+    children = tree.children
+    if any(child.score is None for child in children.values()):
+        # Children added since the tree was scored are scored, the others are skipped
+        tree.score = None
+        score_tree(board, tree)
 
+    best_move = ""
+    best_score = board.score
+    for move, child in children.items():
+        if child.score is INVALID:
+            continue
+        if (
+            not best_move
+            or tree.white_to_move
+            and child.score > best_score
+            or not tree.white_to_move
+            and child.score < best_score
+        ):
+            best_move = move
+            best_score = child.score
     return best_move, best_score
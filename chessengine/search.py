@@ -0,0 +1,387 @@
+"""
+Helpers used by the alpha-beta search in ``chessengine.bitboard.Board``, such
+as the statistics collected while a search runs, an asyncio friendly
+way of running a search, and pondering on the opponent's time.
+"""
+
+
+import asyncio
+import threading
+from time import perf_counter
+from chessengine.evaluation import EvaluationCache, PawnHashTable
+
+# The number of nodes searched between two checks of the search limits. Must be a power of 2
+LIMIT_CHECK_INTERVAL = 2048
+
+
+class SearchIteration:
+    """
+    The statistics recorded for a single iteration (one search depth) of an
+    iterative deepening search.
+
+    :ivar depth: The depth (in plies) searched in this iteration
+    :ivar nodes: The number of nodes visited in this iteration
+    :ivar time: The time taken by this iteration, in seconds
+    :ivar score: The best score found in this iteration
+    :ivar move: The best move found in this iteration
+    """
+
+    def __init__(self, depth: int, nodes: int, time: float, score: int, move: tuple):
+        self.depth = depth
+        self.nodes = nodes
+        self.time = time
+        self.score = score
+        self.move = move
+
+    def __repr__(self):
+        return (
+            f"<chessengine.SearchIteration: depth {self.depth} - "
+            f"{self.nodes} nodes in {self.time:.3f}s>"
+        )
+
+
+class SearchStatistics:
+    """
+    Counters filled in by ``Board.search_forward`` while it searches. Pass an
+    instance to ``Board.search_forward`` to inspect what the search did and how
+    fast it ran.
+
+    :param callback: An optional callable that is called with this object every
+        time an iteration of the search completes. Useful to stream statistics
+        while a long search is running.
+    :ivar nodes: The total number of nodes visited
+    :ivar beta_cutoffs: The number of nodes at which the search was cut off
+    :ivar first_move_cutoffs: The number of cutoffs caused by the first move searched at a node
+    :ivar iterations: A list of ``SearchIteration`` objects, one for every completed depth
+    :ivar stopped: ``True`` if the search has been asked to stop
+    :ivar node_limit: The node count at which the search stops, or ``None``
+    :ivar limit_start_nodes: The node count when ``set_limits`` was last called. The
+        limits are checked every ``LIMIT_CHECK_INTERVAL`` nodes counted from it.
+    :ivar deadline: The ``time.perf_counter`` value at which the search stops, or ``None``
+    """
+
+    def __init__(self, callback=None) -> None:
+        self.callback = callback
+        self.nodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations: list[SearchIteration] = []
+        self.stopped = False
+        self.node_limit = None
+        self.limit_start_nodes = 0
+        self.deadline = None
+        self.start_time = perf_counter()
+        self._iteration_start_time = self.start_time
+        self._iteration_start_nodes = 0
+        self._limit_iterations = 0
+
+    def __repr__(self):
+        return (
+            f"<chessengine.SearchStatistics: {self.nodes} nodes, "
+            f"{self.nps:.0f} nps, depth {self.depth}>"
+        )
+
+    @property
+    def depth(self) -> int:
+        """
+        The depth of the last completed iteration, or 0 if no iteration has completed.
+        """
+        if not self.iterations:
+            return 0
+        return self.iterations[-1].depth
+
+    @property
+    def elapsed(self) -> float:
+        """
+        The time (in seconds) spent searching since the statistics were reset.
+        """
+        return perf_counter() - self.start_time
+
+    @property
+    def nps(self) -> float:
+        """
+        The number of nodes searched per second.
+        """
+        elapsed = self.elapsed
+        if elapsed == 0:
+            return 0.0
+        return self.nodes / elapsed
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """
+        The fraction of cutoffs that were caused by the first move searched. A
+        value close to 1 means the moves are well ordered.
+        """
+        if self.beta_cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.beta_cutoffs
+
+    @property
+    def branching_factor(self) -> float:
+        """
+        The effective branching factor of the search, i.e. the ratio of the nodes
+        searched in the last iteration to the nodes searched in the iteration before it.
+        """
+        if len(self.iterations) < 2 or self.iterations[-2].nodes == 0:
+            return 0.0
+        return self.iterations[-1].nodes / self.iterations[-2].nodes
+
+    def reset(self) -> None:
+        """
+        Reset all the counters and restart the clock.
+        """
+        self.nodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations = []
+        self.stopped = False
+        self.node_limit = None
+        self.limit_start_nodes = 0
+        self.deadline = None
+        self.start_time = perf_counter()
+        self._iteration_start_time = self.start_time
+        self._iteration_start_nodes = 0
+        self._limit_iterations = 0
+
+    def stop(self) -> None:
+        """
+        Ask the search using these statistics to stop as soon as possible.
+        Safe to call from another thread.
+        """
+        self.stopped = True
+
+    def set_limits(self, max_nodes: int = None, max_time: float = None) -> None:
+        """
+        Limit the number of nodes and the time the next search may use. Passing
+        ``None`` removes that limit.
+
+        :param max_nodes: The maximum number of nodes to search, counted from now
+        :param max_time: The maximum time to search, in seconds, counted from now
+        """
+        self.limit_start_nodes = self.nodes
+        self.node_limit = None if max_nodes is None else self.nodes + max_nodes
+        self.deadline = None if max_time is None else perf_counter() + max_time
+        self._limit_iterations = len(self.iterations)
+
+    def limit_reached(self) -> bool:
+        """
+        Returns ``True`` if the search should stop because a limit set with
+        ``set_limits`` has been reached. Limits are only enforced once an iteration
+        has completed since they were set, so that the search always has a move to
+        return. The search calls this every ``LIMIT_CHECK_INTERVAL`` nodes counted from
+        ``limit_start_nodes``.
+        """
+        if len(self.iterations) <= self._limit_iterations:
+            return False
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.deadline is not None and perf_counter() >= self.deadline
+
+    def start_iteration(self) -> None:
+        """
+        Mark the start of a new iteration of the search.
+        """
+        self._iteration_start_time = perf_counter()
+        self._iteration_start_nodes = self.nodes
+
+    def end_iteration(self, depth: int, score: int, move: tuple) -> None:
+        """
+        Record the iteration that was last started, and stream the statistics
+        to the callback (if any).
+
+        :param depth: The depth searched in this iteration
+        :param score: The best score found in this iteration
+        :param move: The best move found in this iteration
+        """
+        self.iterations.append(
+            SearchIteration(
+                depth=depth,
+                nodes=self.nodes - self._iteration_start_nodes,
+                time=perf_counter() - self._iteration_start_time,
+                score=score,
+                move=move,
+            )
+        )
+        if self.callback is not None:
+            self.callback(self)
+
+
+class AsyncSearch:
+    """
+    Runs ``Board.search_forward`` on a copy of a board in a worker thread, so
+    that an asyncio event loop is not blocked while the search runs. Must be
+    created from inside a running event loop. Usually created using
+    ``Board.search_async``.
+
+    Iterate over the search with ``async for`` to receive a
+    ``(depth, score, move)`` tuple every time an iteration of the search
+    completes, and await it (or ``AsyncSearch.result``) to get the final
+    ``(score, move)`` returned by the search. ::
+
+        search = board.search_async(depth=5)
+        async for depth, score, move in search:
+            if depth == 3:
+                search.cancel()
+        score, move = await search
+
+    :param board: The ``chessengine.bitboard.Board`` to search from. The board
+        itself is not modified.
+    :param depth: The number of plies to search
+    :param executor: An optional ``concurrent.futures.Executor`` to run the
+        search in. The event loop's default executor is used if not passed.
+    :param max_nodes: An optional node limit, see ``Board.search_forward``
+    :param max_time: An optional time limit in seconds, see ``Board.search_forward``
+    :ivar statistics: The ``SearchStatistics`` filled in by the running search
+    """
+
+    def __init__(
+        self,
+        board,
+        depth: int = 4,
+        executor=None,
+        max_nodes: int = None,
+        max_time: float = None,
+    ) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._progress = asyncio.Queue()
+        self._board = board.copy()
+        self.depth = depth
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+        self.statistics = SearchStatistics(callback=self._report_iteration)
+        self._future = self._loop.run_in_executor(executor, self._run)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> tuple:
+        progress = await self._progress.get()
+        if progress is None:
+            # Let later iterations also end immediately
+            self._progress.put_nowait(None)
+            raise StopAsyncIteration
+        return progress
+
+    def __await__(self):
+        return self.result().__await__()
+
+    def _run(self) -> tuple:
+        try:
+            return self._board.search_forward(
+                self.depth, self.statistics, self.max_nodes, self.max_time
+            )
+        finally:
+            self._loop.call_soon_threadsafe(self._progress.put_nowait, None)
+
+    def _report_iteration(self, statistics: SearchStatistics) -> None:
+        # Called in the worker thread after every completed iteration
+        iteration = statistics.iterations[-1]
+        self._loop.call_soon_threadsafe(
+            self._progress.put_nowait,
+            (iteration.depth, iteration.score, iteration.move),
+        )
+
+    def cancel(self) -> None:
+        """
+        Stop the search. Awaiting the search afterwards returns the best move
+        found by the last completed iteration, or raises ``asyncio.CancelledError``
+        if no iteration completed.
+        """
+        self.statistics.stop()
+
+    def done(self) -> bool:
+        """
+        Returns ``True`` if the search has finished or was cancelled and has stopped.
+        """
+        return self._future.done()
+
+    async def result(self) -> tuple:
+        """
+        Wait for the search to finish and return its result.
+
+        :return: A 2-tuple ``(score, move)``, same as ``Board.search_forward``
+        :raises asyncio.CancelledError: If the search was cancelled before its first
+            iteration completed
+        """
+        result = await self._future
+        if result is None:
+            raise asyncio.CancelledError(
+                "The search was cancelled before it found a move."
+            )
+        return result
+
+
+class Ponderer:
+    """
+    Searches the replies the opponent can make in a background thread, while
+    the opponent is thinking about their move. If the opponent then makes one
+    of the replies that has already been searched (a ponder hit), the result of
+    that search can be used directly instead of searching again.
+
+    Replies are searched one at a time to the full depth, most promising reply
+    (for the opponent) first, on a copy of the board with its own evaluation caches.
+
+    :param board: The ``chessengine.bitboard.Board`` the opponent is about to
+        move on. The board itself is not modified.
+    :param side: The side that is about to move, "white" or "black"
+    :param depth: The number of plies to search after every reply
+    :ivar results: A dictionary mapping replies as ``(start, end)`` tuples to
+        the ``(score, move)`` found by the completed search after that reply
+    :ivar statistics: The ``SearchStatistics`` shared by all the searches
+    """
+
+    def __init__(self, board, side: str, depth: int = 4) -> None:
+        self._board = board.copy()
+        # Copies share the evaluation caches, which are not thread safe. The board keeps
+        # being searched while the opponent thinks, so the copy gets its own caches.
+        self._board.pawn_hash_table = PawnHashTable(board.pawn_hash_table.size)
+        self._board.evaluation_cache = EvaluationCache(board.evaluation_cache.size)
+        self.side = side
+        self.depth = depth
+        self.results: dict[tuple[int, int], tuple] = {}
+        self.statistics = SearchStatistics()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        board = self._board
+
+        def material_score(reply):
+            # The incremental score after the reply is a cheap guess of how good
+            # it is for the side making it
+            start, end = reply
+            piece = board.identify_piece_at(start)[1]
+            end_piece = board.identify_piece_at(end)[1]
+            return board.evaluate_move(self.side, piece, start, end, end_piece)[0]
+
+        replies = board.get_moves(self.side)
+        replies.sort(key=material_score, reverse=self.side == "white")
+        for start, end in replies:
+            if self.statistics.stopped:
+                return
+            self._board.move(start, end)
+            result = self._board.search_forward(self.depth, self.statistics)
+            self._board.undo_move()
+            if not self.statistics.stopped:
+                self.results[(start, end)] = result
+
+    def stop(self) -> None:
+        """
+        Stop pondering and wait for the background thread to finish.
+        """
+        self.statistics.stop()
+        self._thread.join()
+
+    def result_for(self, start: int, end: int):
+        """
+        Stop pondering and return the result of the search after the reply
+        ``(start, end)``.
+
+        :param start: The start position of the reply that was made. See :ref:`position_representation`
+        :param end: The end position of the reply that was made. See :ref:`position_representation`
+        :return: The ``(score, move)`` found after the reply, same as ``Board.search_forward``,
+            or ``None`` if the reply was not searched completely.
+        """
+        self.stop()
+        return self.results.get((start, end))
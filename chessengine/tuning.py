@@ -0,0 +1,495 @@
+"""
+Tune the piece values and piece square tables in ``chessengine.lookup_tables``
+on labelled positions, using Texel's tuning method. The positions are loaded
+from PGN files (every position is labelled with the result of its game) or EPD
+files, their features are extracted into NumPy arrays once, and the tables are
+fitted by batched gradient descent on the squared error between the game
+results and a sigmoid of the evaluation.
+
+This module needs NumPy, which can be installed with
+``python -m pip install chessengine[numpy]``.
+"""
+
+
+import math
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from chessengine.bitboard import Board
+from chessengine.exceptions import MoveError, PGNParsingError, PositionError
+from chessengine.lookup_tables import (
+    piece_values,
+    piece_square_table,
+    endgame_piece_square_table,
+    san_piece_map,
+    phase_values,
+    MAX_PHASE,
+)
+from chessengine.network import FEATURES
+from chessengine.pgn.parser import PGNParser
+
+
+# The pieces whose values are tuned. The king's value is the same for both sides and cancels out.
+TUNED_PIECES = ("queens", "rooks", "bishops", "knights", "pawns")
+# The piece square tables that have a separate endgame table
+ENDGAME_TABLES = (
+    ("white", "kings"),
+    ("white", "pawns"),
+    ("black", "kings"),
+    ("black", "pawns"),
+)
+# Only the white tables are tuned. The black tables are the white tables mirrored
+# vertically, so the tuned evaluation stays colour-symmetric.
+TUNED_TABLES = tuple(side_piece for side_piece in FEATURES if side_piece[0] == "white")
+TUNED_ENDGAME_TABLES = tuple(
+    side_piece for side_piece in ENDGAME_TABLES if side_piece[0] == "white"
+)
+# The most pieces a position can have
+MAX_PIECES = 32
+
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+EPD_RESULT_REGEX = re.compile(r"(1-0|0-1|1/2-1/2)|\[([01](?:\.\d+)?)\]")
+
+# Layout of the parameter vector - the tuned piece values, the (middlegame) piece square
+# tables in the order of TUNED_TABLES, the endgame tables in the order of
+# TUNED_ENDGAME_TABLES, and a last parameter that is always 0, used to pad positions with
+# fewer than MAX_PIECES pieces.
+_VALUES = 0
+_TABLES = _VALUES + len(TUNED_PIECES)
+_ENDGAME_TABLES = _TABLES + len(TUNED_TABLES) * 64
+_PADDING = _ENDGAME_TABLES + len(TUNED_ENDGAME_TABLES) * 64
+PARAMETERS = _PADDING + 1
+
+
+def _mirror_table(table: list, side: str) -> list:
+    """
+    Returns the piece square table of ``side`` from the tuned white table.
+    """
+    if side == "white":
+        return table
+    return [table[square ^ 56] for square in range(64)]
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError(
+            "chessengine.tuning needs NumPy. Install it with `python -m pip install numpy`."
+        )
+
+
+def bitboards_from_fen(fen: str) -> list[int]:
+    """
+    Read the piece placement field of a FEN or EPD record.
+
+    :param fen: A FEN or EPD record. Only the first field is used.
+    :return: A list of the 12 bitboards of the position in the order of ``chessengine.network.FEATURES``
+    :raises PositionError: If the piece placement is invalid
+    """
+    bitboards = dict.fromkeys(FEATURES, 0)
+    ranks = fen.split()[0].split("/")
+    if len(ranks) != 8:
+        raise PositionError(f"Invalid piece placement in {fen}")
+    for rank, row in zip(range(7, -1, -1), ranks):
+        file = 0
+        for character in row:
+            if character.isdigit():
+                file += int(character)
+                continue
+            piece = san_piece_map.get(character.upper())
+            if piece is None or file > 7:
+                raise PositionError(f"Invalid piece placement in {fen}")
+            side = "white" if character.isupper() else "black"
+            bitboards[(side, piece)] |= 1 << (rank * 8 + file)
+            file += 1
+        if file != 8:
+            raise PositionError(f"Invalid piece placement in {fen}")
+    return [bitboards[side_piece] for side_piece in FEATURES]
+
+
+def _load_epd(epd_file, rows: list, results: list) -> None:
+    for line in epd_file:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = EPD_RESULT_REGEX.search(line)
+        if match is None:
+            continue
+        try:
+            rows.append(bitboards_from_fen(line))
+        except PositionError:
+            continue
+        if match.group(1) is not None:
+            results.append(RESULTS[match.group(1)])
+        else:
+            results.append(float(match.group(2)))
+
+
+def _load_pgn(pgn_file, rows: list, results: list, skip_plies: int) -> None:
+    parser = PGNParser()
+    for game in parser.iter_games(pgn_file, retain=False, merge=False):
+        result = RESULTS.get(game.result or game.headers.get("Result"))
+        if result is None:
+            continue
+        board = Board("white")
+        side = "white"
+        for ply, move in enumerate(game.moves, start=1):
+            try:
+                board.move_san(move, side)
+            except (MoveError, PGNParsingError, PositionError):
+                # Skip the rest of games the engine can't replay
+                break
+            if ply > skip_plies:
+                bitboards = board.board
+                rows.append([bitboards[side_piece] for side_piece in FEATURES])
+                results.append(result)
+            side = "black" if side == "white" else "white"
+
+
+def load_positions(paths: list, skip_plies: int = 8) -> tuple:
+    """
+    Load labelled positions from PGN and EPD files. Files ending in ``.epd`` are read
+    as EPD files, where every line is a position followed by its result, either as
+    ``1-0``, ``0-1`` or ``1/2-1/2`` (for example in a ``c9`` opcode) or as a score for
+    white in square brackets, like ``[0.5]``. Other files are read as PGN files, and every
+    position reached in a game is labelled with the result of the game.
+
+    :param paths: A list of paths to PGN and EPD files
+    :param skip_plies: The number of plies at the start of every PGN game whose positions
+        are not used. Opening positions say little about who wins the game.
+    :return: A 2-tuple ``(positions, results)``. ``positions`` is an ``(N, 12)`` uint64
+        array of bitboards, as used by ``chessengine.batch.evaluate_positions``, and
+        ``results`` is an ``(N,)`` array of the results (1 for a white win, 0.5 for a draw,
+        0 for a black win).
+    """
+    _require_numpy()
+    rows = []
+    results = []
+    for path in paths:
+        with open(path, mode="r", errors="replace") as file:
+            if str(path).lower().endswith(".epd"):
+                _load_epd(file, rows, results)
+            else:
+                _load_pgn(file, rows, results, skip_plies)
+    positions = np.array(rows, dtype=np.uint64).reshape(-1, len(FEATURES))
+    return positions, np.array(results, dtype=np.float64)
+
+
+class TexelTuner:
+    """
+    Fits the piece values and piece square tables to labelled positions. The evaluation
+    of a position is linear in the values and tables, so every position is stored as the
+    indices of the (at most 32) parameters its pieces use. The evaluation is turned into
+    an expected result with ``1 / (1 + 10 ** (-K * evaluation / 400))``, and the tables are
+    fitted by minimising the mean squared error between the expected and actual results.
+
+    The tuning starts from the current tables in ``chessengine.lookup_tables``. Only the
+    white tables are tuned - a black piece uses the white table at the vertically mirrored
+    square, so the tuned evaluation of a position is the negation of the evaluation of
+    its colour-flipped position.
+
+    :param positions: An ``(N, 12)`` uint64 array of bitboards, as returned by ``load_positions``
+    :param results: An ``(N,)`` array of results, as returned by ``load_positions``
+    :param scaling_constant: The constant ``K`` in the sigmoid. If not passed, the ``K``
+        that best fits the current tables is found with ``TexelTuner.fit_scaling_constant``.
+    :ivar parameters: The parameter vector being tuned. Use ``TexelTuner.tables`` to read the
+        tables from it.
+    :ivar scaling_constant: The constant ``K`` in the sigmoid
+    """
+
+    def __init__(self, positions, results, scaling_constant: float = None) -> None:
+        _require_numpy()
+        self.results = np.asarray(results, dtype=np.float64)
+        self._extract_features(np.asarray(positions, dtype=np.uint64))
+        self.parameters = self._initial_parameters()
+        if scaling_constant is None:
+            scaling_constant = self.fit_scaling_constant()
+        self.scaling_constant = scaling_constant
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return f"<chessengine.TexelTuner: {len(self)} positions>"
+
+    def _extract_features(self, positions, chunk_size: int = 65536) -> None:
+        """
+        Convert the bitboards of every position into the indices of the parameters used
+        by its pieces, its signs, and the weight of the middlegame tables.
+        """
+        count = len(positions)
+        self._middlegame_index = np.full((count, MAX_PIECES), _PADDING, dtype=np.int16)
+        self._endgame_index = np.full((count, MAX_PIECES), _PADDING, dtype=np.int16)
+        self._value_index = np.full((count, MAX_PIECES), _PADDING, dtype=np.int16)
+        self._signs = np.zeros((count, MAX_PIECES), dtype=np.int8)
+        self._middlegame_weight = np.empty(count, dtype=np.float64)
+
+        # Map every bitboard to its value parameter, tables, sign, and the mask that mirrors
+        # the squares of black pieces onto the white tables
+        value_of_table = np.array(
+            [
+                _VALUES + TUNED_PIECES.index(piece)
+                if piece in TUNED_PIECES
+                else _PADDING
+                for _, piece in FEATURES
+            ]
+        )
+        table_of_table = np.array(
+            [TUNED_TABLES.index(("white", piece)) for _, piece in FEATURES]
+        )
+        endgame_of_table = np.array(
+            [
+                TUNED_ENDGAME_TABLES.index(("white", piece))
+                if ("white", piece) in TUNED_ENDGAME_TABLES
+                else -1
+                for _, piece in FEATURES
+            ]
+        )
+        mirror_of_table = np.array(
+            [0 if side == "white" else 56 for side, _ in FEATURES]
+        )
+        sign_of_table = np.array([1 if side == "white" else -1 for side, _ in FEATURES])
+        phase_of_table = np.array([phase_values[piece] for _, piece in FEATURES])
+
+        for start in range(0, count, chunk_size):
+            chunk = np.ascontiguousarray(positions[start : start + chunk_size])
+            chunk_bytes = chunk.astype("<u8").view(np.uint8).reshape(len(chunk), -1)
+            # Column t * 64 + s is 1 if bitboard t has a piece on square s
+            bits = np.unpackbits(chunk_bytes, axis=1, bitorder="little")
+            rows, columns = np.nonzero(bits)
+            pieces = bits.sum(axis=1, dtype=np.int64)
+            if pieces.max(initial=0) > MAX_PIECES:
+                raise PositionError(f"Positions can have at most {MAX_PIECES} pieces.")
+            # The position of every piece in its row of the index arrays
+            slots = np.arange(len(rows)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+            rows += start
+            tables = columns // 64
+            squares = (columns % 64) ^ mirror_of_table[tables]
+
+            middlegame_index = _TABLES + table_of_table[tables] * 64 + squares
+            self._middlegame_index[rows, slots] = middlegame_index
+            self._endgame_index[rows, slots] = np.where(
+                endgame_of_table[tables] >= 0,
+                _ENDGAME_TABLES + endgame_of_table[tables] * 64 + squares,
+                middlegame_index,
+            )
+            self._value_index[rows, slots] = value_of_table[tables]
+            self._signs[rows, slots] = sign_of_table[tables]
+            phase = np.bincount(
+                rows - start, weights=phase_of_table[tables], minlength=len(chunk)
+            )
+            self._middlegame_weight[start : start + len(chunk)] = (
+                np.minimum(phase, MAX_PHASE) / MAX_PHASE
+            )
+
+    @staticmethod
+    def _initial_parameters():
+        parameters = np.zeros(PARAMETERS, dtype=np.float64)
+        for i, piece in enumerate(TUNED_PIECES):
+            parameters[_VALUES + i] = piece_values[piece]
+        for i, side_piece in enumerate(TUNED_TABLES):
+            parameters[_TABLES + i * 64 : _TABLES + (i + 1) * 64] = piece_square_table[
+                side_piece
+            ]
+        for i, side_piece in enumerate(TUNED_ENDGAME_TABLES):
+            start = _ENDGAME_TABLES + i * 64
+            parameters[start : start + 64] = endgame_piece_square_table[side_piece]
+        return parameters
+
+    def _evaluate(self, rows, parameters):
+        weight = self._middlegame_weight[rows, None]
+        values = (
+            parameters[self._value_index[rows]]
+            + weight * parameters[self._middlegame_index[rows]]
+            + (1 - weight) * parameters[self._endgame_index[rows]]
+        )
+        return (self._signs[rows] * values).sum(axis=1)
+
+    def _sigmoid(self, evaluation, scaling_constant: float = None):
+        if scaling_constant is None:
+            scaling_constant = self.scaling_constant
+        return 1 / (1 + np.power(10.0, -scaling_constant * evaluation / 400))
+
+    def evaluate(self):
+        """
+        Evaluate all the positions with the current parameters. Apart from rounding,
+        these are the scores ``Board.evaluate_score`` would return with the tuned tables.
+
+        :return: An ``(N,)`` array of evaluations
+        """
+        return self._evaluate(slice(None), self.parameters)
+
+    def loss(self, scaling_constant: float = None) -> float:
+        """
+        The mean squared error between the results and the expected results of all positions.
+
+        :param scaling_constant: The constant ``K`` to use, ``TexelTuner.scaling_constant`` if not passed
+        """
+        expected = self._sigmoid(self.evaluate(), scaling_constant)
+        return float(np.mean((self.results - expected) ** 2))
+
+    def fit_scaling_constant(self, low: float = 0.1, high: float = 4.0) -> float:
+        """
+        Find the scaling constant ``K`` that minimises the loss of the current parameters,
+        using a golden section search between ``low`` and ``high``.
+
+        :return: The best scaling constant
+        """
+        evaluation = self.evaluate()
+
+        def loss(scaling_constant):
+            expected = self._sigmoid(evaluation, scaling_constant)
+            return np.mean((self.results - expected) ** 2)
+
+        ratio = (math.sqrt(5) - 1) / 2
+        for _ in range(30):
+            left = high - ratio * (high - low)
+            right = low + ratio * (high - low)
+            if loss(left) < loss(right):
+                high = right
+            else:
+                low = left
+        return (low + high) / 2
+
+    def fit(
+        self,
+        epochs: int = 10,
+        batch_size: int = 16384,
+        learning_rate: float = 1.0,
+        callback=None,
+    ) -> list[float]:
+        """
+        Fit the parameters with mini-batch gradient descent, using the Adam optimiser.
+
+        :param epochs: The number of passes over all the positions
+        :param batch_size: The number of positions used for every step
+        :param learning_rate: The step size, roughly the number of centipawns a parameter
+            changes by in one step
+        :param callback: An optional callable that is called with the epoch number and the
+            loss after every epoch
+        :return: A list with the loss after every epoch
+        """
+        beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+        moment = np.zeros_like(self.parameters)
+        velocity = np.zeros_like(self.parameters)
+        scale = self.scaling_constant * math.log(10) / 400
+        rng = np.random.default_rng(0)
+        step = 0
+        losses = []
+        for epoch in range(epochs):
+            order = rng.permutation(len(self))
+            for start in range(0, len(order), batch_size):
+                rows = order[start : start + batch_size]
+                expected = self._sigmoid(self._evaluate(rows, self.parameters))
+                # Derivative of the loss with respect to the evaluation of every position
+                error = (
+                    -2
+                    * (self.results[rows] - expected)
+                    * expected
+                    * (1 - expected)
+                    * scale
+                    / len(rows)
+                )
+                signed_error = self._signs[rows] * error[:, None]
+                weight = self._middlegame_weight[rows, None]
+                gradient = (
+                    np.bincount(
+                        self._value_index[rows].ravel(),
+                        weights=signed_error.ravel(),
+                        minlength=PARAMETERS,
+                    )
+                    + np.bincount(
+                        self._middlegame_index[rows].ravel(),
+                        weights=(signed_error * weight).ravel(),
+                        minlength=PARAMETERS,
+                    )
+                    + np.bincount(
+                        self._endgame_index[rows].ravel(),
+                        weights=(signed_error * (1 - weight)).ravel(),
+                        minlength=PARAMETERS,
+                    )
+                )
+                gradient[_PADDING] = 0
+
+                step += 1
+                moment = beta1 * moment + (1 - beta1) * gradient
+                velocity = beta2 * velocity + (1 - beta2) * gradient**2
+                self.parameters -= (
+                    learning_rate
+                    * (moment / (1 - beta1**step))
+                    / (np.sqrt(velocity / (1 - beta2**step)) + epsilon)
+                )
+            losses.append(self.loss())
+            if callback is not None:
+                callback(epoch, losses[-1])
+        return losses
+
+    def tables(self) -> tuple[dict, dict, dict]:
+        """
+        Read the tuned tables from the parameters, rounded to integers. The black tables
+        are the white tables mirrored vertically.
+
+        :return: A 3-tuple ``(piece_values, piece_square_table, endgame_piece_square_table)``
+            in the same format as the tables in ``chessengine.lookup_tables``.
+        """
+        parameters = np.rint(self.parameters).astype(int).tolist()
+        values = {
+            piece: parameters[_VALUES + i] for i, piece in enumerate(TUNED_PIECES)
+        }
+        values["kings"] = piece_values["kings"]
+        middlegame = {}
+        for side, piece in FEATURES:
+            start = _TABLES + TUNED_TABLES.index(("white", piece)) * 64
+            middlegame[(side, piece)] = _mirror_table(
+                parameters[start : start + 64], side
+            )
+        endgame = {}
+        for side, piece in ENDGAME_TABLES:
+            start = _ENDGAME_TABLES + TUNED_ENDGAME_TABLES.index(("white", piece)) * 64
+            endgame[(side, piece)] = _mirror_table(parameters[start : start + 64], side)
+        return values, middlegame, endgame
+
+    def write_tables(self, path: str) -> None:
+        """
+        Write the tuned tables to a Python module. The module defines ``piece_values``,
+        ``piece_square_table`` and ``endgame_piece_square_table``, and they can be copied
+        into ``chessengine/lookup_tables.py`` to use them.
+
+        :param path: The path of the module to write
+        """
+        values, middlegame, endgame = self.tables()
+        lines = [
+            '"""',
+            f"Piece values and piece square tables tuned by chessengine.tuning on {len(self)} positions.",
+            "Copy them into chessengine/lookup_tables.py to use them.",
+            '"""',
+            "",
+            "piece_values = {",
+        ]
+        lines += [f'    "{piece}": {value},' for piece, value in values.items()]
+        lines += ["}", "", "# fmt: off", "", "piece_square_table = {"]
+        lines += _format_tables(middlegame)
+        lines += [
+            "}",
+            "",
+            "endgame_piece_square_table = {",
+            "    **piece_square_table,",
+        ]
+        lines += _format_tables(endgame)
+        lines += ["}", "", "# fmt: on", ""]
+        with open(path, mode="w") as module:
+            module.write("\n".join(lines))
+
+
+def _format_tables(tables: dict) -> list[str]:
+    lines = []
+    for side_piece, table in tables.items():
+        lines.append(f"    {side_piece!r}: [")
+        for rank in range(8):
+            squares = ", ".join(str(value) for value in table[rank * 8 : rank * 8 + 8])
+            lines.append(f"        {squares},")
+        lines.append("    ],")
+    return lines
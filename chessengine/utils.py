@@ -1,7 +1,7 @@
 """
 Utility functions for common bitboard operations.
 """
-from chessengine.lookup_tables import piece_square_table
+from chessengine.lookup_tables import material_square_table, MAX_PHASE
 
 
 from typing import List
@@ -91,6 +91,16 @@ def lsb_pos(board: int) -> int:
     return board & ~(board - 1)
 
 
+def flip_vertical(board: int) -> int:
+    """
+    Mirrors a bitboard vertically, so that rank 1 becomes rank 8 and rank 8 becomes rank 1.
+    i.e. - A piece on E2 moves to E7
+
+    :param board: A bitboard
+    """
+    return int.from_bytes(board.to_bytes(8, "little"), "big")
+
+
 def clear_lines(n: int) -> None:
     """
     Clears the last n lines printed so we can print there again
@@ -122,54 +132,73 @@ def get_input(prompt: str) -> str:
 
 
 def score_from_move(
-    side: str, piece: str, start: int, end: int, end_piece: str, prev_score: int
+    side: str,
+    piece: str,
+    start: int,
+    end: int,
+    end_piece: str,
+    prev_score: int,
+    promotion: str = None,
+    en_passant: bool = False,
+    table: dict = None,
 ) -> int:
     """
     Takes the previous board evaluation, and a move to be made, and returns the new
-    board evaluation.
+    board evaluation. Handles captures, castling (a king moving two squares also moves
+    its rook), en passant captures and pawn promotions.
 
     :param side: The side that is making the move. Should be one of "white" or "black"
     :param piece: The piece that is making the move. Should be one of
         ["kings", "queens", "rooks", "bishops", "knights", "pawns"]
     :param start: The start position of the move. See :ref:`position_representation`
     :param end: The end position of the move. See :ref:`position_representation`
-    :param end_piece: The piece that was captured (if any)
+    :param end_piece: The piece that was captured on ``end`` (if any)
     :param prev_score: The previous score/evaluation of the board before the move was made
+    :param promotion: The piece a pawn is promoted to (if any)
+    :param en_passant: ``True`` if the move is a pawn capturing en passant
+    :param table: The table of piece values to use, ``material_square_table`` (the default)
+        or ``endgame_material_square_table``
 
     :return: The new score/evaluation of the board after the move is made
     """
-    # TODO - Doesn't take into account pawn promotions. Add support for pawn promotions
-    piece_values = {
-        "pawns": 100,
-        "rooks": 500,
-        "knights": 320,
-        "bishops": 330,
-        "queens": 900,
-        "kings": 20000,
-    }
-    if side == "white":
-        new_score = (
-            prev_score
-            - piece_square_table[(side, piece)][int(log2(start))]
-            + piece_square_table[(side, piece)][int(log2(end))]
-        )
-    else:
-        new_score = (
-            prev_score
-            + piece_square_table[(side, piece)][int(log2(start))]
-            - piece_square_table[(side, piece)][int(log2(end))]
-        )
+    if table is None:
+        table = material_square_table
+    opponent_side = "black" if side == "white" else "white"
+    start_index = start.bit_length() - 1
+    end_index = end.bit_length() - 1
+    piece_table = table[(side, piece)]
+
+    score = prev_score + piece_table[end_index] - piece_table[start_index]
     if end_piece is not None:
-        if side == "white":
-            # Captured side was black
-            new_score += (
-                piece_values[end_piece]
-                + piece_square_table[("black", end_piece)][int(log2(end))]
-            )
+        score -= table[(opponent_side, end_piece)][end_index]
+    if en_passant:
+        # The captured pawn is behind the end position
+        captured_index = end_index - 8 if side == "white" else end_index + 8
+        score -= table[(opponent_side, "pawns")][captured_index]
+    if promotion is not None:
+        score += table[(side, promotion)][end_index] - piece_table[end_index]
+    if piece == "kings" and abs(end_index - start_index) == 2:
+        # Castling, the rook jumps over the king
+        rook_table = table[(side, "rooks")]
+        if end_index > start_index:
+            score += rook_table[end_index - 1] - rook_table[end_index + 1]
         else:
-            # Captured side was white
-            new_score -= (
-                piece_values[end_piece]
-                + piece_square_table[("white", end_piece)][int(log2(end))]
-            )
-    return new_score
+            score += rook_table[end_index + 1] - rook_table[end_index - 2]
+    return score
+
+
+def taper_score(middlegame_score: int, endgame_score: int, phase: int) -> int:
+    """
+    Blends a middlegame and an endgame evaluation of the board according to the
+    game phase.
+
+    :param middlegame_score: The evaluation of the board using the middlegame tables
+    :param endgame_score: The evaluation of the board using the endgame tables
+    :param phase: The game phase, from ``MAX_PHASE`` (middlegame) down to 0 (endgame)
+    """
+    phase = min(phase, MAX_PHASE)
+    blended = middlegame_score * phase + endgame_score * (MAX_PHASE - phase)
+    # Round towards 0, so mirrored positions get exactly opposite scores
+    if blended < 0:
+        return -(-blended // MAX_PHASE)
+    return blended // MAX_PHASE
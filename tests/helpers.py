@@ -0,0 +1,39 @@
+"""
+Helpers shared by the tests
+"""
+from chessengine.bitboard import Board
+
+
+def random_moves(board: Board, side: str, plies: int, rng):
+    """
+    Play up to plies random moves on the board, starting with side, and yield the
+    side to move after every move. The game ends early if a side has no moves.
+
+    :param board: The board to play the moves on
+    :param side: The side to move first, "white" or "black"
+    :param plies: The maximum number of moves to play
+    :param rng: The ``random.Random`` instance the moves are picked with
+    """
+    for _ in range(plies):
+        moves = board.get_moves(side)
+        if not moves:
+            return
+        start, end = rng.choice(moves)
+        board.move(start, end)
+        side = "black" if side == "white" else "white"
+        yield side
+
+
+def random_games(games: int, plies: int, rng):
+    """
+    Play random games from the starting position and yield a copy of the board
+    after every move.
+
+    :param games: The number of games to play
+    :param plies: The maximum number of moves in a game
+    :param rng: The ``random.Random`` instance the moves are picked with
+    """
+    for _ in range(games):
+        board = Board("white")
+        for _ in random_moves(board, "white", plies, rng):
+            yield board.copy()
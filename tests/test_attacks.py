@@ -0,0 +1,91 @@
+import random
+import unittest
+from itertools import chain
+from chessengine.bitboard import Board
+from chessengine.attacks import (
+    rook_attacks,
+    bishop_attacks,
+    pawn_attacks,
+    is_square_attacked,
+)
+from chessengine.evaluation import evaluate_attacks
+from chessengine.lookup_tables import coords_to_pos
+from tests.helpers import random_moves
+
+
+def squares(*names):
+    bitboard = 0
+    for name in names:
+        bitboard |= 1 << coords_to_pos[name.upper()]
+    return bitboard
+
+
+class TestAttacks(unittest.TestCase):
+    def test_slider_attacks(self):
+        self.assertEqual(bin(rook_attacks(0, 0)).count("1"), 14)
+        self.assertEqual(
+            rook_attacks(coords_to_pos["D4"], squares("D6", "B4")),
+            squares("D5", "D6", "D3", "D2", "D1", "C4", "B4", "E4", "F4", "G4", "H4"),
+        )
+        self.assertEqual(
+            bishop_attacks(coords_to_pos["C1"], squares("E3")),
+            squares("B2", "A3", "D2", "E3"),
+        )
+        self.assertEqual(
+            pawn_attacks("white", squares("A2", "H2")), squares("B3", "G3")
+        )
+        self.assertEqual(
+            pawn_attacks("black", squares("A7", "H7")), squares("B6", "G6")
+        )
+
+    def test_attacks_match_move_generation(self):
+        board = Board("white")
+        for side in chain(
+            ["white"], random_moves(board, "white", 60, random.Random(4))
+        ):
+            attack_maps = board.attack_maps()
+            own = board.all_white if side == "white" else board.all_black
+            for piece in ("kings", "queens", "rooks", "bishops", "knights"):
+                ends = 0
+                for start, end in board.get_moves(side, piece):
+                    # Castling moves the king two squares, which is not an attack
+                    if (
+                        piece != "kings"
+                        or abs(start.bit_length() - end.bit_length()) != 2
+                    ):
+                        ends |= end
+                with self.subTest(side=side, piece=piece):
+                    self.assertEqual(attack_maps.attacks[(side, piece)] & ~own, ends)
+
+    def test_is_square_attacked(self):
+        board = Board("white")
+        for _ in chain(["white"], random_moves(board, "white", 40, random.Random(6))):
+            attack_maps = board.attack_maps()
+            for attacker in ("white", "black"):
+                for index in range(64):
+                    with self.subTest(side=attacker, index=index):
+                        self.assertEqual(
+                            is_square_attacked(board, index, attacker),
+                            attack_maps.is_attacked(attacker, 1 << index),
+                        )
+
+    def test_no_castling_through_check(self):
+        board = Board("white")
+        board.white_bishops = 0
+        board.white_knights = 0
+        board.white_queens = 0
+        board.white_pawns = squares("A2", "B2", "C2", "D2", "E2", "H2")
+        board.black_rooks |= squares("G4")
+        ends = {end for _, end in board.get_moves("white", "kings")}
+        self.assertIn(2**2, ends)
+        self.assertNotIn(2**6, ends)
+
+    def test_evaluate_attacks(self):
+        board = Board("white")
+        self.assertEqual(evaluate_attacks(board, board.attack_maps()), 0)
+        board.move_san("e4", "white")
+        self.assertGreater(evaluate_attacks(board, board.attack_maps()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
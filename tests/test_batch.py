@@ -0,0 +1,37 @@
+import random
+import unittest
+from chessengine.batch import boards_to_array, evaluate_positions
+from tests.helpers import random_games
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def random_positions(games=10, plies=80):
+    """
+    Play random games and return a copy of the board after every move.
+    """
+    return list(random_games(games, plies, random.Random(2)))
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatchEvaluation(unittest.TestCase):
+    def test_evaluate_positions(self):
+        boards = random_positions()
+        positions = boards_to_array(boards)
+        self.assertEqual(positions.shape, (len(boards), 17))
+        expected = [board.evaluate_score() for board in boards]
+        self.assertEqual(evaluate_positions(positions).tolist(), expected)
+        self.assertEqual(
+            evaluate_positions(positions[:, :12], chunk_size=7).tolist(), expected
+        )
+
+    def test_invalid_shape(self):
+        with self.assertRaises(ValueError):
+            evaluate_positions(np.zeros((3, 11), dtype=np.uint64))
+
+
+if __name__ == "__main__":
+    unittest.main()
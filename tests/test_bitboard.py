@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import patch
 from chessengine.bitboard import Board
+from chessengine.lookup_tables import MAX_PHASE
 from typing import Optional, List
 
 
@@ -38,6 +39,113 @@ class TestBoard(unittest.TestCase):
         board.move(2**9, 2**17)
         self.assertEqual(board.white_pawns, 0b11111111 << 10)
 
+    def test_incremental_score(self):
+        board = Board("white")
+        board.verify_score = True
+        moves = [
+            ("e4", "white"),
+            ("d5", "black"),
+            ("e5", "white"),
+            ("f5", "black"),
+            ("exf6", "white"),  # en passant
+            ("Nc6", "black"),
+            ("Nf3", "white"),
+            ("Bf5", "black"),
+            ("Bc4", "white"),
+            ("Qd7", "black"),
+            ("O-O", "white"),
+            ("O-O-O", "black"),
+            ("fxg7", "white"),
+            ("Kb8", "black"),
+            ("gxh8=Q", "white"),  # promotion
+        ]
+        for move, side in moves:
+            board.move_san(move, side)
+        self.assertEqual(board.score, board.evaluate_score())
+        self.assertEqual(board.white_queens, 2**3 | 2**63)
+
+        while board.moves:
+            board.undo_move()
+        self.assertEqual(board, Board("white"))
+        self.assertEqual(board.score, 0)
+
+    def test_tapered_score(self):
+        board = Board("white")
+        self.assertEqual(board.phase, MAX_PHASE)
+
+        for side in ("white", "black"):
+            for piece in ("queens", "rooks", "bishops", "knights"):
+                board.set_bitboard(side, piece, 0)
+        board.reset_score()
+        self.assertEqual(board.phase, 0)
+        self.assertEqual(board.score, board.endgame_score)
+        self.assertEqual(board.score, 0)
+
+        # Pawns should advance in the endgame
+        board.verify_score = True
+        board.move(2**12, 2**28)
+        self.assertGreater(board.score, 0)
+        board.undo_move()
+        self.assertEqual(board.score, 0)
+
+    def test_generated_move_scores(self):
+        board = Board("white")
+        for start, end in [(2**12, 2**28), (2**51, 2**35), (2**28, 2**36)]:
+            board.move(start, end)
+        board.move(2**53, 2**37)  # f7 to f5, can be captured en passant
+
+        for start, end in board.get_moves("white"):
+            board.move(start, end)
+            self.assertEqual(board.score, board.evaluate_score())
+            board.undo_move()
+
+    def test_move_score_is_deprecated(self):
+        board = Board("white")
+        with self.assertWarns(DeprecationWarning):
+            board.move(2**12, 2**28, 100)
+        self.assertEqual(board.score, board.evaluate_score())
+
+    def test_zobrist_key(self):
+        board = Board("white")
+        start = board.zobrist_key("white")
+        self.assertNotEqual(start, board.zobrist_key("black"))
+
+        # Transpositions reach the same key
+        for move, side in [("e4", "white"), ("e5", "black"), ("Nf3", "white")]:
+            board.move_san(move, side)
+        other = Board("white")
+        for move, side in [("Nf3", "white"), ("e5", "black"), ("e4", "white")]:
+            other.move_san(move, side)
+        self.assertEqual(board.zobrist_key("black"), other.zobrist_key("black"))
+
+        # Losing the right to castle changes the key
+        board = Board("white")
+        side = "white"
+        for move in ["Nf3", "Nf6", "Rg1", "Ng8", "Rh1", "Nf6", "Ng1", "Ng8"]:
+            board.move_san(move, side)
+            side = "black" if side == "white" else "white"
+        self.assertEqual(board.position_key(), Board("white").position_key())
+        self.assertNotEqual(board.zobrist_key("white"), start)
+
+    def test_mirrored(self):
+        board = Board("white")
+        for move, side in [("e4", "white"), ("c5", "black"), ("Nf3", "white")]:
+            board.move_san(move, side)
+        board.move_san("Qa5", "black")
+
+        mirrored = board.mirrored()
+        self.assertEqual(mirrored.side, "black")
+        self.assertEqual(mirrored.black_pawns & 2**36, 2**36)  # e4 becomes e5
+        self.assertEqual(mirrored.white_pawns & 2**26, 2**26)  # c5 becomes c4
+        self.assertEqual(mirrored.white_queens, 2**24)  # a5 becomes a4
+        self.assertEqual(mirrored.score, -board.score)
+        self.assertEqual(mirrored.score, mirrored.evaluate_score())
+        self.assertEqual(mirrored.evaluate(), -board.evaluate())
+        self.assertEqual(mirrored.mirrored().position_key(), board.position_key())
+        self.assertEqual(mirrored.canonical_key()[0], board.canonical_key()[0])
+        self.assertEqual(mirrored.canonical_key()[1], -board.canonical_key()[1])
+        self.assertEqual(Board("white").canonical_key()[1], 1)
+
     def test_invalid_move(self):
         board = Board("white")
         with self.assertRaises(ValueError):
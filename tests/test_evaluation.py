@@ -0,0 +1,112 @@
+import unittest
+from chessengine.bitboard import Board
+from chessengine.evaluation import (
+    evaluate_pawn_structure,
+    evaluate_attacks,
+    PawnHashTable,
+    EvaluationCache,
+    DOUBLED_PAWN_PENALTY,
+    ISOLATED_PAWN_PENALTY,
+    BACKWARD_PAWN_PENALTY,
+    PASSED_PAWN_BONUS,
+)
+from chessengine.lookup_tables import coords_to_pos
+
+
+def pawns(*squares):
+    bitboard = 0
+    for square in squares:
+        bitboard |= 1 << coords_to_pos[square.upper()]
+    return bitboard
+
+
+class TestPawnStructure(unittest.TestCase):
+    def test_start_position(self):
+        board = Board("white")
+        self.assertEqual(
+            evaluate_pawn_structure(board.white_pawns, board.black_pawns), 0
+        )
+
+    def test_pawn_terms(self):
+        # Doubled and isolated pawns on the a file, blocked by the pawn on a7
+        self.assertEqual(
+            evaluate_pawn_structure(pawns("a2", "a3"), pawns("a7", "b7")),
+            -DOUBLED_PAWN_PENALTY - 2 * ISOLATED_PAWN_PENALTY,
+        )
+        # Two isolated passed pawns
+        self.assertEqual(
+            evaluate_pawn_structure(pawns("d6"), pawns("a7")),
+            PASSED_PAWN_BONUS[5] - PASSED_PAWN_BONUS[1],
+        )
+        # The pawn on d2 can't advance to d3 because the pawns on c4 and e4 attack it
+        self.assertEqual(
+            evaluate_pawn_structure(pawns("c3", "d2"), pawns("c4", "e4")),
+            -BACKWARD_PAWN_PENALTY + 2 * ISOLATED_PAWN_PENALTY,
+        )
+
+    def test_mirrored_structures(self):
+        white = pawns("a2", "b3", "d4", "d3", "f2", "h5")
+        black = pawns("a7", "b6", "d5", "d6", "f7", "h4")
+        self.assertEqual(evaluate_pawn_structure(white, black), 0)
+
+
+class TestPawnHashTable(unittest.TestCase):
+    def test_probe(self):
+        table = PawnHashTable(size=4)
+        board = Board("white")
+        score = table.probe(board.white_pawns, board.black_pawns)
+        self.assertEqual(table.probe(board.white_pawns, board.black_pawns), score)
+        self.assertEqual((table.hits, table.misses), (1, 1))
+
+        for file in "abcdefgh":
+            white = pawns(f"{file}4")
+            self.assertEqual(table.probe(white, 0), evaluate_pawn_structure(white, 0))
+        self.assertLessEqual(len(table), 4)
+        with self.assertRaises(ValueError):
+            PawnHashTable(size=6)
+
+    def test_evaluate(self):
+        board = Board("white")
+        board.move_san("e4", "white")
+        board.move_san("d5", "black")
+        board.move_san("exd5", "white")
+        self.assertEqual(
+            board.evaluate(),
+            board.score
+            + evaluate_pawn_structure(board.white_pawns, board.black_pawns)
+            + evaluate_attacks(board, board.attack_maps()),
+        )
+        self.assertIs(board.copy().pawn_hash_table, board.pawn_hash_table)
+
+
+class TestEvaluationCache(unittest.TestCase):
+    def test_get_and_store(self):
+        cache = EvaluationCache(size=2)
+        board = Board("white")
+        key = board.position_key()
+        self.assertIsNone(cache.get(key))
+        cache.store(key, 10)
+        self.assertEqual(cache.get(key), 10)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        board.move_san("e4", "white")
+        self.assertNotEqual(board.position_key(), key)
+        cache.store(board.position_key(), 20)
+        self.assertLessEqual(len(cache), 2)
+        with self.assertRaises(ValueError):
+            EvaluationCache(size=3)
+
+    def test_evaluate(self):
+        board = Board("white")
+        board.move_san("e4", "white")
+        score = board.evaluate()
+        misses = board.evaluation_cache.misses
+        board.move_san("e5", "black")
+        board.undo_move()
+        self.assertEqual(board.evaluate(), score)
+        self.assertEqual(board.evaluation_cache.misses, misses)
+        self.assertEqual(board.evaluation_cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
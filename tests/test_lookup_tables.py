@@ -1,8 +1,20 @@
 import unittest
+from chessengine.lookup_tables import (
+    material_square_table,
+    piece_square_table,
+    piece_values,
+)
 
 
 class TestLookupTables(unittest.TestCase):
-    pass
+    def test_material_square_table(self):
+        for (side, piece), table in piece_square_table.items():
+            with self.subTest(side=side, piece=piece):
+                sign = 1 if side == "white" else -1
+                self.assertEqual(
+                    material_square_table[(side, piece)],
+                    [sign * (piece_values[piece] + v) for v in table],
+                )
 
 
 if __name__ == "__main__":
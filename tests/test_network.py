@@ -0,0 +1,76 @@
+import os
+import random
+import tempfile
+import unittest
+from chessengine.bitboard import Board
+from chessengine.network import NetworkEvaluator
+from tests.helpers import random_moves
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def random_network(seed=0):
+    rng = np.random.default_rng(seed)
+    return NetworkEvaluator(
+        rng.normal(0, 0.1, (768, 16)),
+        rng.normal(0, 0.1, 16),
+        rng.normal(0, 0.5, (16, 8)),
+        rng.normal(0, 0.1, 8),
+        rng.normal(0, 100, 8),
+        0.0,
+    )
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestNetworkEvaluator(unittest.TestCase):
+    def test_incremental_updates(self):
+        board = Board("white")
+        board.set_network(random_network())
+        start_accumulator = board.network.accumulator.copy()
+        for _ in random_moves(board, "white", 40, random.Random(1)):
+            refreshed = board.network.copy()
+            refreshed.refresh(board)
+            np.testing.assert_array_equal(
+                board.network.accumulator, refreshed.accumulator
+            )
+            self.assertEqual(board.evaluate(), refreshed.evaluate())
+
+        while board.moves:
+            board.undo_move()
+        np.testing.assert_array_equal(board.network.accumulator, start_accumulator)
+
+    def test_copy(self):
+        board = Board("white")
+        board.set_network(random_network())
+        copy = board.copy()
+        copy.move_san("e4", "white")
+        self.assertIsNot(copy.network, board.network)
+        self.assertFalse(
+            np.array_equal(copy.network.accumulator, board.network.accumulator)
+        )
+
+    def test_load(self):
+        network = random_network()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "weights.npz")
+            network.save(path)
+            loaded = NetworkEvaluator.load(path)
+        board = Board("white")
+        board.move_san("e4", "white")
+        network.refresh(board)
+        loaded.refresh(board)
+        self.assertEqual(network.evaluate(), loaded.evaluate())
+
+    def test_search(self):
+        board = Board("white")
+        board.set_network(random_network())
+        score, move = board.search_forward(depth=2)
+        self.assertIsNotNone(move)
+        self.assertEqual(board.moves, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,581 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from chessengine.pgn import PGNParser, GameNode
+from chessengine.pgn.book import (
+    load_book,
+    load_opening_book,
+    hash_files,
+    update_book,
+    load_position_book,
+    PositionBook,
+)
+from chessengine.pgn import polyglot
+from chessengine.pgn.polyglot import (
+    MappedBook,
+    write_book_file,
+    write_records,
+    build_book_file,
+    encode_move,
+    decode_move,
+    RECORD,
+)
+from chessengine.pgn.utils import best_move_from_tree, score_tree, INVALID
+from chessengine.bitboard import Board
+from chessengine.pgn.parser import (
+    split_pgn_file,
+    tokenize_move_text,
+    MOVE,
+    COMMENT,
+    NAG,
+    VARIATION_START,
+    VARIATION_END,
+    RESULT,
+)
+
+PGN = """[Event "First"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0
+
+[Event "Second"]
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 d6
+3. d4 0-1
+
+[Event "Third"]
+[Result "1/2-1/2"]
+
+1. d4 d5 1/2-1/2
+"""
+
+# The lines starting with [ are in comments, not headers
+COMMENTED_PGN = """[Event "Commented"]
+[Result "1-0"]
+
+1. e4 e5 {White can play
+[Event "Gambit"] 2. f4 here} 2. Nf3 ; a comment {
+1-0
+
+[Event "Next"]
+[Result "*"]
+
+1. d4 {
+[%clk 0:03:00]
+} *
+"""
+
+
+class CountingFile(io.StringIO):
+    """
+    A file that counts how many lines have been read from it.
+    """
+
+    lines_read = 0
+
+    def __next__(self):
+        self.lines_read += 1
+        return super().__next__()
+
+
+class TestPGNParser(unittest.TestCase):
+    def test_parse(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(PGN))
+
+        self.assertEqual(len(parser.games), 3)
+        self.assertEqual(
+            [game.result for game in parser.games], ["1-0", "0-1", "1/2-1/2"]
+        )
+        self.assertEqual(parser.games[0].moves, ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"])
+        self.assertEqual(parser.games[1].moves, ["e4", "c5", "Nf3", "d6", "d4"])
+        self.assertEqual(set(parser.root_node.children), {"e4", "d4"})
+        self.assertEqual(
+            set(parser.root_node.get_child("e4").get_child("c5").children), {"Nf3"}
+        )
+
+    def test_iter_games(self):
+        parser = PGNParser()
+        pgn_file = CountingFile(PGN)
+        games = parser.iter_games(pgn_file, retain=False, merge=False)
+
+        first = next(games)
+        self.assertEqual(first.headers["Event"], "First")
+        # The rest of the file has not been read yet
+        self.assertLess(pgn_file.lines_read, 10)
+
+        self.assertEqual([game.headers["Event"] for game in games], ["Second", "Third"])
+        self.assertEqual(parser.games, [])
+        self.assertEqual(parser.root_node.children, {})
+
+    def test_iter_games_merge(self):
+        parser = PGNParser()
+        events = [
+            game.headers["Event"]
+            for game in parser.iter_games(io.StringIO(PGN), merge=True)
+        ]
+        self.assertEqual(events, ["First", "Second", "Third"])
+        self.assertEqual(parser.games, [])
+        self.assertEqual(set(parser.root_node.children), {"e4", "d4"})
+
+    def test_tokenize_move_text(self):
+        move_text = (
+            "1.e4 {Best by test} e5 2. Nf3 $1 Nc6 ; The main line\n"
+            "3. Bb5!? (3. Bc4 Bc5 (3... Nf6) 4. c3) 3... a6 4. O-O exd4?! 5. e8=Q+ 1-0"
+        )
+        self.assertEqual(
+            list(tokenize_move_text(move_text)),
+            [
+                (MOVE, "e4"),
+                (COMMENT, "Best by test"),
+                (MOVE, "e5"),
+                (MOVE, "Nf3"),
+                (NAG, 1),
+                (MOVE, "Nc6"),
+                (COMMENT, "The main line"),
+                (MOVE, "Bb5"),
+                (VARIATION_START, None),
+                (MOVE, "Bc4"),
+                (MOVE, "Bc5"),
+                (VARIATION_START, None),
+                (MOVE, "Nf6"),
+                (VARIATION_END, None),
+                (MOVE, "c3"),
+                (VARIATION_END, None),
+                (MOVE, "a6"),
+                (MOVE, "O-O"),
+                (MOVE, "exd4"),
+                (MOVE, "e8=Q+"),
+                (RESULT, "1-0"),
+            ],
+        )
+
+    def test_parse_annotated_game(self):
+        parser = PGNParser()
+        parser.parse(
+            io.StringIO(
+                '[Event "Annotated"]\n\n'
+                "1. e4 e5 {A comment\nover two lines} 2. Nf3 ; 2. f4 is the gambit\n"
+                "2... Nc6 (2... d6 3. d4) 3. Bb5 $2 *\n"
+            )
+        )
+        game = parser.games[0]
+        self.assertEqual(game.moves, ["e4", "e5", "Nf3", "Nc6", "Bb5"])
+        self.assertEqual(game.result, "*")
+        self.assertNotIn(
+            "d6", parser.root_node.get_child("e4").get_child("e5").get_child("Nf3")
+        )
+
+    def test_header_like_lines_in_comments(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(COMMENTED_PGN))
+        self.assertEqual(len(parser.games), 2)
+        self.assertEqual(parser.games[0].moves, ["e4", "e5", "Nf3"])
+        self.assertEqual(parser.games[0].result, "1-0")
+        self.assertEqual(parser.games[1].moves, ["d4"])
+
+    def test_visits(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(PGN))
+        root = parser.root_node
+        self.assertEqual(root.visits, 3)
+        self.assertEqual(root.get_child("e4").visits, 2)
+        self.assertEqual(root.get_child("e4").get_child("e5").visits, 1)
+
+    def test_statistics(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(PGN))
+        root = parser.root_node
+        # The counts are for the side that made the move reaching the node
+        self.assertEqual((root.wins, root.draws, root.losses), (1, 1, 1))
+        e4 = root.get_child("e4")
+        self.assertEqual((e4.wins, e4.draws, e4.losses), (1, 0, 1))
+        e5 = e4.get_child("e5")
+        self.assertEqual((e5.wins, e5.draws, e5.losses), (0, 0, 1))
+        d5 = root.get_child("d4").get_child("d5")
+        self.assertEqual((d5.wins, d5.draws, d5.losses), (0, 1, 0))
+
+        self.assertFalse(hasattr(root, "__dict__"))
+        self.assertEqual(e4.turn, "black")
+        # Both games that played Nf3 share one string
+        (first,) = e5.children
+        (second,) = e4.get_child("c5").children
+        self.assertIs(first, second)
+
+
+class TestParallelParsing(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".pgn")
+        with os.fdopen(handle, "w") as pgn_file:
+            for _ in range(20):
+                pgn_file.write(PGN + "\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def assertTreesEqual(self, first, second):
+        stack = [(first, second)]
+        while stack:
+            node, other = stack.pop()
+            self.assertEqual(node.turn, other.turn)
+            self.assertEqual(node.visits, other.visits)
+            self.assertEqual(set(node.children), set(other.children))
+            for move, child in node.children.items():
+                stack.append((child, other.children[move]))
+
+    def test_split_pgn_file(self):
+        ranges = split_pgn_file(self.path, 7)
+        self.assertEqual(len(ranges), 7)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+        with open(self.path, "rb") as pgn_file:
+            for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, next_start)
+                pgn_file.seek(next_start)
+                self.assertTrue(pgn_file.readline().startswith(b"[Event"))
+
+        # A file can't be split into more ranges than it has games
+        self.assertEqual(len(split_pgn_file(self.path, 1000)), 60)
+
+    def test_split_pgn_file_comments(self):
+        with open(self.path, "w") as pgn_file:
+            for _ in range(20):
+                pgn_file.write(COMMENTED_PGN + "\n")
+        ranges = split_pgn_file(self.path, 1000)
+        self.assertEqual(len(ranges), 40)
+        with open(self.path, "rb") as pgn_file:
+            for start, _ in ranges[1:]:
+                pgn_file.seek(start)
+                self.assertIn(
+                    pgn_file.readline(), [b'[Event "Commented"]\n', b'[Event "Next"]\n']
+                )
+
+        parser = PGNParser([self.path])
+        parser.parse_parallel(processes=2)
+        self.assertEqual(parser.root_node.visits, 40)
+        self.assertEqual(parser.root_node.get_child("e4").visits, 20)
+
+    def test_parse_parallel(self):
+        serial = PGNParser([self.path])
+        serial.parse()
+        for processes in (1, 2):
+            parallel = PGNParser([self.path])
+            parallel.parse_parallel(processes=processes)
+            self.assertEqual(parallel.root_node.visits, 60)
+            self.assertEqual(parallel.games, [])
+            self.assertTreesEqual(serial.root_node, parallel.root_node)
+
+    def test_merge(self):
+        first = PGNParser()
+        first.parse(io.StringIO(PGN))
+        second = PGNParser()
+        second.parse(io.StringIO(PGN))
+        first.root_node.merge(second.root_node)
+        self.assertEqual(first.root_node.visits, 6)
+        self.assertEqual(first.root_node.get_child("d4").visits, 2)
+
+
+class TestPositionBook(unittest.TestCase):
+    def test_from_tree(self):
+        parser = PGNParser()
+        parser.parse(
+            io.StringIO(
+                '[Event "A"]\n\n1. e4 e5 2. Nf3 Nc6 1-0\n\n'
+                '[Event "B"]\n\n1. Nf3 e5 2. e4 Nf6 0-1\n\n'
+                '[Event "C"]\n\n1. e4 e5 2. Nf3 Nc6 1/2-1/2\n'
+            )
+        )
+        book = PositionBook.from_tree(parser.root_node)
+
+        board = Board("white")
+        self.assertEqual(book.probe(board, "white"), {"e4": 2, "Nf3": 1})
+        # Both move orders reach the position after 1. e4 e5 2. Nf3
+        for move, side in [("Nf3", "white"), ("e5", "black"), ("e4", "white")]:
+            board.move_san(move, side)
+        self.assertEqual(book.probe(board, "black"), {"Nc6": 2, "Nf6": 1})
+        self.assertEqual(book.probe(board, "white"), {})
+
+        limited = PositionBook.from_tree(parser.root_node, max_plies=2)
+        self.assertEqual(len(limited), 3)
+
+    def test_records_and_merge(self):
+        book = PositionBook()
+        book.add(1, "e4")
+        book.add(1, "d4", 2)
+        book.add(2, "e5")
+        self.assertEqual(
+            PositionBook.from_records(book.to_records()).entries, book.entries
+        )
+        book.merge(PositionBook.from_records([(1, "e4", 3), (3, "c5", 1)]))
+        self.assertEqual(
+            book.entries, {1: {"e4": 4, "d4": 2}, 2: {"e5": 1}, 3: {"c5": 1}}
+        )
+
+
+class TestMappedBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_encode_move(self):
+        move = encode_move(2**12, 2**28)
+        self.assertEqual(move, 28 | 12 << 6)
+        self.assertEqual(decode_move(move), (2**12, 2**28, None))
+        move = encode_move(2**52, 2**60, "knights")
+        self.assertEqual(decode_move(move), (2**52, 2**60, "knights"))
+        # Castling is encoded as the king taking its rook
+        move = encode_move(2**4, 2**6, castle=True)
+        self.assertEqual(move, 7 | 4 << 6)
+        self.assertEqual(decode_move(move, castle=True), (2**4, 2**6, None))
+
+    def test_write_and_probe(self):
+        parser = PGNParser()
+        parser.parse(
+            io.StringIO(
+                '[Event "A"]\n\n1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. O-O 1-0\n\n'
+                '[Event "B"]\n\n1. Nf3 e5 2. e4 Nf6 0-1\n\n'
+                '[Event "C"]\n\n1. e4 e5 2. Nf3 Nc6 1/2-1/2\n'
+            )
+        )
+        count = write_book_file(parser.root_node, self.path)
+        self.assertEqual(os.path.getsize(self.path), count * RECORD.size)
+
+        with MappedBook(self.path) as book:
+            self.assertEqual(len(book), count)
+            board = Board("white")
+            self.assertEqual(
+                book.probe(board, "white"),
+                {(2**12, 2**28, None): 2, (2**6, 2**21, None): 1},
+            )
+            # The most played move comes first
+            self.assertEqual(book.find(board.zobrist_key("white"))[0][1], 2)
+            self.assertEqual(book.probe(board, "black"), {})
+
+            for move, side in [("Nf3", "white"), ("e5", "black"), ("e4", "white")]:
+                board.move_san(move, side)
+            self.assertEqual(
+                book.probe(board, "black"),
+                {(2**57, 2**42, None): 2, (2**62, 2**45, None): 1},
+            )
+
+            for move, side in [("Nc6", "black"), ("Bc4", "white"), ("Nf6", "black")]:
+                board.move_san(move, side)
+            moves = book.probe(board, "white")
+            self.assertEqual(moves, {(2**4, 2**6, None): 1})
+            board.move(2**4, 2**6)
+            self.assertEqual(board.white_rooks, 2**0 | 2**5)
+
+    def test_build_book_file(self):
+        pgn_path = os.path.join(self.directory.name, "games.pgn")
+        with open(pgn_path, "w") as pgn_file:
+            for _ in range(3):
+                pgn_file.write(PGN + "\n")
+            pgn_file.write('[Event "Invalid"]\n\n1. e4 e5 2. Ke3 Nc6 1-0\n')
+        parser = PGNParser([pgn_path])
+        parser.parse()
+        tree_path = os.path.join(self.directory.name, "tree.bin")
+        write_book_file(parser.root_node, tree_path, max_plies=4)
+
+        # A run is written after every game, so the runs have to be merged
+        count = build_book_file([pgn_path], self.path, max_plies=4, run_size=1)
+        with open(self.path, "rb") as built, open(tree_path, "rb") as written:
+            self.assertEqual(built.read(), written.read())
+        self.assertEqual(os.path.getsize(self.path), count * RECORD.size)
+
+        with MappedBook(self.path) as book:
+            self.assertEqual(
+                book.probe(Board("white"), "white"),
+                {(2**12, 2**28, None): 7, (2**11, 2**27, None): 3},
+            )
+
+    def test_build_book_file_fan_in(self):
+        pgn_path = os.path.join(self.directory.name, "games.pgn")
+        with open(pgn_path, "w") as pgn_file:
+            for _ in range(5):
+                pgn_file.write(PGN + "\n")
+        parser = PGNParser([pgn_path])
+        parser.parse()
+        tree_path = os.path.join(self.directory.name, "tree.bin")
+        write_book_file(parser.root_node, tree_path)
+
+        # 15 runs merged 2 at a time need several passes
+        merge = polyglot.heapq.merge
+        fan_ins = []
+
+        def counting_merge(*iterables):
+            fan_ins.append(len(iterables))
+            return merge(*iterables)
+
+        with patch.object(polyglot.heapq, "merge", counting_merge):
+            build_book_file([pgn_path], self.path, run_size=1, fan_in=2)
+        self.assertGreater(len(fan_ins), 8)
+        self.assertEqual(max(fan_ins), 2)
+        with open(self.path, "rb") as built, open(tree_path, "rb") as written:
+            self.assertEqual(built.read(), written.read())
+
+        with self.assertRaises(ValueError):
+            build_book_file([pgn_path], self.path, fan_in=1)
+
+    def test_invalid_files(self):
+        write_records([], self.path)
+        with MappedBook(self.path) as book:
+            self.assertEqual(len(book), 0)
+            self.assertEqual(book.find(12345), [])
+
+        with open(self.path, "wb") as book_file:
+            book_file.write(b"not a book")
+        with self.assertRaises(ValueError):
+            MappedBook(self.path)
+
+
+class TestBookProbing(unittest.TestCase):
+    def minimax(self, board, node, side):
+        if not node.children:
+            return board.evaluate_score()
+        scores = []
+        for move, child in node.children.items():
+            board.move_san(move, side)
+            scores.append(
+                self.minimax(board, child, "black" if side == "white" else "white")
+            )
+            board.undo_move()
+        return max(scores) if side == "white" else min(scores)
+
+    def test_best_move_from_tree(self):
+        parser = PGNParser()
+        parser.parse(
+            io.StringIO(
+                PGN + '\n[Event "Fourth"]\n\n1. e4 e5 2. Qh5 Nc6 3. Qxf7+ 1-0\n'
+            )
+        )
+        root = parser.root_node
+        board = Board("white")
+        key = board.position_key()
+
+        move, score = best_move_from_tree(board, root)
+        self.assertEqual(score, self.minimax(board, root, "white"))
+        self.assertEqual(score, max(child.score for child in root.children.values()))
+        self.assertEqual(root.get_child(move).score, score)
+        self.assertEqual(board.position_key(), key)
+        self.assertEqual(board.moves, [])
+
+        # Black picks the lowest score
+        board.move_san("e4", "white")
+        e4 = root.get_child("e4")
+        move, score = best_move_from_tree(board, e4)
+        self.assertEqual(score, min(child.score for child in e4.children.values()))
+        self.assertEqual(score, self.minimax(board, e4, "black"))
+
+    def test_cached_scores(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(PGN))
+        board = Board("white")
+        score_tree(board, parser.root_node)
+        self.assertIsNotNone(parser.root_node.get_child("d4").get_child("d5").score)
+
+        # Probing a scored tree doesn't make any moves
+        with patch.object(Board, "move_san") as move_san:
+            move, _ = best_move_from_tree(board, parser.root_node)
+            move_san.assert_not_called()
+        self.assertIn(move, ("e4", "d4"))
+
+        # Merging new games clears the scores of the nodes they change
+        other = PGNParser()
+        other.parse(io.StringIO('[Event "New"]\n\n1. c4 e5 1-0\n'))
+        parser.root_node.merge(other.root_node)
+        self.assertIsNone(parser.root_node.score)
+        best_move_from_tree(board, parser.root_node)
+        self.assertIsNotNone(parser.root_node.get_child("c4").score)
+
+    def test_invalid_moves_are_scored_once(self):
+        parser = PGNParser()
+        parser.parse(io.StringIO(PGN + '\n[Event "Invalid"]\n\n1. Ke2 e5 *\n'))
+        board = Board("white")
+        move, _ = best_move_from_tree(board, parser.root_node)
+        self.assertIn(move, ("e4", "d4"))
+        self.assertIs(parser.root_node.get_child("Ke2").score, INVALID)
+
+        with patch.object(Board, "move_san") as move_san:
+            self.assertEqual(best_move_from_tree(board, parser.root_node)[0], move)
+            move_san.assert_not_called()
+
+
+class TestOpeningBook(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pgn_path = os.path.join(self.directory.name, "openings.pgn")
+        self.book_path = os.path.join(self.directory.name, "cache", "book.bin")
+        with open(self.pgn_path, "w") as pgn_file:
+            pgn_file.write(PGN)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compile_and_load(self):
+        book = load_opening_book([self.pgn_path], self.book_path)
+        self.assertEqual(book.visits, 3)
+        self.assertTrue(os.path.exists(self.book_path))
+
+        loaded = load_book(self.book_path, hash_files([self.pgn_path]))
+        self.assertEqual(loaded.to_records(), book.to_records())
+        self.assertEqual(loaded.get_child("e4").turn, "black")
+
+    def test_position_book_skips_tree(self):
+        load_opening_book([self.pgn_path], self.book_path)
+        with patch.object(GameNode, "from_records") as from_records:
+            positions = load_position_book([self.pgn_path], self.book_path)
+            from_records.assert_not_called()
+        self.assertEqual(positions.probe(Board("white"), "white"), {"e4": 2, "d4": 1})
+
+    def test_invalidated_by_source(self):
+        load_opening_book([self.pgn_path], self.book_path)
+        old_hash = hash_files([self.pgn_path])
+        with open(self.pgn_path, "a") as pgn_file:
+            pgn_file.write('\n[Event "Fourth"]\n\n1. c4 e5 0-1\n')
+
+        self.assertIsNone(load_book(self.book_path, hash_files([self.pgn_path])))
+        self.assertIsNotNone(load_book(self.book_path, old_hash))
+        book = load_opening_book([self.pgn_path], self.book_path)
+        self.assertEqual(book.visits, 4)
+        self.assertIn("c4", book)
+
+    def test_corrupt_book(self):
+        os.makedirs(os.path.dirname(self.book_path))
+        with open(self.book_path, "wb") as book_file:
+            book_file.write(b"not a book")
+        self.assertIsNone(load_book(self.book_path))
+        self.assertEqual(load_opening_book([self.pgn_path], self.book_path).visits, 3)
+
+    def test_update_book(self):
+        new_path = os.path.join(self.directory.name, "new.pgn")
+        with open(new_path, "w") as pgn_file:
+            pgn_file.write('[Event "New"]\n\n1. e4 e6 2. d4 d5 1/2-1/2\n')
+
+        added = update_book([new_path], self.book_path, base_files=[self.pgn_path])
+        self.assertEqual(added, {new_path: 1})
+        book = load_opening_book([self.pgn_path], self.book_path)
+        self.assertEqual(book.visits, 4)
+        self.assertEqual(book.get_child("e4").visits, 3)
+        self.assertIn("e6", book.get_child("e4"))
+        positions = load_position_book([self.pgn_path], self.book_path)
+        self.assertEqual(positions.probe(Board("white"), "white"), {"e4": 3, "d4": 1})
+
+        # The same contents under another name are skipped
+        copy_path = os.path.join(self.directory.name, "copy.pgn")
+        with open(new_path) as source, open(copy_path, "w") as copy:
+            copy.write(source.read())
+        added = update_book(
+            [new_path, copy_path], self.book_path, base_files=[self.pgn_path]
+        )
+        self.assertEqual(added, {new_path: None, copy_path: None})
+        self.assertEqual(load_book(self.book_path).visits, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from chessengine.bitboard import Board
+from chessengine.search import SearchStatistics, Ponderer, LIMIT_CHECK_INTERVAL
+
+
+class TestSearchStatistics(unittest.TestCase):
+    def test_search_forward_statistics(self):
+        board = Board("white")
+        statistics = SearchStatistics()
+        board.search_forward(3, statistics)
+
+        self.assertEqual(statistics.depth, 3)
+        self.assertEqual([i.depth for i in statistics.iterations], [1, 2, 3])
+        self.assertEqual(statistics.nodes, sum(i.nodes for i in statistics.iterations))
+        self.assertGreater(statistics.beta_cutoffs, 0)
+        self.assertLessEqual(statistics.first_move_cutoffs, statistics.beta_cutoffs)
+        self.assertGreater(statistics.branching_factor, 1)
+
+    def test_callback(self):
+        board = Board("white")
+        depths = []
+        statistics = SearchStatistics(callback=lambda s: depths.append(s.depth))
+        board.search_forward(2, statistics)
+        self.assertEqual(depths, [1, 2])
+
+    def test_stop(self):
+        board = Board("white")
+        statistics = SearchStatistics()
+        statistics.callback = lambda s: s.stop() if s.depth == 2 else None
+        score, move = board.search_forward(4, statistics)
+
+        self.assertEqual(statistics.depth, 2)
+        self.assertEqual(
+            (score, move),
+            (statistics.iterations[-1].score, statistics.iterations[-1].move),
+        )
+        self.assertEqual(board.moves, [])
+        self.assertEqual(board, Board("white"))
+
+
+class TestSearchLimits(unittest.TestCase):
+    def test_max_nodes(self):
+        board = Board("white")
+        results = []
+        for _ in range(2):
+            statistics = SearchStatistics()
+            result = board.search_forward(10, statistics, max_nodes=3000)
+            results.append((result, statistics.nodes, statistics.depth))
+
+        self.assertEqual(results[0], results[1])
+        self.assertLess(results[0][1], 3000 + LIMIT_CHECK_INTERVAL)
+        self.assertLess(results[0][2], 10)
+        self.assertEqual(board.moves, [])
+
+    def test_max_nodes_with_reused_statistics(self):
+        fresh = SearchStatistics()
+        result = Board("white").search_forward(10, fresh, max_nodes=3000)
+
+        reused = SearchStatistics()
+        board = Board("white")
+        board.search_forward(2, reused)
+        nodes = reused.nodes
+        # The limit is checked at the same nodes however many were counted before
+        self.assertEqual(board.search_forward(10, reused, max_nodes=3000), result)
+        self.assertEqual(reused.nodes - nodes, fresh.nodes)
+
+    @patch("chessengine.bitboard.LIMIT_CHECK_INTERVAL", 1)
+    def test_limits_with_reused_statistics(self):
+        board = Board("white")
+        statistics = SearchStatistics()
+        board.search_forward(2, statistics)
+        # The first iteration of the next search completes even though the limit is
+        # reached straight away
+        score, move = board.search_forward(4, statistics, max_nodes=1)
+
+        self.assertEqual([i.depth for i in statistics.iterations], [1, 2, 1])
+        self.assertEqual(
+            (score, move),
+            (statistics.iterations[-1].score, statistics.iterations[-1].move),
+        )
+        self.assertEqual(board.moves, [])
+
+    def test_stopped_before_first_iteration(self):
+        board = Board("white")
+        statistics = SearchStatistics()
+        statistics.stop()
+
+        self.assertIsNone(board.search_forward(4, statistics))
+        self.assertEqual(board.search_multi_pv(4, 2, statistics), [])
+        self.assertEqual(statistics.iterations, [])
+        self.assertEqual(board.moves, [])
+
+    def test_max_time(self):
+        board = Board("white")
+        statistics = SearchStatistics()
+        board.search_forward(10, statistics, max_time=0.2)
+        self.assertGreaterEqual(statistics.depth, 1)
+        self.assertLess(statistics.elapsed, 2)
+
+
+class TestMultiPV(unittest.TestCase):
+    def test_search_multi_pv(self):
+        board = Board("white")
+        results = board.search_multi_pv(3, 3)
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][:2], board.search_forward(3))
+        self.assertEqual(len({move for _, move, _ in results}), 3)
+        scores = [score for score, _, _ in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for score, move, pv in results:
+            self.assertEqual(pv[0], move)
+            self.assertEqual(len(pv), 3)
+
+    def test_search_multi_pv_black(self):
+        board = Board("black")
+        board.move(2**12, 2**28)
+        results = board.search_multi_pv(2, 4)
+
+        self.assertEqual(results[0][:2], board.search_forward(2))
+        scores = [score for score, _, _ in results]
+        self.assertEqual(scores, sorted(scores))
+        self.assertEqual(len(board.moves), 1)
+
+
+class TestAsyncSearch(unittest.IsolatedAsyncioTestCase):
+    async def test_search_async(self):
+        board = Board("white")
+        search = board.search_async(2)
+        progress = [p async for p in search]
+        score, move = await search
+
+        self.assertEqual([p[0] for p in progress], [1, 2])
+        self.assertEqual((score, move), progress[-1][1:])
+        self.assertEqual((score, move), board.search_forward(2))
+
+    async def test_cancel(self):
+        board = Board("white")
+        search = board.search_async(5)
+        async for depth, score, move in search:
+            if depth == 1:
+                search.cancel()
+        self.assertEqual(await search, (score, move))
+        self.assertTrue(search.done())
+        self.assertLess(search.statistics.depth, 5)
+
+    async def test_cancel_before_first_iteration(self):
+        board = Board("white")
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Keep the only worker busy so the search cannot start before it is cancelled
+            executor.submit(release.wait)
+            search = board.search_async(5, executor)
+            search.cancel()
+            release.set()
+            self.assertEqual([p async for p in search], [])
+            with self.assertRaises(asyncio.CancelledError):
+                await search
+        self.assertEqual(search.statistics.iterations, [])
+
+
+class TestPonderer(unittest.TestCase):
+    def test_ponder_hit(self):
+        board = Board("black")
+        ponderer = Ponderer(board, "white", 2)
+        # Wait for all the replies to be searched
+        ponderer._thread.join(timeout=30)
+        self.assertFalse(ponderer._thread.is_alive())
+        self.assertEqual(len(ponderer.results), 20)
+
+        board.move(2**12, 2**28)
+        self.assertEqual(ponderer.result_for(2**12, 2**28), board.search_forward(2))
+
+    def test_ponder_caches(self):
+        board = Board("black")
+        ponderer = Ponderer(board, "white", 1)
+        ponderer.stop()
+        self.assertIsNot(ponderer._board.evaluation_cache, board.evaluation_cache)
+        self.assertIsNot(ponderer._board.pawn_hash_table, board.pawn_hash_table)
+
+    def test_ponder_miss(self):
+        board = Board("black")
+        ponderer = Ponderer(board, "white", 4)
+        self.assertIsNone(ponderer.result_for(2**12, 2**20))
+        self.assertEqual(board.moves, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import random
+import runpy
+import tempfile
+import unittest
+from chessengine.bitboard import Board
+from chessengine.lookup_tables import (
+    piece_values,
+    piece_square_table,
+    endgame_piece_square_table,
+    phase_values,
+)
+from chessengine.utils import taper_score
+from tests.helpers import random_games
+
+try:
+    import numpy as np
+    from chessengine.batch import boards_to_array, evaluate_positions
+    from chessengine.tuning import TexelTuner, bitboards_from_fen, load_positions
+except ImportError:
+    np = None
+
+
+def random_positions(games=20, plies=60):
+    """
+    Play random games and return the positions reached in which both kings are on the board.
+    """
+    boards = [
+        board
+        for board in random_games(games, plies, random.Random(3))
+        if board.white_kings and board.black_kings
+    ]
+    return boards_to_array(boards)[:, :12]
+
+
+def evaluate_with_tables(board, tables):
+    """
+    Evaluate the material and piece square tables of the board with the tables of a
+    module written by ``TexelTuner.write_tables``.
+    """
+    middlegame = endgame = phase = 0
+    for side in ("white", "black"):
+        sign = 1 if side == "white" else -1
+        for piece in piece_values:
+            table = tables["piece_square_table"][(side, piece)]
+            endgame_table = tables["endgame_piece_square_table"].get(
+                (side, piece), table
+            )
+            bitboard = board.get_bitboard(side, piece)
+            for square in range(64):
+                if not bitboard >> square & 1:
+                    continue
+                value = tables["piece_values"][piece]
+                middlegame += sign * (value + table[square])
+                endgame += sign * (value + endgame_table[square])
+                phase += phase_values[piece]
+    return taper_score(middlegame, endgame, phase)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTexelTuner(unittest.TestCase):
+    def test_features(self):
+        positions = random_positions()
+        tuner = TexelTuner(positions, np.full(len(positions), 0.5), 1.0)
+        self.assertLess(
+            np.abs(tuner.evaluate() - evaluate_positions(positions)).max(), 1
+        )
+
+    def test_fit(self):
+        positions = random_positions()
+        results = (evaluate_positions(positions) > 0).astype(float)
+        tuner = TexelTuner(positions, results)
+        initial_loss = tuner.loss()
+        losses = tuner.fit(epochs=3, batch_size=128)
+        self.assertEqual(len(losses), 3)
+        self.assertLess(losses[-1], initial_loss)
+
+    def test_write_tables(self):
+        positions = random_positions(games=2)
+        tuner = TexelTuner(positions, np.full(len(positions), 0.5), 1.0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.py")
+            tuner.write_tables(path)
+            tables = runpy.run_path(path)
+        self.assertEqual(tables["piece_values"], piece_values)
+        self.assertEqual(tables["piece_square_table"], piece_square_table)
+        self.assertEqual(
+            tables["endgame_piece_square_table"], endgame_piece_square_table
+        )
+
+    def test_tuned_tables_are_symmetric(self):
+        positions = random_positions()
+        # Results that favour white, so an unconstrained fit would make the tables asymmetric
+        results = np.ones(len(positions))
+        tuner = TexelTuner(positions, results, 1.0)
+        tuner.fit(epochs=2, batch_size=128, learning_rate=5.0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.py")
+            tuner.write_tables(path)
+            tables = runpy.run_path(path)
+        self.assertNotEqual(tables["piece_square_table"], piece_square_table)
+
+        for board in random_games(5, 30, random.Random(5)):
+            self.assertEqual(
+                evaluate_with_tables(board, tables),
+                -evaluate_with_tables(board.mirrored(), tables),
+            )
+
+    def test_load_positions(self):
+        start = Board("white")
+        with tempfile.TemporaryDirectory() as directory:
+            epd = os.path.join(directory, "positions.epd")
+            with open(epd, "w") as file:
+                file.write(
+                    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - c9 "1/2-1/2";\n'
+                    "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - [1.0]\n"
+                )
+            pgn = os.path.join(directory, "games.pgn")
+            with open(pgn, "w") as file:
+                file.write('[Result "0-1"]\n\n1. e4 e5 2. Nf3 Nc6 0-1\n')
+            positions, results = load_positions([epd, pgn], skip_plies=2)
+
+        self.assertEqual(results.tolist(), [0.5, 1.0, 0.0, 0.0])
+        self.assertEqual(
+            positions[0].tolist(),
+            bitboards_from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"),
+        )
+        self.assertEqual(
+            positions[0].tolist(), boards_to_array([start])[0, :12].tolist()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
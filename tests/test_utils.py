@@ -1,4 +1,4 @@
-from chessengine.utils import get_bit_positions, lsb_pos
+from chessengine.utils import get_bit_positions, lsb_pos, flip_vertical
 
 import unittest
 
@@ -22,6 +22,11 @@ class TestUtils(unittest.TestCase):
             with self.subTest(arg=arg):
                 self.assertEqual(lsb_pos(arg), expected)
 
+    def test_flip_vertical(self):
+        self.assertEqual(flip_vertical(2**12), 2**52)  # e2 to e7
+        self.assertEqual(flip_vertical(2**63 + 1), 2**56 + 2**7)
+        self.assertEqual(flip_vertical(flip_vertical(0xF0F01234)), 0xF0F01234)
+
 
 if __name__ == "__main__":
     unittest.main()